@@ -0,0 +1,172 @@
+import argparse
+import functools
+import json
+import sys
+from datetime import UTC, datetime
+from pathlib import Path
+
+from sqlalchemy import text
+
+from benchmarks.run_benchmarks import measure
+from config.logger import get_logger
+from config.postgres import connection_scope, get_engine
+from config.schema import apartment_index_statements, bootstrap_schema
+
+logger = get_logger("index_benchmark")
+
+BENCH_TABLE = "apartment_index_bench"
+DEFAULT_ROWS = 5_000_000
+DEFAULT_REPEAT = 5
+
+# Typical dashboard and search filters. Synthetic addresses follow
+# "Calle <n> (Barrio <b>), Ciudad <c>", with 20,000 streets.
+QUERIES = {
+    "price_range": f"SELECT url, price FROM {BENCH_TABLE} WHERE price BETWEEN 150000 AND 151000",
+    "m2_range": f"SELECT url, m2 FROM {BENCH_TABLE} WHERE m2 BETWEEN 80 AND 80.5",
+    "bedrooms_cheapest": (
+        f"SELECT url, price FROM {BENCH_TABLE} "
+        "WHERE bedrooms = 3 AND price < 200000 ORDER BY price LIMIT 50"
+    ),
+    "source_recent": (
+        f"SELECT count(*) FROM {BENCH_TABLE} "
+        "WHERE source = 'solvia' AND scraped_at >= now() - interval '1 day'"
+    ),
+    "address_contains": (
+        f"SELECT url, address FROM {BENCH_TABLE} WHERE address ILIKE '%calle 12345 (%' LIMIT 50"
+    ),
+}
+
+POPULATE = f"""
+INSERT INTO {BENCH_TABLE} (url, name, address, m2, bedrooms, bathrooms, price, source, scraped_at)
+SELECT
+    'https://www.' || s.source || '.com/bench/' || i || '/',
+    'Piso ' || i,
+    'Calle ' || (i % 20000) || ' (Barrio ' || (i % 300) || '), Ciudad ' || (i % 40),
+    round((35 + random() * 165)::numeric, 1),
+    1 + (i % 5),
+    1 + (i % 3),
+    round((40000 + random() * 760000)::numeric, -2),
+    s.source,
+    now() - random() * interval '90 days'
+FROM generate_series(1, :rows) AS i,
+LATERAL (SELECT (ARRAY['pisos', 'solvia'])[1 + i % 2] AS source) AS s
+"""
+
+
+def create_bench_table(rows: int) -> None:
+    """
+    Creates BENCH_TABLE with the apartment columns and its primary key only
+    (the layout before the secondary indexes) and fills it with `rows`
+    reproducible synthetic listings. The table is unlogged: it only exists
+    to be measured.
+    """
+    with connection_scope() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+        conn.execute(
+            text(
+                f"CREATE UNLOGGED TABLE {BENCH_TABLE} (LIKE apartment INCLUDING DEFAULTS)"
+            )
+        )
+        conn.execute(text("SELECT setseed(0.42)"))
+        conn.execute(text(POPULATE), {"rows": rows})
+        conn.execute(text(f"ALTER TABLE {BENCH_TABLE} ADD PRIMARY KEY (url)"))
+    with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"VACUUM ANALYZE {BENCH_TABLE}"))
+
+
+def fetch_all(conn, statement) -> list:
+    return conn.execute(statement).all()
+
+
+def run_queries(repeat: int) -> dict:
+    """
+    Times every query of QUERIES and records the top node of its plan.
+    """
+    results = {}
+    for name, query in QUERIES.items():
+        with connection_scope() as conn:
+            plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+            fetch = functools.partial(fetch_all, conn, text(query))
+            results[name] = measure(fetch, 1, repeat)
+        results[name]["plan"] = describe_plan(plan[0]["Plan"])
+        logger.info(
+            f"{name}: median {results[name]['median'] * 1000:.2f} ms ({results[name]['plan']})"
+        )
+    return results
+
+
+def describe_plan(node: dict) -> str:
+    """
+    Returns the scan nodes of a JSON plan, e.g. "Limit > Index Scan on ix_..."
+    """
+    label = node["Node Type"]
+    if "Index Name" in node:
+        label += f" on {node['Index Name']}"
+    children = node.get("Plans", [])
+    return label if not children else f"{label} > {describe_plan(children[0])}"
+
+
+def run_index_benchmark(rows: int, repeat: int, keep: bool = False) -> dict:
+    """
+    Measures QUERIES on a synthetic `rows`-row copy of the apartment table,
+    with the primary key only and then with the indexes of
+    apartment_index_statements.
+    Args:
+        rows (int): Number of synthetic listings.
+        repeat (int): Timed runs per query.
+        keep (bool): Keep the benchmark table instead of dropping it.
+    Returns:
+        dict: "before" and "after" results per query, and the speedups.
+    """
+    bootstrap_schema()
+    logger.info(f"Creating {BENCH_TABLE} with {rows:,} rows")
+    create_bench_table(rows)
+    try:
+        before = run_queries(repeat)
+        logger.info("Creating the secondary indexes")
+        with connection_scope() as conn:
+            for statement in apartment_index_statements(BENCH_TABLE):
+                conn.execute(text(statement))
+        engine = get_engine()
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"ANALYZE {BENCH_TABLE}"))
+        after = run_queries(repeat)
+    finally:
+        if not keep:
+            with connection_scope() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+
+    return {
+        "meta": {"created_at": datetime.now(UTC).isoformat(), "rows": rows},
+        "before": before,
+        "after": after,
+        "speedup": {
+            name: before[name]["median"] / after[name]["median"]
+            for name in QUERIES
+            if after[name]["median"] > 0
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Query latency on a synthetic apartment table before and after the indexes."
+    )
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", default="index_benchmark.json")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark table.")
+    args = parser.parse_args()
+
+    results = run_index_benchmark(args.rows, args.repeat, args.keep)
+    Path(args.output).write_text(json.dumps(results, indent=2), "utf-8")
+    for name, speedup in results["speedup"].items():
+        print(
+            f"{name:<20} {results['before'][name]['median'] * 1000:>10.2f} ms "
+            f"-> {results['after'][name]['median'] * 1000:>8.2f} ms  ({speedup:,.1f}x)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,469 @@
+import argparse
+import functools
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic import (
+    SYNTHETIC_URL_PREFIX,
+    generate_apartments,
+    render_pisos_page,
+    render_solvia_page,
+)
+from config.logger import get_logger
+from helpers.utils import (
+    HTML_PARSER,
+    extract_int,
+    extract_price,
+    extract_square_meters,
+    normalize_text,
+)
+
+logger = get_logger("benchmarks")
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+PISOS_FIXTURE = FIXTURES_DIR / "pisos_results.html"
+SOLVIA_FIXTURE = FIXTURES_DIR / "solvia_results.html"
+SOLVIA_FIXTURE_URL = "https://www.solvia.es/es/comprar/viviendas?texto=29620"
+
+DEFAULT_THRESHOLD = 0.10
+DEFAULT_REPEAT = 5
+DEFAULT_ROWS = 10_000
+
+
+def measure(func, items: int, repeat: int = DEFAULT_REPEAT, warmup: int = 1) -> dict:
+    """
+    Times `func()` `repeat` times after `warmup` untimed calls.
+    Args:
+        func (Callable[[], object]): The workload.
+        items (int): Number of items processed by one call, for the throughput.
+        repeat (int): Number of timed calls.
+        warmup (int): Number of untimed calls made first.
+    Returns:
+        dict: Median, min and max seconds per call, and items per second at the median.
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    median = statistics.median(samples)
+    return {
+        "median": median,
+        "min": min(samples),
+        "max": max(samples),
+        "repeat": repeat,
+        "items": items,
+        "items_per_second": items / median if median > 0 else 0.0,
+    }
+
+
+def bench_parse_pisos(repeat: int) -> dict:
+    from tasks.scrape_pisos import parse_pisos_html
+
+    html = PISOS_FIXTURE.read_bytes()
+    listings = len(parse_pisos_html(html)[0])
+    return measure(lambda: parse_pisos_html(html), listings, repeat * 4)
+
+
+def bench_parse_solvia(repeat: int) -> dict:
+    from tasks.scrape_solvia import parse_solvia_page
+
+    html = SOLVIA_FIXTURE.read_bytes()
+    listings = len(parse_solvia_page(html, SOLVIA_FIXTURE_URL)[0])
+    return measure(
+        lambda: parse_solvia_page(html, SOLVIA_FIXTURE_URL), listings, repeat * 4
+    )
+
+
+def bench_extractors(repeat: int, rows: int) -> dict:
+    apartments = list(generate_apartments(min(rows, 100_000)))
+    texts = [
+        (
+            f"  {a.price:,.0f} €  ".replace(",", "."),
+            f"{a.m2:g} m²",
+            f"{a.bedrooms} habs.",
+        )
+        for a in apartments
+    ]
+
+    def run():
+        for price, m2, bedrooms in texts:
+            extract_price(normalize_text(price))
+            extract_square_meters(m2)
+            extract_int(bedrooms)
+
+    return measure(run, len(texts), repeat)
+
+
+def bench_synthetic(repeat: int, rows: int) -> dict:
+    return measure(
+        lambda: sum(1 for _ in generate_apartments(rows)), rows, max(1, repeat // 2)
+    )
+
+
+def bench_embeddings(repeat: int, rows: int, workers: int, backend: str) -> dict:
+    from tasks.generate_embedding import generate_embeddings
+
+    apartments = list(generate_apartments(rows))
+    return measure(
+        lambda: generate_embeddings.fn(apartments, workers=workers, backend=backend),
+        rows,
+        max(1, repeat // 2),
+    )
+
+
+def synthetic_rows(rows: int, dim: int = 384) -> list:
+    """
+    Apartment_DB rows with random unit vectors, so loading can be measured
+    without running the model.
+    """
+    from tasks.generate_embedding import to_apartment_db
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((rows, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [to_apartment_db(a, v) for a, v in zip(generate_apartments(rows), vectors)]
+
+
+def synthetic_vector_index(rows: int, dim: int = 384):
+    """
+    VectorIndex of clustered random vectors (uniformly random ones have no
+    neighbours for IVF to find) with realistic listing attributes.
+    """
+    from helpers.vector_index import VectorIndex
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(1, rows // 500), dim), dtype=np.float32)
+    index = VectorIndex(dim)
+    for start in range(0, rows, 100_000):
+        size = min(100_000, rows - start)
+        noise = rng.standard_normal((size, dim), dtype=np.float32)
+        vectors = centers[rng.integers(0, len(centers), size)] + 0.7 * noise
+        m2 = rng.uniform(25, 250, size)
+        price = m2 * rng.uniform(2200, 5200, size)
+        bedrooms, bathrooms = rng.integers(0, 6, size), rng.integers(1, 4, size)
+        attributes = np.stack([price, m2, bedrooms, bathrooms], axis=1)
+        urls = [f"{SYNTHETIC_URL_PREFIX}/{start + i}/" for i in range(size)]
+        index.upsert(urls, vectors, attributes)
+    return index
+
+
+def bench_vector_search(repeat: int, rows: int, ivf: bool) -> dict:
+    index = synthetic_vector_index(rows)
+    if ivf:
+        index.train_ivf()
+    queries = index.vectors[np.random.default_rng(1).integers(0, rows, 64)] + 0.05
+    return measure(lambda: index.search(queries, k=10), len(queries), repeat)
+
+
+def bench_filtered_search(repeat: int, rows: int) -> dict:
+    from helpers.hybrid_search import HybridSearch
+    from models.pydantic_models import SearchFilters
+
+    index = synthetic_vector_index(rows)
+    queries = index.vectors[np.random.default_rng(1).integers(0, rows, 16)] + 0.05
+    filters = SearchFilters(max_price=250_000, min_bedrooms=2)
+
+    # No result cache, so repeated calls are measured; the first query builds the attribute index
+    search = HybridSearch(index, cache_size=0)
+    search.search(queries[0], filters=filters)
+
+    def run():
+        for query in queries:
+            search.search(query, filters=filters)
+
+    return measure(run, len(queries), repeat)
+
+
+def bench_load(repeat: int, rows: int, mode: str, reload: bool = False) -> dict:
+    """
+    Times loading `rows` synthetic apartments (market aggregates included)
+    into an empty table or, with `reload`, reloading the same unchanged
+    apartments, the common case of a recrawl. Also reports the WAL bytes
+    written by one call.
+    """
+    from sqlalchemy import delete, select, text
+
+    from config.postgres import connection_scope, session_scope
+    from config.schema import bootstrap_schema
+    from helpers.market_stats import (
+        apply_market_deltas,
+        market_deltas,
+        stored_market_rows,
+    )
+    from models.sqlalchemy_models import Apartment_DB, ApartmentPriceHistory_DB
+    from tasks.load_to_postgres import load_info_to_postgres
+
+    def cleanup():
+        with session_scope() as session:
+            # Takes the synthetic listings back out of the market aggregates
+            synthetic = session.execute(
+                select(Apartment_DB.url).where(
+                    Apartment_DB.url.like(f"{SYNTHETIC_URL_PREFIX}/%")
+                )
+            ).scalars()
+            connection = session.connection()
+            apply_market_deltas(
+                connection,
+                market_deltas(stored_market_rows(connection, list(synthetic)), {}),
+            )
+            for model in (ApartmentPriceHistory_DB, Apartment_DB):
+                session.execute(
+                    delete(model).where(model.url.like(f"{SYNTHETIC_URL_PREFIX}/%"))
+                )
+
+    def load():
+        # ORM objects are bound to their session after a merge: build fresh ones per call
+        load_info_to_postgres.fn(synthetic_rows(rows), mode=mode)
+
+    def run():
+        if not reload:
+            cleanup()
+        load()
+
+    def wal_lsn():
+        with connection_scope() as conn:
+            return conn.execute(text("SELECT pg_current_wal_lsn()")).scalar()
+
+    bootstrap_schema()
+    try:
+        cleanup()
+        if reload:
+            load()
+        result = measure(run, rows, max(1, repeat // 2))
+        if not reload:
+            cleanup()
+        start = wal_lsn()
+        load()
+        with connection_scope() as conn:
+            result["wal_bytes"] = int(
+                conn.execute(
+                    text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), :start)"),
+                    {"start": start},
+                ).scalar()
+            )
+        return result
+    finally:
+        cleanup()
+
+
+def run_benchmarks(args) -> dict:
+    """
+    Runs the selected benchmarks and returns the results document.
+    """
+    benchmarks = {
+        "parse_pisos_page": lambda: bench_parse_pisos(args.repeat),
+        "parse_solvia_page": lambda: bench_parse_solvia(args.repeat),
+        "utils_extractors": lambda: bench_extractors(args.repeat, args.rows),
+        "synthetic_apartments": lambda: bench_synthetic(args.repeat, args.rows),
+        "vector_search_exact": lambda: bench_vector_search(
+            args.repeat, args.rows, ivf=False
+        ),
+        "vector_search_ivf": lambda: bench_vector_search(
+            args.repeat, args.rows, ivf=True
+        ),
+        "filtered_search": lambda: bench_filtered_search(args.repeat, args.rows),
+    }
+    if args.embeddings:
+        benchmarks["generate_embeddings"] = lambda: bench_embeddings(
+            args.repeat, args.embedding_rows, args.embedding_workers, args.backend
+        )
+    if args.postgres:
+        for mode in ("upsert", "merge", "changes"):
+            benchmarks[f"load_{mode}"] = functools.partial(
+                bench_load, args.repeat, args.rows, mode
+            )
+        for mode in ("upsert", "changes"):
+            benchmarks[f"reload_{mode}"] = functools.partial(
+                bench_load, args.repeat, args.rows, mode, reload=True
+            )
+
+    selected = set(args.only) if args.only else None
+    results = {}
+    for name, bench in benchmarks.items():
+        if selected and name not in selected:
+            continue
+        logger.info(f"Running benchmark {name}")
+        try:
+            results[name] = bench()
+        except Exception as e:
+            logger.error(f"Benchmark {name} failed: {e}")
+            continue
+        logger.info(
+            f"{name}: median {results[name]['median'] * 1000:.2f} ms, "
+            f"{results[name]['items_per_second']:,.0f} items/s"
+        )
+
+    return {
+        "meta": {
+            "created_at": datetime.now(UTC).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "html_parser": HTML_PARSER,
+            "rows": args.rows,
+        },
+        "results": results,
+    }
+
+
+def compare_results(
+    baseline: dict, current: dict, threshold: float, only: list[str] | None = None
+) -> list[str]:
+    """
+    Compares median timings and returns the names of the benchmarks that got
+    slower than the baseline by more than `threshold` (a fraction), or that
+    are in the baseline but missing from `current` (failed or not run).
+    With `only`, baseline benchmarks outside of it are not expected.
+    """
+    regressions = []
+    for name in baseline["results"]:
+        if name not in current["results"] and (not only or name in only):
+            print(f"  {name:<24} missing from the current results  FAILED")
+            regressions.append(name)
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            print(f"  {name:<24} new benchmark, {result['median'] * 1000:10.2f} ms")
+            continue
+        change = (
+            result["median"] / reference["median"] - 1 if reference["median"] else 0.0
+        )
+        flag = (
+            "REGRESSION"
+            if change > threshold
+            else ("faster" if change < -threshold else "ok")
+        )
+        print(
+            f"  {name:<24} {reference['median'] * 1000:10.2f} ms -> "
+            f"{result['median'] * 1000:10.2f} ms  {change:+7.1%}  {flag}"
+        )
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def write_fixtures() -> None:
+    """
+    Regenerates the synthetic fixtures used when no recorded pages are available.
+    """
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    apartments = list(generate_apartments(42, seed=1))
+    PISOS_FIXTURE.write_text(
+        render_pisos_page(apartments[:30], total_results=812), "utf-8"
+    )
+    SOLVIA_FIXTURE.write_text(
+        render_solvia_page(apartments[30:], page=1, pages=5), "utf-8"
+    )
+    logger.info(f"Wrote fixtures to {FIXTURES_DIR}")
+
+
+def record_fixtures(run_id: str | None) -> None:
+    """
+    Replaces the fixtures with real pages taken from the HTML archive.
+    """
+    from helpers.html_archive import HtmlArchive
+
+    archive = HtmlArchive()
+    run_id = run_id or archive.list_runs()[-1]
+    entries = archive.read_manifest(run_id)
+    targets = {"parse_pisos_html": PISOS_FIXTURE, "parse_solvia_page": SOLVIA_FIXTURE}
+    for suffix, path in targets.items():
+        entry = next((e for e in entries if e["parser"].endswith(suffix)), None)
+        if entry is None:
+            logger.warning(f"Run {run_id} has no page parsed by {suffix}")
+            continue
+        path.write_bytes(archive.read_page(entry["sha256"]))
+        logger.info(f"Recorded {entry['url']} into {path.name}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_arguments(command):
+        command.add_argument(
+            "--only", nargs="*", help="Benchmarks to run (default: all)."
+        )
+        command.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+        command.add_argument(
+            "--rows", type=int, default=DEFAULT_ROWS, help="Synthetic rows (up to 1M)."
+        )
+        command.add_argument(
+            "--embeddings", action="store_true", help="Include generate_embeddings."
+        )
+        command.add_argument("--embedding-rows", type=int, default=1000)
+        command.add_argument("--embedding-workers", type=int, default=1)
+        command.add_argument("--backend", default="torch")
+        command.add_argument(
+            "--postgres",
+            action="store_true",
+            help="Include load_info_to_postgres against the configured (local) database.",
+        )
+
+    run = subparsers.add_parser(
+        "run", help="Run the benchmarks and write a JSON result."
+    )
+    add_run_arguments(run)
+    run.add_argument("--output", default="benchmark_results.json")
+
+    compare = subparsers.add_parser(
+        "compare",
+        help="Compare against a baseline; exits with 1 on regressions or failed benchmarks.",
+    )
+    compare.add_argument("baseline")
+    compare.add_argument(
+        "--current",
+        help="Existing result file to compare (default: run the benchmarks now).",
+    )
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    add_run_arguments(compare)
+
+    subparsers.add_parser("fixtures", help="Regenerate the synthetic HTML fixtures.")
+    record = subparsers.add_parser(
+        "record", help="Copy real pages from the HTML archive."
+    )
+    record.add_argument("--run", help="Archived run id (default: the latest).")
+
+    args = parser.parse_args()
+
+    if args.command == "fixtures":
+        write_fixtures()
+        return 0
+    if args.command == "record":
+        record_fixtures(args.run)
+        return 0
+
+    if args.command == "run":
+        results = run_benchmarks(args)
+        Path(args.output).write_text(json.dumps(results, indent=2), "utf-8")
+        logger.info(f"Wrote {len(results['results'])} results to {args.output}")
+        return 0
+
+    baseline = json.loads(Path(args.baseline).read_text("utf-8"))
+    if args.current:
+        current = json.loads(Path(args.current).read_text("utf-8"))
+    else:
+        args.only = args.only or list(baseline["results"])
+        current = run_benchmarks(args)
+    regressions = compare_results(baseline, current, args.threshold, args.only)
+    if regressions:
+        print(
+            f"{len(regressions)} regression(s) above {args.threshold:.0%} or failure(s): "
+            f"{', '.join(regressions)}"
+        )
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
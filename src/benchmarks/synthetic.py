@@ -0,0 +1,175 @@
+import random
+import zlib
+from collections.abc import Iterator
+from html import escape
+
+from models.pydantic_models import Apartment
+
+SYNTHETIC_URL_PREFIX = "https://bench.invalid"
+
+STREETS = (
+    "Calle Larios",
+    "Avenida de Andalucía",
+    "Paseo Marítimo Antonio Banderas",
+    "Calle San Miguel",
+    "Avenida Carlota Alessandri",
+    "Calle Cruz",
+    "Avenida Palma de Mallorca",
+    "Calle Hoyo",
+)
+AREAS = (
+    ("Centro", "29015", "Málaga"),
+    ("La Carihuela", "29620", "Torremolinos"),
+    ("El Pinillo", "29620", "Torremolinos"),
+    ("Huelin", "29002", "Málaga"),
+    ("Teatinos", "29010", "Málaga"),
+    ("Montemar", "29620", "Torremolinos"),
+    ("El Limonar", "29016", "Málaga"),
+)
+KINDS = ("Piso", "Ático", "Apartamento", "Estudio", "Dúplex", "Casa adosada")
+
+
+def generate_apartments(count: int, seed: int = 0) -> Iterator[Apartment]:
+    """
+    Yields `count` reproducible synthetic apartments with realistic value
+    ranges. Items are generated lazily, so 1M rows do not have to fit in memory.
+    Args:
+        count (int): Number of apartments.
+        seed (int): Random seed; the same seed gives the same apartments.
+    Yields:
+        Apartment: One synthetic apartment per row, with a unique URL. Studios
+            have 0 bedrooms, listed as "0 habs." like on the portals.
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        area, zip_code, city = rng.choice(AREAS)
+        bedrooms = rng.choices((0, 1, 2, 3, 4, 5), weights=(4, 18, 35, 28, 11, 4))[0]
+        m2 = round(max(25.0, rng.gauss(40 + bedrooms * 25, 15)), 1)
+        price = round(m2 * rng.uniform(2200, 5200), -2)
+        yield Apartment(
+            url=f"{SYNTHETIC_URL_PREFIX}/{seed}/{i}/",
+            name=f"{rng.choice(KINDS)} en venta en {rng.choice(STREETS)}",
+            address=f"{area} ({city}) {zip_code}",
+            m2=m2,
+            bedrooms=bedrooms,
+            bathrooms=max(1, bedrooms // 2 + rng.randint(0, 1)),
+            price=price,
+        )
+
+
+def stable_id(text: str) -> int:
+    """
+    Deterministic numeric id for a string (unlike `hash`, stable across processes).
+    """
+    return zlib.crc32(text.encode("utf-8"))
+
+
+def format_price(price: float) -> str:
+    return f"{price:,.0f} €".replace(",", ".")
+
+
+def render_pisos_page(apartments: list[Apartment], total_results: int) -> str:
+    """
+    Renders a pisos.com results page with the markup read by `parse_pisos_html`.
+    """
+    cards = []
+    for apartment in apartments:
+        path = apartment.url.removeprefix(SYNTHETIC_URL_PREFIX)
+        cards.append(
+            f"""
+      <div class="ad-preview" data-lnk-href="{escape(path)}" data-id="{stable_id(path)}">
+        <div class="ad-preview__gallery"><img src="/img/{stable_id(path) % 1000}.jpg" alt=""></div>
+        <div class="ad-preview__info">
+          <div class="ad-preview__section">
+            <a class="ad-preview__title" href="{escape(path)}">{escape(apartment.name)}</a>
+            <p class="ad-preview__subtitle">{escape(apartment.address)}</p>
+          </div>
+          <div class="ad-preview__section ad-preview__section--has-textlink">
+            <span class="ad-preview__price">{format_price(apartment.price)}</span>
+          </div>
+          <div class="ad-preview__section">
+            <p class="ad-preview__char p-sm">{apartment.bedrooms} habs.</p>
+            <p class="ad-preview__char p-sm">{apartment.bathrooms} baños</p>
+            <p class="ad-preview__char p-sm">{apartment.m2:g} m²</p>
+            <p class="ad-preview__char p-sm">Planta {stable_id(path) % 8}ª</p>
+          </div>
+          <p class="ad-preview__description">Luminoso inmueble reformado, cerca de
+          transporte público, colegios y zonas comerciales. Ideal como primera
+          vivienda o inversión.</p>
+        </div>
+      </div>"""
+        )
+    return f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+  <meta charset="utf-8">
+  <title>Pisos en venta - pisos.com</title>
+  <link rel="stylesheet" href="/css/main.css">
+  <script src="/js/vendor.js" defer></script>
+</head>
+<body>
+  <header class="header"><nav class="menu"><a href="/">Inicio</a><a href="/venta/">Comprar</a>
+  <a href="/alquiler/">Alquilar</a><a href="/obra-nueva/">Obra nueva</a></nav></header>
+  <main>
+    <div class="grid">
+      <div class="grid__wrapper">{"".join(cards)}
+      </div>
+    </div>
+    <div class="pagination">
+      <div class="pagination__counter">1-{len(apartments)} de {total_results} resultados</div>
+      <div class="pagination__next"><a href="2/">Siguiente</a></div>
+    </div>
+  </main>
+  <footer class="footer"><p>© pisos.com</p></footer>
+</body>
+</html>
+"""
+
+
+def render_solvia_page(apartments: list[Apartment], page: int, pages: int) -> str:
+    """
+    Renders a Solvia results page with the markup read by `parse_solvia_page`.
+    """
+    cards = []
+    for apartment in apartments:
+        cards.append(
+            f"""
+      <div class="col-md-4 house-card">
+        <div class="house-img"><img src="/media/{stable_id(apartment.url) % 1000}.jpg" alt=""></div>
+        <div class="house-info">
+          <a href="{escape(apartment.url)}">
+            <h3 class="build-name">{escape(apartment.name)}</h3>
+          </a>
+          <div class="build-address"><span>{escape(apartment.address)}</span><span>Málaga</span></div>
+          <ul class="build-tags">
+            <li>{apartment.m2:g} m²</li>
+            <li>{apartment.bedrooms} dormitorios</li>
+            <li>{apartment.bathrooms} baños</li>
+          </ul>
+          <div class="build-price"><span class="final-price mb-1">{format_price(apartment.price)}</span></div>
+        </div>
+      </div>"""
+        )
+    links = "".join(
+        f'<li><a href="/es/comprar/viviendas?texto=29620&amp;page={n}">{n}</a></li>'
+        for n in range(1, pages + 1)
+        if n != page
+    )
+    return f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+  <meta charset="utf-8">
+  <title>Viviendas en venta - Solvia</title>
+  <link rel="stylesheet" href="/static/css/app.css">
+</head>
+<body>
+  <header><nav class="navbar"><a href="/es/comprar">Comprar</a><a href="/es/alquilar">Alquilar</a></nav></header>
+  <section class="results">
+    <div class="row">{"".join(cards)}
+    </div>
+    <ul class="pagination">{links}</ul>
+  </section>
+  <footer><p>© Solvia</p></footer>
+</body>
+</html>
+"""
@@ -9,6 +9,7 @@ load_dotenv()
 logger = get_logger("minio")
 
 BUCKET = "reports"
+ARCHIVE_BUCKET = "html-archive"
 
 
 def get_minio():
@@ -23,20 +24,21 @@ def get_minio():
     )
 
 
-def setup_minio_buckets(client: Minio):
+def setup_minio_buckets(client: Minio, bucket: str = BUCKET):
     """Create required buckets if they don't exist.
     Args:
         client (Minio): Minio client instance.
+        bucket (str): Bucket to create. Defaults to the reports bucket.
     Raises:
         S3Error: If there is an error creating or verifying the bucket.
     """
     try:
-        if not client.bucket_exists(BUCKET):
-            logger.info(f"Bucket '{BUCKET}' not found. Creating it...")
-            client.make_bucket(BUCKET)
-            logger.info(f"Bucket '{BUCKET}' created successfully.")
+        if not client.bucket_exists(bucket):
+            logger.info(f"Bucket '{bucket}' not found. Creating it...")
+            client.make_bucket(bucket)
+            logger.info(f"Bucket '{bucket}' created successfully.")
         else:
-            logger.info(f"Bucket '{BUCKET}' already exists.")
+            logger.info(f"Bucket '{bucket}' already exists.")
     except S3Error as e:
-        logger.error(f"Failed to create or verify bucket '{BUCKET}': {str(e)}")
+        logger.error(f"Failed to create or verify bucket '{bucket}': {str(e)}")
         raise
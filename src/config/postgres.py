@@ -1,22 +1,40 @@
 import os
+import threading
+import time
+from contextlib import contextmanager
+
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 
 load_dotenv()
 
+POOL_SIZE = int(os.getenv("POSTGRES_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("POSTGRES_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("POSTGRES_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("POSTGRES_POOL_PRE_PING", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
 
-def get_engine():
+_engines: dict[str, Engine] = {}
+_wait_stats: dict[Engine, dict[str, float]] = {}
+_engines_lock = threading.Lock()
+
+
+def get_connection_string() -> str:
     """
-    Creates and returns a SQLAlchemy engine for connecting to a PostgreSQL database.
-    The connection parameters are retrieved from environment variables:
+    Builds the PostgreSQL connection string from environment variables:
     - POSTGRES_USER: The username for the database (default: 'postgres').
     - POSTGRES_PASSWORD: The password for the database (default: 'mysecretpassword').
     - POSTGRES_HOST: The hostname of the database server (default: 'localhost').
     - POSTGRES_PORT: The port number of the database server (default: '5432').
     - POSTGRES_DB: The name of the database (default: 'postgres').
     Returns:
-        sqlalchemy.engine.base.Engine: A SQLAlchemy engine instance configured for the PostgreSQL database.
+        str: A SQLAlchemy psycopg2 connection string.
     """
     user = os.getenv("POSTGRES_USER", "postgres")
     password = os.getenv("POSTGRES_PASSWORD", "mysecretpassword")
@@ -24,9 +42,49 @@ def get_engine():
     port = os.getenv("POSTGRES_PORT", "5432")
     db = os.getenv("POSTGRES_DB", "postgres")
 
-    connection_string = f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{db}"
+    return f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{db}"
 
-    return create_engine(connection_string)
+
+def get_engine():
+    """
+    Returns the process-wide SQLAlchemy engine for the configured PostgreSQL database.
+    The engine is created on first use and shared by every later caller, so all
+    tasks running in a worker reuse the same connection pool. The pool is tuned
+    with POSTGRES_POOL_SIZE, POSTGRES_MAX_OVERFLOW, POSTGRES_POOL_TIMEOUT,
+    POSTGRES_POOL_RECYCLE and POSTGRES_POOL_PRE_PING.
+    Returns:
+        sqlalchemy.engine.base.Engine: A SQLAlchemy engine instance configured for the PostgreSQL database.
+    """
+    connection_string = get_connection_string()
+
+    with _engines_lock:
+        engine = _engines.get(connection_string)
+        if engine is None:
+            engine = create_engine(
+                connection_string,
+                pool_size=POOL_SIZE,
+                max_overflow=MAX_OVERFLOW,
+                pool_timeout=POOL_TIMEOUT,
+                pool_recycle=POOL_RECYCLE,
+                pool_pre_ping=POOL_PRE_PING,
+            )
+            _engines[connection_string] = engine
+            _wait_stats[engine] = {
+                "acquisitions": 0,
+                "total_wait_seconds": 0.0,
+                "max_wait_seconds": 0.0,
+            }
+    return engine
+
+
+def _record_wait(engine, seconds: float) -> None:
+    with _engines_lock:
+        stats = _wait_stats.get(engine)
+        if stats is None:
+            return
+        stats["acquisitions"] += 1
+        stats["total_wait_seconds"] += seconds
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], seconds)
 
 
 def get_session(engine):
@@ -39,3 +97,78 @@ def get_session(engine):
     """
     Session = sessionmaker(bind=engine)
     return Session()
+
+
+@contextmanager
+def session_scope(engine=None):
+    """
+    Provides a session that is committed on success, rolled back on error and
+    always closed. The pooled connection is checked out up front so the time
+    spent waiting for it is recorded in the pool stats.
+    Args:
+        engine (sqlalchemy.engine.base.Engine | None): Engine to use. Defaults to the shared engine.
+    Yields:
+        sqlalchemy.orm.session.Session: The session.
+    """
+    engine = engine or get_engine()
+    session = get_session(engine)
+    try:
+        start = time.perf_counter()
+        session.connection()
+        _record_wait(engine, time.perf_counter() - start)
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+@contextmanager
+def connection_scope(engine=None):
+    """
+    Provides a Core connection inside a transaction that commits on success
+    and rolls back on error, recording the pool wait time.
+    Args:
+        engine (sqlalchemy.engine.base.Engine | None): Engine to use. Defaults to the shared engine.
+    Yields:
+        sqlalchemy.engine.Connection: The connection.
+    """
+    engine = engine or get_engine()
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        _record_wait(engine, time.perf_counter() - start)
+        with conn.begin():
+            yield conn
+
+
+def get_pool_stats(engine=None) -> dict:
+    """
+    Returns a snapshot of the connection pool of an engine.
+    Args:
+        engine (sqlalchemy.engine.base.Engine | None): Engine to inspect. Defaults to the shared engine.
+    Returns:
+        dict: Pool size, checked-in and checked-out connections, current overflow,
+        and the number of recorded acquisitions with their total and maximum wait.
+    """
+    engine = engine or get_engine()
+    pool = engine.pool
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+    with _engines_lock:
+        stats.update(_wait_stats.get(engine, {}))
+    return stats
+
+
+def dispose_engines() -> None:
+    """
+    Closes every pooled connection of the registered engines.
+    """
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
@@ -0,0 +1,219 @@
+import threading
+from datetime import UTC, datetime
+
+from sqlalchemy import text
+
+from models.sources import SOURCE_PATTERN, UNKNOWN_SOURCE
+from models.sqlalchemy_models import Base
+
+from .logger import get_logger
+from .postgres import get_engine
+
+logger = get_logger("schema")
+
+# Secondary indexes of the apartment table for the common filters: name -> definition.
+# `last_seen` is deliberately not indexed, so bumping it stays a HOT update.
+APARTMENT_INDEXES = {
+    "price": "(price)",
+    "m2": "(m2)",
+    "bedrooms_price": "(bedrooms, price)",
+    "source_scraped_at": "(source, scraped_at)",
+}
+# Listing source computed in SQL, as models.sources.listing_source does. The
+# colons are escaped so `text()` does not read "(?:www" as a bind parameter.
+SOURCE_SQL = (
+    "coalesce(substring(lower(btrim(url)) from '"
+    + SOURCE_PATTERN.replace(":", "\\:")
+    + f"'), '{UNKNOWN_SOURCE}')"
+)
+
+
+def apartment_index_statements(table: str = "apartment") -> list[str]:
+    """
+    Returns the idempotent statements creating APARTMENT_INDEXES on `table`,
+    plus a trigram index for address searches (ILIKE '%...%') when the
+    pg_trgm extension is available; without it they stay sequential scans.
+    """
+    statements = [
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_{name} ON {table} {definition}"
+        for name, definition in APARTMENT_INDEXES.items()
+    ]
+    statements += [
+        (
+            "DO $$ BEGIN CREATE EXTENSION IF NOT EXISTS pg_trgm; "
+            "EXCEPTION WHEN OTHERS THEN RAISE NOTICE 'pg_trgm is not available'; END $$"
+        ),
+        (
+            "DO $$ BEGIN IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN "
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_address_trgm ON {table} "
+            "USING gin (address gin_trgm_ops); END IF; END $$"
+        ),
+    ]
+    return statements
+
+
+# Ordered, append-only list of schema migrations: (version, statements).
+# Tables created from scratch by `create_all` already have the latest layout,
+# so every statement must be idempotent (IF NOT EXISTS / IF EXISTS).
+MIGRATIONS: list[tuple[str, list[str]]] = [
+    (
+        "0001_apartment_embedding_packed",
+        ["ALTER TABLE apartment ADD COLUMN IF NOT EXISTS embedding_packed BYTEA"],
+    ),
+    (
+        "0002_apartment_cluster_id",
+        [
+            "ALTER TABLE apartment ADD COLUMN IF NOT EXISTS cluster_id VARCHAR(16)",
+            "CREATE INDEX IF NOT EXISTS ix_apartment_cluster_id ON apartment (cluster_id)",
+        ],
+    ),
+    (
+        "0003_apartment_change_tracking",
+        [
+            "ALTER TABLE apartment ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32)",
+            "ALTER TABLE apartment ADD COLUMN IF NOT EXISTS first_seen TIMESTAMPTZ DEFAULT now()",
+            "ALTER TABLE apartment ADD COLUMN IF NOT EXISTS last_seen TIMESTAMPTZ DEFAULT now()",
+        ],
+    ),
+    (
+        "0004_apartment_source_and_indexes",
+        [
+            "ALTER TABLE apartment ADD COLUMN IF NOT EXISTS source VARCHAR(32)",
+            "ALTER TABLE apartment ADD COLUMN IF NOT EXISTS scraped_at TIMESTAMPTZ",
+            f"UPDATE apartment SET source = {SOURCE_SQL} WHERE source IS NULL",
+            "UPDATE apartment SET scraped_at = coalesce(last_seen, now()) WHERE scraped_at IS NULL",
+            "ALTER TABLE apartment ALTER COLUMN scraped_at SET DEFAULT now()",
+            *apartment_index_statements(),
+        ],
+    ),
+]
+
+# Arbitrary key serializing concurrent bootstraps across processes.
+SCHEMA_LOCK_ID = 7_203_511
+
+_bootstrapped: set = set()
+_bootstrap_lock = threading.Lock()
+_history_partitions: set = set()
+_key_columns: dict = {}
+
+
+def apply_migrations(conn) -> list[str]:
+    """
+    Applies the pending entries of MIGRATIONS on an open transaction and
+    records them in `schema_migrations`.
+    Args:
+        conn (sqlalchemy.engine.Connection): Connection inside a transaction.
+    Returns:
+        list[str]: The versions applied by this call.
+    """
+    conn.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version TEXT PRIMARY KEY, "
+            "applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        )
+    )
+    applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+    newly_applied = []
+    for version, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        logger.info(f"Applying schema migration {version}")
+        for statement in statements:
+            conn.execute(text(statement))
+        conn.execute(
+            text("INSERT INTO schema_migrations (version) VALUES (:version)"),
+            {"version": version},
+        )
+        newly_applied.append(version)
+    return newly_applied
+
+
+def bootstrap_schema(engine=None) -> None:
+    """
+    Creates missing tables and applies pending migrations once per process.
+    Later calls with the same engine return immediately, so tasks can call it
+    on every run at no cost. A Postgres advisory lock keeps concurrent workers
+    from migrating at the same time.
+    Args:
+        engine (sqlalchemy.engine.base.Engine | None): Engine to use. Defaults to the shared engine.
+    """
+    engine = engine or get_engine()
+    if engine in _bootstrapped:
+        return
+
+    with _bootstrap_lock:
+        if engine in _bootstrapped:
+            return
+        with engine.begin() as conn:
+            conn.execute(
+                text("SELECT pg_advisory_xact_lock(:id)"), {"id": SCHEMA_LOCK_ID}
+            )
+            Base.metadata.create_all(conn)
+            applied = apply_migrations(conn)
+        if applied:
+            logger.info(f"Applied {len(applied)} schema migrations")
+        _bootstrapped.add(engine)
+
+
+def apartment_key_columns(engine=None) -> tuple[str, ...]:
+    """
+    Returns the unique key apartment upserts conflict on: ("url",), or
+    ("url", "source") once the table is partitioned by source, since the
+    unique keys of a partitioned table must include the partition key.
+    Looked up once per process and engine.
+    Args:
+        engine (sqlalchemy.engine.base.Engine | None): Engine to use. Defaults to the shared engine.
+    """
+    engine = engine or get_engine()
+    if engine not in _key_columns:
+        with engine.connect() as conn:
+            partitioned = conn.execute(
+                text(
+                    "SELECT 1 FROM pg_partitioned_table "
+                    "WHERE partrelid = to_regclass('apartment')"
+                )
+            ).first()
+        _key_columns[engine] = ("url", "source") if partitioned else ("url",)
+    return _key_columns[engine]
+
+
+def forget_apartment_key_columns(engine) -> None:
+    """
+    Drops the cached apartment_key_columns of an engine after the table layout changed.
+    """
+    _key_columns.pop(engine, None)
+
+
+def history_partition(moment: datetime) -> tuple[str, datetime, datetime]:
+    """
+    Returns the name and UTC bounds of the monthly apartment_price_history
+    partition holding `moment`.
+    """
+    moment = moment.astimezone(UTC)
+    start = datetime(moment.year, moment.month, 1, tzinfo=UTC)
+    end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=UTC)
+    return f"apartment_price_history_{start:%Y_%m}", start, end
+
+
+def ensure_history_partition(engine, moment: datetime) -> None:
+    """
+    Creates the monthly partition of apartment_price_history that holds
+    `moment`, once per process and month.
+    Args:
+        engine (sqlalchemy.engine.base.Engine): The database engine.
+        moment (datetime): A timezone-aware timestamp of the events to write.
+    """
+    name, start, end = history_partition(moment)
+    if (engine, name) in _history_partitions:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF apartment_price_history "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        )
+    _history_partitions.add((engine, name))
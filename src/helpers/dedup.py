@@ -0,0 +1,288 @@
+import hashlib
+import math
+import os
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+from dotenv import load_dotenv
+
+from config.logger import get_logger
+
+load_dotenv()
+
+logger = get_logger("dedup")
+
+# Cosine similarity above which two listings in the same block are duplicates.
+SIMILARITY_THRESHOLD = float(os.getenv("DEDUP_SIMILARITY", "0.9"))
+# Listings compared with each other differ by less than this relative price...
+PRICE_TOLERANCE = float(os.getenv("DEDUP_PRICE_TOLERANCE", "0.05"))
+# ...and by less than this many square meters.
+M2_TOLERANCE = float(os.getenv("DEDUP_M2_TOLERANCE", "5"))
+
+# Blocks up to this size are compared exhaustively with one matrix product;
+# larger ones are split with random-hyperplane LSH and only listings sharing
+# an LSH bucket are compared. Buckets larger than MAX_BUCKET_SIZE are skipped.
+LSH_MIN_BLOCK = 512
+LSH_BANDS = 16  # of 8 bits each: one signature byte per band
+LSH_SEED = 0
+MAX_BUCKET_SIZE = 2000
+# Candidate pairs scored per vectorized step.
+PAIR_CHUNK_SIZE = 100_000
+
+ADDRESS_STOPWORDS = {
+    "calle",
+    "avenida",
+    "avda",
+    "paseo",
+    "plaza",
+    "carretera",
+    "camino",
+    "urbanizacion",
+    "barrio",
+    "distrito",
+    "zona",
+    "del",
+    "las",
+    "los",
+    "con",
+    "sin",
+    "venta",
+    "piso",
+    "pisos",
+    "casa",
+    "atico",
+    "apartamento",
+    "estudio",
+    "duplex",
+    "chalet",
+    "vivienda",
+}
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def address_tokens(address: str) -> set[str]:
+    """
+    Normalized, informative tokens of an address: lowercase, without
+    accents, stopwords or tokens shorter than 3 characters.
+    """
+    text = (
+        unicodedata.normalize("NFKD", address or "")
+        .encode("ascii", "ignore")
+        .decode()
+        .lower()
+    )
+    return {
+        token
+        for token in _TOKEN.findall(text)
+        if len(token) >= 3 and token not in ADDRESS_STOPWORDS
+    }
+
+
+def staggered_cells(value: float, width: float) -> tuple[int, int]:
+    """
+    Cells of `value` in two grids of cells `width` wide, offset by half a
+    cell. Two values closer than width / 2 share a cell in at least one grid.
+    """
+    return math.floor(value / width), math.floor(value / width + 0.5)
+
+
+def block_keys(address: str, price: float | None, m2: float | None) -> list[tuple]:
+    """
+    Blocking keys of a listing: (price cell, m2 cell, address token) for
+    both grid offsets of each band. Listings whose prices differ by less
+    than PRICE_TOLERANCE, whose sizes differ by less than M2_TOLERANCE and
+    that share an address token always share a key. Listings without a
+    price or size cannot be blocked and have no keys.
+    """
+    if not price or not m2 or price <= 0 or m2 <= 0:
+        return []
+    price_cells = staggered_cells(math.log(price), 2 * math.log1p(PRICE_TOLERANCE))
+    m2_cells = staggered_cells(m2, 2 * M2_TOLERANCE)
+    return [
+        (price_grid, price_cell, m2_grid, m2_cell, token)
+        for token in address_tokens(address)
+        for price_grid, price_cell in enumerate(price_cells)
+        for m2_grid, m2_cell in enumerate(m2_cells)
+    ]
+
+
+class DisjointSet:
+    """
+    Union-find over 0..n-1 with path halving and union by size.
+    """
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> bool:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+
+def simhash_bands(vectors: np.ndarray) -> np.ndarray:
+    """
+    Random-hyperplane LSH signatures: one byte per band, 8 sign bits each.
+    Vectors at a small angle agree on most bits, so they share at least one
+    band with high probability.
+    """
+    planes = np.random.default_rng(LSH_SEED).standard_normal(
+        (vectors.shape[1], LSH_BANDS * 8), dtype=np.float32
+    )
+    return np.packbits(vectors @ planes > 0, axis=1)
+
+
+def bucket_pairs(
+    members: np.ndarray, keys: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns every pair of members sharing a key, without a Python loop per
+    bucket. Buckets larger than MAX_BUCKET_SIZE are dropped.
+    """
+    order = np.argsort(keys, kind="stable")
+    members, keys = members[order], keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(keys)])
+    keep = np.repeat(sizes <= MAX_BUCKET_SIZE, sizes)
+    members, keys = members[keep], keys[keep]
+    firsts, seconds = [], []
+    # Pairs at distance `offset` in the sorted order, within the same bucket
+    for offset in range(1, int(sizes[sizes <= MAX_BUCKET_SIZE].max(initial=1))):
+        same = keys[offset:] == keys[:-offset]
+        if not same.any():
+            break
+        firsts.append(members[:-offset][same])
+        seconds.append(members[offset:][same])
+    if not firsts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def cluster_listings(
+    addresses: list[str],
+    prices: list[float | None],
+    m2s: list[float | None],
+    vectors: np.ndarray,
+    threshold: float = SIMILARITY_THRESHOLD,
+) -> np.ndarray:
+    """
+    Groups listings into near-duplicate clusters.
+    Listings are first blocked by price band, size band and address token,
+    so only listings that could be the same flat are compared. Blocks up to
+    LSH_MIN_BLOCK listings are compared exhaustively; larger ones only
+    compare listings sharing an LSH bucket. Pairs whose embeddings have a
+    cosine similarity of at least `threshold` are merged with union-find,
+    so duplicates are transitive. The work grows with the number of
+    listings times the block size, not quadratically.
+    Args:
+        addresses (list[str]): Listing addresses.
+        prices (list[float | None]): Listing prices.
+        m2s (list[float | None]): Listing sizes.
+        vectors (np.ndarray): One embedding per listing.
+        threshold (float): Minimum cosine similarity of duplicates.
+    Returns:
+        np.ndarray: The cluster label of each listing: the index of one of its members.
+    """
+    count = len(addresses)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms > 0, norms, 1.0)
+
+    key_ids: dict[tuple, int] = {}
+    block_items, block_ids = [], []
+    for i, (address, price, m2) in enumerate(zip(addresses, prices, m2s)):
+        for key in block_keys(address, price, m2):
+            block_items.append(i)
+            block_ids.append(key_ids.setdefault(key, len(key_ids)))
+    clusters = DisjointSet(count)
+    if not block_items:
+        return np.arange(count, dtype=np.int64)
+
+    items, blocks = np.asarray(block_items), np.asarray(block_ids)
+    order = np.argsort(blocks, kind="stable")
+    items, blocks = items[order], blocks[order]
+    starts = np.flatnonzero(np.r_[True, blocks[1:] != blocks[:-1]])
+    ends = np.r_[starts[1:], len(blocks)]
+
+    def merge_similar(firsts: np.ndarray, seconds: np.ndarray) -> None:
+        for start in range(0, len(firsts), PAIR_CHUNK_SIZE):
+            a = firsts[start : start + PAIR_CHUNK_SIZE]
+            b = seconds[start : start + PAIR_CHUNK_SIZE]
+            similar = np.einsum("ij,ij->i", vectors[a], vectors[b]) >= threshold
+            for x, y in zip(a[similar].tolist(), b[similar].tolist()):
+                clusters.union(x, y)
+
+    # Several tokens of the same listings often give identical blocks
+    seen: set[bytes] = set()
+    large: list[np.ndarray] = []
+    compared = 0
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if end - start < 2:
+            continue
+        rows = items[start:end]
+        fingerprint = rows.tobytes()
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        if len(rows) > LSH_MIN_BLOCK:
+            large.append(rows)
+            continue
+        similar = np.triu(vectors[rows] @ vectors[rows].T >= threshold, 1)
+        for a, b in zip(*np.nonzero(similar)):
+            clusters.union(int(rows[a]), int(rows[b]))
+        compared += len(rows) * (len(rows) - 1) // 2
+
+    if large:
+        signatures = simhash_bands(vectors)
+        for block, rows in enumerate(large):
+            # One bucket per (block, band, signature byte)
+            keys = (block * LSH_BANDS + np.arange(LSH_BANDS)) * 256 + signatures[rows]
+            members = np.repeat(rows, LSH_BANDS)
+            firsts, seconds = bucket_pairs(members, keys.ravel().astype(np.int64))
+            merge_similar(firsts, seconds)
+            compared += len(firsts)
+
+    logger.debug(f"Compared {compared} candidate pairs in {len(seen)} blocks")
+    return np.array([clusters.find(i) for i in range(count)], dtype=np.int64)
+
+
+def cluster_key(url: str) -> str:
+    """
+    Cluster id derived from a member URL: stable across runs as long as the
+    cluster keeps its smallest URL.
+    """
+    return hashlib.blake2b(
+        url.strip().lower().encode("utf-8"), digest_size=8
+    ).hexdigest()
+
+
+def cluster_ids(urls: list[str], labels: np.ndarray) -> list[str | None]:
+    """
+    Turns cluster labels into cluster ids: the key of the smallest URL of
+    each cluster with two or more listings, and None for listings without
+    duplicates.
+    """
+    members: dict[int, list[str]] = defaultdict(list)
+    for url, label in zip(urls, labels.tolist()):
+        members[label].append(url)
+    keys = {
+        label: cluster_key(min(group, key=lambda url: url.strip().lower()))
+        for label, group in members.items()
+        if len(group) > 1
+    }
+    return [keys.get(label) for label in labels.tolist()]
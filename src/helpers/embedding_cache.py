@@ -0,0 +1,308 @@
+import hashlib
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from config.logger import get_logger
+from config.postgres import connection_scope, get_engine
+from config.schema import bootstrap_schema
+from models.sqlalchemy_models import EmbeddingCache_DB
+
+load_dotenv()
+
+logger = get_logger("embedding_cache")
+
+DEFAULT_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+DEFAULT_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+DEFAULT_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_DAYS", "30")) * 86400
+
+# Keeps SQL parameter lists well below the driver limits.
+QUERY_CHUNK_SIZE = 500
+
+
+def cache_key(text: str, model_name: str) -> str:
+    """
+    Builds the cache key for a text embedded with a given model.
+    Args:
+        text (str): The exact text that is sent to the model.
+        model_name (str): The name of the embedding model.
+    Returns:
+        str: A hex SHA-256 digest of the model name and the text.
+    """
+    return hashlib.sha256(f"{model_name}\x00{text}".encode()).hexdigest()
+
+
+def _utc_now() -> datetime:
+    # Naive UTC, like the timestamps already stored in EmbeddingCache_DB
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def _chunks(items: list, size: int = QUERY_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class EmbeddingCacheBackend(ABC):
+    """
+    Storage for cached embeddings keyed by `cache_key`.
+    Backends apply TTL expiry on read and LRU eviction on `evict`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """Returns the non-expired vectors found for `keys`."""
+
+    @abstractmethod
+    def put_many(self, items: dict[str, np.ndarray]) -> None:
+        """Stores or replaces the vectors in `items`."""
+
+    @abstractmethod
+    def evict(self) -> int:
+        """Removes expired and least recently used entries. Returns the number removed."""
+
+
+class SQLiteEmbeddingCache(EmbeddingCacheBackend):
+    """
+    Local on-disk backend stored in a single SQLite file.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_access "
+                "ON embedding_cache (last_access)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        now = time.time()
+        oldest = now - self.ttl_seconds
+        with self._connect() as conn:
+            for chunk in _chunks(keys):
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embedding_cache "
+                    f"WHERE key IN ({placeholders}) AND created_at >= ?",
+                    (*chunk, oldest),
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            conn.executemany(
+                "UPDATE embedding_cache SET last_access = ? WHERE key = ?",
+                [(now, key) for key in found],
+            )
+        return found
+
+    def put_many(self, items: dict[str, np.ndarray]) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache "
+                "(key, vector, created_at, last_access) VALUES (?, ?, ?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes(), now, now)
+                    for key, vector in items.items()
+                ],
+            )
+
+    def evict(self) -> int:
+        with self._connect() as conn:
+            removed = conn.execute(
+                "DELETE FROM embedding_cache WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,),
+            ).rowcount
+            (count,) = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    "DELETE FROM embedding_cache WHERE key IN ("
+                    "SELECT key FROM embedding_cache ORDER BY last_access ASC LIMIT ?)",
+                    (excess,),
+                ).rowcount
+        return removed
+
+
+class PostgresEmbeddingCache(EmbeddingCacheBackend):
+    """
+    Backend stored in the `embedding_cache` table next to `apartment`.
+    """
+
+    def __init__(self, engine=None, **kwargs):
+        super().__init__(**kwargs)
+        self.engine = engine or get_engine()
+        bootstrap_schema(self.engine)
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        oldest = _utc_now() - timedelta(seconds=self.ttl_seconds)
+        with connection_scope(self.engine) as conn:
+            for chunk in _chunks(keys):
+                rows = conn.execute(
+                    select(EmbeddingCache_DB.key, EmbeddingCache_DB.embedding).where(
+                        EmbeddingCache_DB.key.in_(chunk),
+                        EmbeddingCache_DB.created_at >= oldest,
+                    )
+                ).all()
+                for key, embedding in rows:
+                    found[key] = np.asarray(embedding, dtype=np.float32)
+            for chunk in _chunks(list(found)):
+                conn.execute(
+                    update(EmbeddingCache_DB)
+                    .where(EmbeddingCache_DB.key.in_(chunk))
+                    .values(last_access=_utc_now())
+                )
+        return found
+
+    def put_many(self, items: dict[str, np.ndarray]) -> None:
+        now = _utc_now()
+        rows = [
+            {
+                "key": key,
+                "embedding": np.asarray(vector, dtype=np.float32),
+                "created_at": now,
+                "last_access": now,
+            }
+            for key, vector in items.items()
+        ]
+        with connection_scope(self.engine) as conn:
+            for chunk in _chunks(rows):
+                stmt = insert(EmbeddingCache_DB).values(chunk)
+                conn.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=[EmbeddingCache_DB.key],
+                        set_={
+                            "embedding": stmt.excluded.embedding,
+                            "created_at": stmt.excluded.created_at,
+                            "last_access": stmt.excluded.last_access,
+                        },
+                    )
+                )
+
+    def evict(self) -> int:
+        oldest = _utc_now() - timedelta(seconds=self.ttl_seconds)
+        with connection_scope(self.engine) as conn:
+            removed = conn.execute(
+                delete(EmbeddingCache_DB).where(EmbeddingCache_DB.created_at < oldest)
+            ).rowcount
+            count = conn.execute(
+                select(func.count()).select_from(EmbeddingCache_DB)
+            ).scalar()
+            excess = count - self.max_entries
+            if excess > 0:
+                lru_keys = (
+                    select(EmbeddingCache_DB.key)
+                    .order_by(EmbeddingCache_DB.last_access.asc())
+                    .limit(excess)
+                    .scalar_subquery()
+                )
+                removed += conn.execute(
+                    delete(EmbeddingCache_DB).where(EmbeddingCache_DB.key.in_(lru_keys))
+                ).rowcount
+        return removed
+
+
+CACHE_BACKENDS = {
+    "disk": SQLiteEmbeddingCache,
+    "postgres": PostgresEmbeddingCache,
+}
+
+_backends: dict[str, EmbeddingCacheBackend] = {}
+
+
+def get_cache_backend(name: str) -> EmbeddingCacheBackend:
+    """
+    Returns the process-wide cache backend registered under `name`.
+    Args:
+        name (str): One of the keys of CACHE_BACKENDS ("disk" or "postgres").
+    Returns:
+        EmbeddingCacheBackend: The backend instance, created on first use.
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if name not in CACHE_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding cache backend '{name}'. "
+            f"Expected one of: {', '.join(CACHE_BACKENDS)}"
+        )
+    if name not in _backends:
+        _backends[name] = CACHE_BACKENDS[name]()
+    return _backends[name]
+
+
+class EmbeddingCache:
+    """
+    Per-run view over a cache backend that counts hits and misses.
+    """
+
+    def __init__(self, backend: EmbeddingCacheBackend, model_name: str):
+        self.backend = backend
+        self.model_name = model_name
+        self.stats = CacheStats()
+
+    def lookup(self, texts: list[str]) -> list[np.ndarray | None]:
+        """
+        Returns the cached vector for each text, or None on a miss.
+        """
+        keys = [cache_key(text, self.model_name) for text in texts]
+        found = self.backend.get_many(list(set(keys)))
+        vectors = [found.get(key) for key in keys]
+        hits = sum(vector is not None for vector in vectors)
+        self.stats.hits += hits
+        self.stats.misses += len(vectors) - hits
+        return vectors
+
+    def store(self, texts: list[str], vectors: list[np.ndarray | None]) -> None:
+        """
+        Stores freshly computed vectors and applies eviction.
+        """
+        items = {
+            cache_key(text, self.model_name): vector
+            for text, vector in zip(texts, vectors)
+            if vector is not None
+        }
+        if not items:
+            return
+        self.backend.put_many(items)
+        removed = self.backend.evict()
+        if removed:
+            logger.info(f"Evicted {removed} embedding cache entries")
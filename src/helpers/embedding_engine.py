@@ -0,0 +1,286 @@
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+from dotenv import load_dotenv
+
+from config.logger import get_logger
+
+if TYPE_CHECKING:
+    # Imported where models are loaded: it pulls in torch
+    from sentence_transformers import SentenceTransformer
+
+load_dotenv()
+
+logger = get_logger("embedding_engine")
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+DEFAULT_BATCH_SIZE = 64
+
+# Directory holding local copies of the models (one sub-directory per model).
+# When set, models are loaded from it without any network access.
+MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR")
+
+ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+ONNX_INT8_FILE = os.getenv(
+    "EMBEDDING_ONNX_INT8_FILE", "onnx/model_qint8_avx512_vnni.onnx"
+)
+
+BACKENDS = ("torch", "onnx", "int8")
+REFERENCE_BACKEND = "torch"
+
+_models: dict[tuple[str, str], "SentenceTransformer"] = {}
+_models_lock = threading.Lock()
+
+
+def resolve_model_path(model_name: str) -> tuple[str, bool]:
+    """
+    Resolves where a model is loaded from.
+    Args:
+        model_name (str): The name or path of the SentenceTransformer model.
+    Returns:
+        tuple[str, bool]: The path or hub name to load, and whether it is local.
+    """
+    if os.path.isdir(model_name):
+        return model_name, True
+    if MODEL_DIR:
+        return os.path.join(MODEL_DIR, model_name), True
+    return model_name, False
+
+
+def cache_model_id(model_name: str, backend: str) -> str:
+    """
+    Identifier of the vectors produced by a model and backend, used to keep
+    cached embeddings of different backends apart.
+    """
+    return model_name if backend == REFERENCE_BACKEND else f"{model_name}:{backend}"
+
+
+def load_model(
+    model_name: str = MODEL_NAME, backend: str = REFERENCE_BACKEND
+) -> "SentenceTransformer":
+    """
+    Loads a SentenceTransformer model with the requested inference backend.
+    - "torch": the PyTorch model (reference backend).
+    - "onnx": the ONNX Runtime export found at EMBEDDING_ONNX_FILE.
+    - "int8": the int8 dynamically quantized ONNX export found at EMBEDDING_ONNX_INT8_FILE.
+    Args:
+        model_name (str): The name or path of the SentenceTransformer model.
+        backend (str): One of BACKENDS.
+    Returns:
+        SentenceTransformer: The loaded model.
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend '{backend}'. Expected one of: {', '.join(BACKENDS)}"
+        )
+    path, local = resolve_model_path(model_name)
+    kwargs = {"device": "cpu", "local_files_only": local}
+    if backend == "onnx":
+        kwargs.update(backend="onnx", model_kwargs={"file_name": ONNX_FILE})
+    elif backend == "int8":
+        kwargs.update(backend="onnx", model_kwargs={"file_name": ONNX_INT8_FILE})
+
+    from sentence_transformers import SentenceTransformer
+
+    logger.info(f"Loading SentenceTransformer model '{path}' (backend={backend})")
+    return SentenceTransformer(path, **kwargs)
+
+
+def get_model(
+    model_name: str = MODEL_NAME, backend: str = REFERENCE_BACKEND
+) -> "SentenceTransformer":
+    """
+    Returns the process-wide SentenceTransformer instance for a model and backend.
+    The model is loaded on first use and reused by every later call, so
+    repeated task invocations in the same worker do not reload the weights.
+    Args:
+        model_name (str): The name or path of the SentenceTransformer model.
+        backend (str): One of BACKENDS.
+    Returns:
+        SentenceTransformer: The cached model instance.
+    """
+    key = (model_name, backend)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            model = load_model(model_name, backend)
+            _models[key] = model
+    return model
+
+
+def export_local_model(
+    model_name: str = MODEL_NAME, model_dir: str | None = None
+) -> str:
+    """
+    Downloads a model and writes the PyTorch, ONNX and int8 ONNX variants to a
+    local directory, so that every backend can later be loaded offline.
+    This is the only step that needs network access.
+    Args:
+        model_name (str): The hub name of the SentenceTransformer model.
+        model_dir (str | None): Target base directory. Defaults to EMBEDDING_MODEL_DIR.
+    Returns:
+        str: The directory the model was written to.
+    Raises:
+        ValueError: If no target directory is given or configured.
+    """
+    from sentence_transformers import (
+        SentenceTransformer,
+        export_dynamic_quantized_onnx_model,
+    )
+
+    model_dir = model_dir or MODEL_DIR
+    if not model_dir:
+        raise ValueError("A model directory is required (set EMBEDDING_MODEL_DIR)")
+    target = os.path.join(model_dir, model_name)
+
+    SentenceTransformer(model_name, device="cpu").save(target)
+    onnx_model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+    onnx_model.save(target)
+    export_dynamic_quantized_onnx_model(onnx_model, "avx512_vnni", target)
+    logger.info(
+        f"Exported '{model_name}' with torch, onnx and int8 variants to {target}"
+    )
+    return target
+
+
+def iter_batches(indices: list[int], batch_size: int):
+    """
+    Yields consecutive slices of `indices` of at most `batch_size` elements.
+    """
+    for start in range(0, len(indices), batch_size):
+        yield indices[start : start + batch_size]
+
+
+def encode_batch(
+    model: "SentenceTransformer", texts: list[str]
+) -> list[np.ndarray | None]:
+    """
+    Encodes one batch of texts in a single model call.
+    If the batch fails, its texts are retried one by one and the ones that
+    still fail are returned as None.
+    Args:
+        model (SentenceTransformer): The model used for encoding.
+        texts (list[str]): The texts of the batch.
+    Returns:
+        list[np.ndarray | None]: One float32 vector per text, or None for failures.
+    """
+    try:
+        encoded = model.encode(
+            texts,
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return [vector.astype(np.float32, copy=False) for vector in encoded]
+    except Exception as e:
+        logger.warning(f"Batch of {len(texts)} texts failed ({e}), retrying one by one")
+
+    vectors: list[np.ndarray | None] = []
+    for text in texts:
+        try:
+            encoded = model.encode(
+                [text], convert_to_numpy=True, show_progress_bar=False
+            )
+            vectors.append(encoded[0].astype(np.float32, copy=False))
+        except Exception as e:
+            logger.warning(f"Error encoding text '{text[:60]}': {e}")
+            vectors.append(None)
+    return vectors
+
+
+def encode_texts(
+    texts: list[str],
+    model_name: str = MODEL_NAME,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    sort_by_length: bool = True,
+    backend: str = REFERENCE_BACKEND,
+) -> list[np.ndarray | None]:
+    """
+    Encodes a list of texts in batches with the cached model.
+    When `sort_by_length` is enabled, texts are bucketed by length before
+    batching so that each batch pads to a similar sequence length. The
+    vectors are always returned in the original order of `texts`.
+    Texts that cannot be encoded are returned as None (see `encode_batch`).
+    Args:
+        texts (list[str]): The texts to encode.
+        model_name (str): The name or path of the SentenceTransformer model.
+        batch_size (int): Number of texts sent to the model per call.
+        sort_by_length (bool): Whether to group texts of similar length together.
+        backend (str): The inference backend, one of BACKENDS.
+    Returns:
+        list[np.ndarray | None]: One float32 vector per text, or None for failures.
+    """
+    vectors: list[np.ndarray | None] = [None] * len(texts)
+    if not texts:
+        return vectors
+
+    model = get_model(model_name, backend)
+    order = list(range(len(texts)))
+    if sort_by_length:
+        order.sort(key=lambda i: len(texts[i]))
+
+    start = time.perf_counter()
+    for batch in iter_batches(order, max(1, batch_size)):
+        encoded = encode_batch(model, [texts[i] for i in batch])
+        for i, vector in zip(batch, encoded):
+            vectors[i] = vector
+
+    elapsed = time.perf_counter() - start
+    throughput = len(texts) / elapsed if elapsed > 0 else float("inf")
+    logger.info(
+        f"Encoded {len(texts)} texts in {elapsed:.2f}s "
+        f"({throughput:.1f} listings/sec, batch_size={batch_size}, backend={backend})"
+    )
+    return vectors
+
+
+def check_backend_agreement(
+    texts: list[str],
+    backend: str,
+    model_name: str = MODEL_NAME,
+    reference: str = REFERENCE_BACKEND,
+) -> dict[str, float]:
+    """
+    Compares the embeddings of a backend against the reference backend.
+    Use it on a sample of real descriptions before switching production to
+    a faster backend.
+    Args:
+        texts (list[str]): Sample texts to encode with both backends.
+        backend (str): The backend under test.
+        model_name (str): The name or path of the SentenceTransformer model.
+        reference (str): The backend used as ground truth.
+    Returns:
+        dict[str, float]: Mean, minimum and 5th percentile cosine similarity
+        between the two backends, plus the number of texts compared.
+    """
+    expected = encode_texts(texts, model_name=model_name, backend=reference)
+    actual = encode_texts(texts, model_name=model_name, backend=backend)
+    pairs = [
+        (a, b) for a, b in zip(expected, actual) if a is not None and b is not None
+    ]
+    if not pairs:
+        return {"count": 0, "mean": 0.0, "min": 0.0, "p5": 0.0}
+
+    reference_matrix = np.stack([a for a, _ in pairs])
+    backend_matrix = np.stack([b for _, b in pairs])
+    cosine = np.sum(reference_matrix * backend_matrix, axis=1) / (
+        np.linalg.norm(reference_matrix, axis=1)
+        * np.linalg.norm(backend_matrix, axis=1)
+    )
+    agreement = {
+        "count": len(pairs),
+        "mean": float(cosine.mean()),
+        "min": float(cosine.min()),
+        "p5": float(np.percentile(cosine, 5)),
+    }
+    logger.info(
+        f"Backend '{backend}' vs '{reference}' on {agreement['count']} texts: "
+        f"mean cosine {agreement['mean']:.4f}, min {agreement['min']:.4f}, "
+        f"p5 {agreement['p5']:.4f}"
+    )
+    return agreement
@@ -0,0 +1,158 @@
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config.logger import get_logger
+from helpers.embedding_engine import (
+    DEFAULT_BATCH_SIZE,
+    MODEL_NAME,
+    REFERENCE_BACKEND,
+    encode_batch,
+    encode_texts,
+    get_model,
+    iter_batches,
+)
+
+logger = get_logger("embedding_pool")
+
+# Below this many texts per worker the pool overhead outweighs the gain.
+MIN_ITEMS_PER_WORKER = 256
+
+_pools: dict[tuple[str, str, int], ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+_worker_model: tuple[str, str] | None = None
+
+
+def _init_worker(model_name: str, backend: str, threads_per_worker: int) -> None:
+    """
+    Runs once in each worker process: pins the torch thread count so that
+    workers do not oversubscribe the host, and loads the model.
+    """
+    global _worker_model
+    import torch
+
+    torch.set_num_threads(threads_per_worker)
+    _worker_model = (model_name, backend)
+    get_model(model_name, backend)
+
+
+def _encode_in_worker(texts: list[str]) -> list[np.ndarray | None]:
+    return encode_batch(get_model(*_worker_model), texts)
+
+
+def get_pool(
+    workers: int, model_name: str = MODEL_NAME, backend: str = REFERENCE_BACKEND
+) -> ProcessPoolExecutor:
+    """
+    Returns the process-wide worker pool for a model and worker count.
+    Pools are created on first use, reused across task invocations and shut
+    down when the interpreter exits.
+    Args:
+        workers (int): Number of worker processes.
+        model_name (str): The model each worker loads at start-up.
+        backend (str): The inference backend each worker uses.
+    Returns:
+        ProcessPoolExecutor: The shared pool.
+    """
+    key = (model_name, backend, workers)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+            logger.info(
+                f"Starting embedding pool with {workers} workers "
+                f"({threads_per_worker} threads each)"
+            )
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_name, backend, threads_per_worker),
+            )
+            _pools[key] = pool
+    return pool
+
+
+@atexit.register
+def shutdown_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+def encode_texts_parallel(
+    texts: list[str],
+    workers: int,
+    model_name: str = MODEL_NAME,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    sort_by_length: bool = True,
+    backend: str = REFERENCE_BACKEND,
+) -> list[np.ndarray | None]:
+    """
+    Encodes texts by spreading batches over a pool of worker processes.
+    Falls back to single-process `encode_texts` when `workers` is 1 or less,
+    when there are too few texts to keep every worker busy, or when the pool
+    fails. Vectors are returned in the original order of `texts`.
+    Args:
+        texts (list[str]): The texts to encode.
+        workers (int): Number of worker processes.
+        model_name (str): The name or path of the SentenceTransformer model.
+        batch_size (int): Number of texts per batch sent to a worker.
+        sort_by_length (bool): Whether to group texts of similar length together.
+        backend (str): The inference backend, one of BACKENDS.
+    Returns:
+        list[np.ndarray | None]: One float32 vector per text, or None for failures.
+    """
+    if workers <= 1 or len(texts) < workers * MIN_ITEMS_PER_WORKER:
+        return encode_texts(
+            texts,
+            model_name=model_name,
+            batch_size=batch_size,
+            sort_by_length=sort_by_length,
+            backend=backend,
+        )
+
+    order = list(range(len(texts)))
+    if sort_by_length:
+        order.sort(key=lambda i: len(texts[i]))
+    batches = list(iter_batches(order, max(1, batch_size)))
+
+    start = time.perf_counter()
+    try:
+        pool = get_pool(workers, model_name, backend)
+        results = pool.map(
+            _encode_in_worker, [[texts[i] for i in batch] for batch in batches]
+        )
+        vectors: list[np.ndarray | None] = [None] * len(texts)
+        # pool.map yields in submission order, so each batch lines up with its indices
+        for batch, encoded in zip(batches, results):
+            for i, vector in zip(batch, encoded):
+                vectors[i] = vector
+    except Exception as e:
+        logger.error(f"Embedding pool failed ({e}), falling back to single process")
+        with _pools_lock:
+            broken = _pools.pop((model_name, backend, workers), None)
+        if broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+        return encode_texts(
+            texts,
+            model_name=model_name,
+            batch_size=batch_size,
+            sort_by_length=sort_by_length,
+            backend=backend,
+        )
+
+    elapsed = time.perf_counter() - start
+    throughput = len(texts) / elapsed if elapsed > 0 else float("inf")
+    logger.info(
+        f"Encoded {len(texts)} texts in {elapsed:.2f}s with {workers} workers "
+        f"({throughput:.1f} listings/sec, batch_size={batch_size}, backend={backend})"
+    )
+    return vectors
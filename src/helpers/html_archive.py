@@ -0,0 +1,253 @@
+import atexit
+import hashlib
+import importlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from io import BytesIO
+
+from dotenv import load_dotenv
+from minio import Minio, S3Error
+
+from config.logger import get_logger
+from config.minio import ARCHIVE_BUCKET, get_minio, setup_minio_buckets
+
+try:
+    import zstandard
+except ImportError:  # optional dependency: pip install .[archive]
+    zstandard = None
+
+load_dotenv()
+
+logger = get_logger("html_archive")
+
+ZSTD_LEVEL = int(os.getenv("HTML_ARCHIVE_ZSTD_LEVEL", "10"))
+UPLOAD_WORKERS = int(os.getenv("HTML_ARCHIVE_UPLOAD_WORKERS", "4"))
+
+
+def page_key(digest: str) -> str:
+    """
+    Object name of an archived page: pages are stored once per content hash.
+    """
+    return f"pages/{digest[:2]}/{digest}.html.zst"
+
+
+def manifest_key(run_id: str) -> str:
+    return f"runs/{run_id}/manifest.jsonl"
+
+
+def parser_name(parse) -> str:
+    return f"{parse.__module__}.{parse.__qualname__}"
+
+
+def resolve_parser(name: str):
+    """
+    Imports the parser function recorded in a manifest entry.
+    """
+    module, _, qualname = name.rpartition(".")
+    return getattr(importlib.import_module(module), qualname)
+
+
+def _require_zstd() -> None:
+    if zstandard is None:
+        raise RuntimeError("The HTML archive needs zstandard: pip install .[archive]")
+
+
+def compress(body: bytes) -> bytes:
+    _require_zstd()
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+
+
+def decompress(blob: bytes) -> bytes:
+    _require_zstd()
+    return zstandard.ZstdDecompressor().decompress(blob)
+
+
+class HtmlArchive:
+    """
+    Content-addressed archive of raw result pages in MinIO.
+    Every page body is zstd-compressed and stored under its sha256, so a page
+    that did not change between runs is stored once. Each run also writes a
+    manifest (one JSON line per fetched page: url, hash, parser and parser
+    arguments) from which the run can be replayed offline.
+    Uploads run in background threads so archiving does not slow scraping down.
+    """
+
+    def __init__(
+        self,
+        client: Minio | None = None,
+        bucket: str = ARCHIVE_BUCKET,
+        run_id: str | None = None,
+    ):
+        _require_zstd()
+        self.client = client or get_minio()
+        self.bucket = bucket
+        self.run_id = run_id or datetime.now(UTC).strftime("%Y-%m-%dT%H-%M-%SZ")
+        setup_minio_buckets(self.client, bucket)
+        self.pages_archived = 0
+        self.bytes_archived = 0
+        self._entries: list[dict] = []
+        self._known: set[str] = set()
+        self._lock = threading.Lock()
+        self._uploads = ThreadPoolExecutor(
+            max_workers=UPLOAD_WORKERS, thread_name_prefix="archive"
+        )
+        self._closed = False
+
+    def _exists(self, key: str) -> bool:
+        try:
+            self.client.stat_object(self.bucket, key)
+            return True
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return False
+            raise
+
+    def _upload(self, digest: str, body: bytes) -> None:
+        key = page_key(digest)
+        try:
+            if self._exists(key):
+                return
+            blob = compress(body)
+            self.client.put_object(
+                self.bucket,
+                key,
+                BytesIO(blob),
+                len(blob),
+                content_type="application/zstd",
+            )
+            with self._lock:
+                self.pages_archived += 1
+                self.bytes_archived += len(blob)
+        except Exception as e:
+            logger.error(f"Could not archive page {digest}: {e}")
+            with self._lock:
+                self._known.discard(digest)
+
+    def add(
+        self,
+        url: str,
+        body: bytes | None,
+        parse,
+        args: tuple = (),
+        digest: str | None = None,
+    ) -> None:
+        """
+        Records a fetched page in the run manifest and uploads its body if it
+        is not archived yet.
+        Args:
+            url (str): The page URL.
+            body (bytes | None): The raw page body. May be None when `digest`
+                refers to a body archived by an earlier run.
+            parse (Callable): The parser used for the page; replay calls it
+                again as `parse(body, *args)`.
+            args (tuple): JSON-serializable extra arguments of the parser.
+            digest (str | None): The sha256 of the body, if already known.
+        """
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        digest = digest or hashlib.sha256(body).hexdigest()
+        with self._lock:
+            if self._closed:
+                return
+            self._entries.append(
+                {
+                    "url": url,
+                    "sha256": digest,
+                    "parser": parser_name(parse),
+                    "args": list(args),
+                    "fetched_at": datetime.now(UTC).isoformat(),
+                }
+            )
+            upload = body is not None and digest not in self._known
+            self._known.add(digest)
+        if upload:
+            self._uploads.submit(self._upload, digest, body)
+
+    def close(self) -> None:
+        """
+        Waits for pending uploads and writes the run manifest.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._uploads.shutdown(wait=True)
+        if not self._entries:
+            return
+        data = "\n".join(json.dumps(entry) for entry in self._entries).encode("utf-8")
+        self.client.put_object(
+            self.bucket,
+            manifest_key(self.run_id),
+            BytesIO(data),
+            len(data),
+            content_type="application/x-ndjson",
+        )
+        logger.info(
+            f"Archived run {self.run_id}: {len(self._entries)} pages, "
+            f"{self.pages_archived} new bodies ({self.bytes_archived / 1024:.0f} KiB compressed)"
+        )
+
+    def read_manifest(self, run_id: str) -> list[dict]:
+        response = self.client.get_object(self.bucket, manifest_key(run_id))
+        try:
+            lines = response.read().decode("utf-8").splitlines()
+            return [json.loads(line) for line in lines if line]
+        finally:
+            response.close()
+            response.release_conn()
+
+    def list_runs(self) -> list[str]:
+        return sorted(
+            obj.object_name.split("/")[1]
+            for obj in self.client.list_objects(
+                self.bucket, prefix="runs/", recursive=True
+            )
+            if obj.object_name.endswith("manifest.jsonl")
+        )
+
+    def read_page(self, digest: str) -> bytes:
+        response = self.client.get_object(self.bucket, page_key(digest))
+        try:
+            return decompress(response.read())
+        finally:
+            response.close()
+            response.release_conn()
+
+
+_archive: HtmlArchive | None = None
+_archive_failed = False
+_archive_lock = threading.Lock()
+
+
+def get_html_archive() -> HtmlArchive | None:
+    """
+    Returns the archive of the current run, or None if HTML_ARCHIVE_ENABLED is
+    not set. The manifest is written by `close_html_archive` (or at exit).
+    """
+    global _archive, _archive_failed
+    if os.getenv("HTML_ARCHIVE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    with _archive_lock:
+        if _archive is None and not _archive_failed:
+            try:
+                _archive = HtmlArchive()
+            except Exception as e:
+                logger.error(f"HTML archive unavailable, scraping without it: {e}")
+                _archive_failed = True
+        return _archive
+
+
+@atexit.register
+def close_html_archive() -> None:
+    """
+    Closes the archive of the current run; the next run starts a new one.
+    """
+    global _archive, _archive_failed
+    with _archive_lock:
+        archive, _archive = _archive, None
+        _archive_failed = False
+    if archive is not None:
+        archive.close()
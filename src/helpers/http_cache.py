@@ -0,0 +1,234 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+from config.logger import get_logger
+
+load_dotenv()
+
+logger = get_logger("http_cache")
+
+DEFAULT_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", ".cache/http.sqlite3")
+DEFAULT_MAX_BYTES = int(float(os.getenv("HTTP_CACHE_MAX_MB", "256")) * 1024 * 1024)
+# Eviction trims the cache to this fraction of its limit, so it does not run on every write.
+EVICTION_TARGET = 0.9
+
+
+def body_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+@dataclass
+class HttpCacheStats:
+    revalidated: int = 0
+    parses_skipped: int = 0
+    bytes_saved: int = 0
+
+
+@dataclass
+class CachedPage:
+    etag: str | None
+    last_modified: str | None
+    body_hash: str
+    body_size: int
+    parser: str | None
+
+    def conditional_headers(self) -> dict[str, str]:
+        """
+        Headers asking the server to answer 304 if the page did not change.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """
+    Local on-disk cache of fetched pages, stored in a single SQLite file.
+    Each URL keeps its zlib-compressed body, its validators (ETag and
+    Last-Modified), the hash of the body and the compressed result of the
+    last parse, so an unchanged page is neither downloaded nor parsed again.
+    Entries are evicted least recently used first once the stored bytes
+    exceed `max_bytes`.
+    """
+
+    def __init__(
+        self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = HttpCacheStats()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS http_cache ("
+                "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                "body_hash TEXT NOT NULL, body BLOB NOT NULL, body_size INTEGER NOT NULL, "
+                "parser TEXT, parsed BLOB, stored_bytes INTEGER NOT NULL, "
+                "last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_http_cache_last_access "
+                "ON http_cache (last_access)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def lookup(self, url: str) -> CachedPage | None:
+        """
+        Returns the validators and metadata stored for `url`, if any.
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT etag, last_modified, body_hash, body_size, parser "
+                "FROM http_cache WHERE url = ?",
+                (url,),
+            ).fetchone()
+        return CachedPage(*row) if row else None
+
+    def body(self, url: str) -> bytes | None:
+        """
+        Returns the decompressed body stored for `url`, if any.
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT body FROM http_cache WHERE url = ?", (url,)
+            ).fetchone()
+        return zlib.decompress(row[0]) if row else None
+
+    def parsed(self, url: str, parser: str):
+        """
+        Returns the stored parse result of `url` if it was produced by `parser`,
+        and marks the entry as recently used.
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT parsed FROM http_cache WHERE url = ? AND parser = ?",
+                (url, parser),
+            ).fetchone()
+            if row is None or row[0] is None:
+                return None
+            conn.execute(
+                "UPDATE http_cache SET last_access = ? WHERE url = ?",
+                (time.time(), url),
+            )
+        # The cache is a local file written by this process only
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def store(
+        self,
+        url: str,
+        body: bytes,
+        digest: str,
+        etag: str | None,
+        last_modified: str | None,
+        parser: str | None = None,
+        parsed=None,
+    ) -> None:
+        """
+        Stores or replaces the entry of `url`, then evicts old entries if the
+        cache grew past its size limit.
+        """
+        compressed = zlib.compress(body)
+        parsed_blob = (
+            zlib.compress(pickle.dumps(parsed, protocol=pickle.HIGHEST_PROTOCOL))
+            if parser is not None
+            else None
+        )
+        stored_bytes = len(compressed) + len(parsed_blob or b"")
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO http_cache "
+                "(url, etag, last_modified, body_hash, body, body_size, parser, parsed, "
+                "stored_bytes, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    etag,
+                    last_modified,
+                    digest,
+                    compressed,
+                    len(body),
+                    parser,
+                    parsed_blob,
+                    stored_bytes,
+                    time.time(),
+                ),
+            )
+            self._evict(conn)
+
+    def update_validators(
+        self, url: str, etag: str | None, last_modified: str | None
+    ) -> None:
+        """
+        Refreshes the validators of an entry whose body did not change.
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE http_cache SET etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified), last_access = ? WHERE url = ?",
+                (etag, last_modified, time.time(), url),
+            )
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        (total,) = conn.execute(
+            "SELECT COALESCE(SUM(stored_bytes), 0) FROM http_cache"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return 0
+
+        excess = total - int(self.max_bytes * EVICTION_TARGET)
+        removed = 0
+        freed = 0
+        for url, stored_bytes in conn.execute(
+            "SELECT url, stored_bytes FROM http_cache ORDER BY last_access ASC"
+        ).fetchall():
+            if freed >= excess:
+                break
+            conn.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+            freed += stored_bytes
+            removed += 1
+        logger.info(
+            f"Evicted {removed} pages ({freed / 1024:.0f} KiB) from the HTTP cache"
+        )
+        return removed
+
+    def record(self, revalidated: bool, parse_skipped: bool, bytes_saved: int) -> None:
+        with self._lock:
+            self.stats.revalidated += int(revalidated)
+            self.stats.parses_skipped += int(parse_skipped)
+            self.stats.bytes_saved += bytes_saved
+
+
+_cache: HttpCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> HttpCache | None:
+    """
+    Returns the process-wide HTTP cache, or None if HTTP_CACHE_ENABLED is not set.
+    """
+    global _cache
+    if os.getenv("HTTP_CACHE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = HttpCache()
+            except Exception as e:
+                logger.error(f"HTTP cache unavailable, fetching without it: {e}")
+                return None
+        return _cache
@@ -0,0 +1,232 @@
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict
+from typing import Self
+from urllib.parse import urlsplit
+
+import httpx
+from dotenv import load_dotenv
+
+from config.logger import get_logger
+from helpers.html_archive import HtmlArchive, get_html_archive
+from helpers.http_cache import HttpCache, body_hash, get_http_cache
+from helpers.metrics import get_run_metrics
+
+load_dotenv()
+
+logger = get_logger("http_fetcher")
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "4"))
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.5"))
+TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+
+
+class RetryableStatusError(Exception):
+    def __init__(self, response: httpx.Response):
+        super().__init__(f"HTTP {response.status_code} for {response.url}")
+        self.response = response
+
+
+class AsyncFetcher:
+    """
+    Asynchronous HTTP client with a pooled keep-alive connection set,
+    per-host concurrency limits and retries with exponential backoff.
+    Use it as an async context manager:
+
+        async with AsyncFetcher() as fetcher:
+            response = await fetcher.fetch(url)
+
+    With an HttpCache, `fetch_parsed` revalidates cached pages with
+    conditional requests and reuses the stored parse of unchanged pages.
+    With an HtmlArchive, every page it returns is also archived for replay.
+    """
+
+    def __init__(
+        self,
+        per_host_limit: int = PER_HOST_LIMIT,
+        max_connections: int = MAX_CONNECTIONS,
+        retries: int = MAX_RETRIES,
+        backoff: float = BACKOFF_SECONDS,
+        timeout: float = TIMEOUT_SECONDS,
+        headers: dict[str, str] | None = None,
+        cache: HttpCache | None = None,
+        archive: HtmlArchive | None = None,
+    ):
+        self.per_host_limit = per_host_limit
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = headers or DEFAULT_HEADERS
+        self.cache = cache
+        self.archive = archive
+        self.bytes_fetched = 0
+        self.requests_made = 0
+        self.bytes_saved = 0
+        self.parses_skipped = 0
+        self._semaphores: dict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(self.per_host_limit)
+        )
+        self._client: httpx.AsyncClient | None = None
+
+    async def __aenter__(self) -> Self:
+        self._client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._client.aclose()
+        self._client = None
+        get_run_metrics().add("scrape", bytes_fetched=self.bytes_fetched)
+        if self.cache is not None:
+            logger.info(
+                f"HTTP cache: {self.bytes_saved / 1024:.0f} KiB not downloaded, "
+                f"{self.parses_skipped} of {self.requests_made} parses skipped"
+            )
+
+    def _retry_delay(self, attempt: int, response: httpx.Response | None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff * (2**attempt) * (1 + random.random() * 0.25)
+
+    async def fetch(
+        self, url: str, headers: dict[str, str] | None = None
+    ) -> httpx.Response:
+        """
+        Performs a GET request, retrying network errors and retryable statuses.
+        Args:
+            url (str): The URL to fetch.
+            headers (dict[str, str] | None): Extra headers for this request.
+        Returns:
+            httpx.Response: The final response (2xx or 304).
+        Raises:
+            httpx.HTTPError: If the request still fails after all retries.
+        """
+        semaphore = self._semaphores[urlsplit(url).netloc]
+
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                async with semaphore:
+                    response = await self._client.get(url, headers=headers)
+                self.requests_made += 1
+                self.bytes_fetched += len(response.content)
+                if response.status_code in RETRY_STATUSES:
+                    raise RetryableStatusError(response)
+                if response.status_code != 304:
+                    response.raise_for_status()
+                return response
+            except (httpx.TransportError, RetryableStatusError) as e:
+                if attempt == self.retries:
+                    if isinstance(e, RetryableStatusError):
+                        e.response.raise_for_status()
+                    raise
+                delay = self._retry_delay(attempt, response)
+                logger.warning(
+                    f"Fetching {url} failed ({e}), retry {attempt + 1}/{self.retries} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def fetch_parsed(self, url: str, parse, *args):
+        """
+        Fetches a page and returns `parse(body, *args)`, run in a worker thread.
+        Without a cache this is a plain fetch and parse. With a cache, the
+        request is made conditional on the stored validators; when the server
+        answers 304, or sends a body with the same hash as the stored one, the
+        stored parse result is returned without parsing again.
+        Args:
+            url (str): The URL to fetch.
+            parse (Callable): Parser taking the body bytes and `args`. Its
+                result must be picklable to be cached.
+        Returns:
+            The parse result.
+        Raises:
+            httpx.HTTPError: If the request still fails after all retries.
+        """
+        start = time.perf_counter()
+        result = await self._fetch_parsed(url, parse, *args)
+        get_run_metrics().observe_latency("scrape", time.perf_counter() - start)
+        return result
+
+    async def _fetch_parsed(self, url: str, parse, *args):
+        if self.cache is None:
+            response = await self.fetch(url)
+            if self.archive is not None:
+                self.archive.add(url, response.content, parse, args)
+            return await asyncio.to_thread(parse, response.content, *args)
+
+        parser = f"{parse.__module__}.{parse.__qualname__}"
+        cached = await asyncio.to_thread(self.cache.lookup, url)
+        response = await self.fetch(
+            url, cached.conditional_headers() if cached else None
+        )
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        if response.status_code == 304 and cached is not None:
+            body, digest, saved = None, cached.body_hash, cached.body_size
+        else:
+            body, digest, saved = response.content, body_hash(response.content), 0
+
+        if (
+            cached is not None
+            and cached.body_hash == digest
+            and cached.parser == parser
+        ):
+            result = await asyncio.to_thread(self.cache.parsed, url, parser)
+            if result is not None:
+                if self.archive is not None:
+                    if body is None:
+                        body = await asyncio.to_thread(self.cache.body, url)
+                    self.archive.add(url, body, parse, args, digest)
+                await asyncio.to_thread(
+                    self.cache.update_validators, url, etag, last_modified
+                )
+                self.bytes_saved += saved
+                self.parses_skipped += 1
+                self.cache.record(saved > 0, True, saved)
+                return result
+
+        if body is None:
+            body = await asyncio.to_thread(self.cache.body, url)
+            if body is None:
+                # Evicted since the lookup: fetch the full page again
+                response = await self.fetch(url)
+                body, digest = response.content, body_hash(response.content)
+            else:
+                self.cache.record(True, False, saved)
+                self.bytes_saved += saved
+        if self.archive is not None:
+            self.archive.add(url, body, parse, args, digest)
+        result = await asyncio.to_thread(parse, body, *args)
+        try:
+            await asyncio.to_thread(
+                self.cache.store, url, body, digest, etag, last_modified, parser, result
+            )
+        except Exception as e:
+            logger.warning(f"Could not store {url} in the HTTP cache: {e}")
+        return result
+
+
+def scraping_fetcher() -> AsyncFetcher:
+    """
+    Returns a fetcher wired to the shared HTTP cache and HTML archive, when
+    they are enabled.
+    """
+    return AsyncFetcher(cache=get_http_cache(), archive=get_html_archive())
@@ -0,0 +1,292 @@
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+from config.logger import get_logger
+from helpers.vector_index import (
+    ATTRIBUTES,
+    VectorIndex,
+    get_vector_index,
+    normalize_rows,
+    top_k,
+)
+from models.pydantic_models import SearchFilters, SearchPage, SearchResult
+
+load_dotenv()
+
+logger = get_logger("hybrid_search")
+
+DEFAULT_PAGE_SIZE = 20
+CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "256"))
+
+RANGE_ATTRIBUTES = ("price", "m2")
+BITMAP_ATTRIBUTES = ("bedrooms", "bathrooms")
+
+# Above this fraction of the index, one product with the whole matrix is
+# cheaper than gathering the surviving rows first.
+DENSE_FRACTION = 0.25
+
+
+def filter_bounds(filters: SearchFilters | None) -> dict[str, tuple]:
+    """
+    Returns the (min, max) bounds of every filtered attribute; None means unbounded.
+    """
+    if filters is None:
+        return {}
+    bounds = {
+        name: (getattr(filters, f"min_{name}"), getattr(filters, f"max_{name}"))
+        for name in ATTRIBUTES
+    }
+    return {name: bound for name, bound in bounds.items() if bound != (None, None)}
+
+
+def in_bounds(value: float, low, high) -> bool:
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+class AttributeIndex:
+    """
+    Precomputed filters over the attributes of a vector index:
+    - price and m2: row ids sorted by value, so a range is two binary searches
+    - bedrooms and bathrooms: one packed bitmap per distinct count
+    A query expands only its most selective filter into row ids and checks
+    the other conditions on those rows, so its cost follows the number of
+    candidates rather than the size of the index. Rows with an unknown
+    value never match a filter on that attribute.
+    """
+
+    def __init__(self, attributes: np.ndarray):
+        self.count = len(attributes)
+        self.attributes = attributes
+        self.sorted: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for name in RANGE_ATTRIBUTES:
+            values = attributes[:, ATTRIBUTES.index(name)]
+            rows = np.flatnonzero(~np.isnan(values))
+            rows = rows[np.argsort(values[rows], kind="stable")]
+            self.sorted[name] = (values[rows], rows)
+
+        self.bitmaps: dict[str, dict[int, tuple[int, np.ndarray]]] = {}
+        for name in BITMAP_ATTRIBUTES:
+            values = attributes[:, ATTRIBUTES.index(name)]
+            distinct, counts = np.unique(values[~np.isnan(values)], return_counts=True)
+            self.bitmaps[name] = {
+                int(value): (int(count), np.packbits(values == value))
+                for value, count in zip(distinct, counts)
+            }
+
+    def _range(self, name: str, low, high) -> tuple[int, int]:
+        values, _ = self.sorted[name]
+        start = 0 if low is None else int(np.searchsorted(values, low, "left"))
+        end = (
+            len(values) if high is None else int(np.searchsorted(values, high, "right"))
+        )
+        return start, max(start, end)
+
+    def _bitmaps(self, name: str, low, high) -> list[tuple[int, np.ndarray]]:
+        return [
+            entry
+            for value, entry in self.bitmaps[name].items()
+            if in_bounds(value, low, high)
+        ]
+
+    def estimate(self, name: str, low, high) -> int:
+        """
+        Number of rows matching one condition, without materializing them.
+        """
+        if name in self.sorted:
+            start, end = self._range(name, low, high)
+            return end - start
+        return sum(count for count, _ in self._bitmaps(name, low, high))
+
+    def rows(self, name: str, low, high) -> np.ndarray:
+        """
+        Row ids matching one condition, in ascending order.
+        """
+        if name in self.sorted:
+            start, end = self._range(name, low, high)
+            return np.sort(self.sorted[name][1][start:end])
+        bitmaps = [bitmap for _, bitmap in self._bitmaps(name, low, high)]
+        if not bitmaps:
+            return np.empty(0, dtype=np.int64)
+        union = np.bitwise_or.reduce(bitmaps) if len(bitmaps) > 1 else bitmaps[0]
+        return np.flatnonzero(np.unpackbits(union, count=self.count))
+
+    def candidates(self, filters: SearchFilters | None) -> np.ndarray | None:
+        """
+        Returns the ascending row ids matching every filter, or None when
+        nothing is filtered (every row matches).
+        """
+        bounds = filter_bounds(filters)
+        if not bounds:
+            return None
+        first = min(bounds, key=lambda name: self.estimate(name, *bounds[name]))
+        rows = self.rows(first, *bounds.pop(first))
+        for name, (low, high) in bounds.items():
+            values = self.attributes[rows, ATTRIBUTES.index(name)]
+            keep = np.ones(len(rows), dtype=bool)
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+            rows = rows[keep]
+        return rows
+
+
+class HybridSearch:
+    """
+    Similarity search restricted by listing attributes ("similar to this
+    flat, under 250k € with at least 2 bedrooms").
+    Candidates are pre-filtered with an AttributeIndex and only the
+    survivors are ranked by cosine similarity; unfiltered queries use the
+    IVF index of the vector index when it has one. The attribute index is
+    rebuilt when the vector index changes, and recent pages are kept in a
+    small LRU cache keyed by the index version.
+    """
+
+    def __init__(self, index: VectorIndex, cache_size: int = CACHE_SIZE):
+        self.index = index
+        self.cache_size = cache_size
+        self._attribute_index: AttributeIndex | None = None
+        self._attribute_version = -1
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _attributes(
+        self, version: int, count: int, attributes: np.ndarray
+    ) -> AttributeIndex:
+        with self._lock:
+            if self._attribute_version != version:
+                # A copy, so later in-place upserts cannot break the sorted arrays
+                self._attribute_index = AttributeIndex(np.array(attributes[:count]))
+                self._attribute_version = version
+            return self._attribute_index
+
+    def _query_vector(self, vector, url: str | None, text: str | None) -> np.ndarray:
+        if sum(value is not None for value in (vector, url, text)) != 1:
+            raise ValueError(
+                "Pass exactly one of a vector, a url or a text to search for"
+            )
+        if url is not None:
+            vector = self.index.vector(url)
+            if vector is None:
+                raise KeyError(url)
+        elif text is not None:
+            from helpers.embedding_engine import encode_texts
+
+            vector = encode_texts([text])[0]
+            if vector is None:
+                raise ValueError(f"Could not encode the query '{text}'")
+        return normalize_rows(np.asarray(vector, dtype=np.float32).ravel())
+
+    def search(
+        self,
+        vector=None,
+        *,
+        url: str | None = None,
+        text: str | None = None,
+        filters: SearchFilters | None = None,
+        page: int = 0,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> SearchPage:
+        """
+        Returns one page of the listings most similar to a query that match the filters.
+        Args:
+            vector (array-like | None): Query embedding.
+            url (str | None): Search for listings similar to this indexed one (excluded from results).
+            text (str | None): Free text, encoded with the embedding model.
+            filters (SearchFilters | None): Attribute bounds, inclusive.
+            page (int): Zero-based page number.
+            page_size (int): Results per page.
+        Returns:
+            SearchPage: The results, best first, and the number of matching listings.
+        Raises:
+            KeyError: If `url` is not indexed.
+            ValueError: If not exactly one query is given.
+        """
+        version, count, vectors, attributes, urls = self.index.snapshot()
+        vector_key = None
+        if vector is not None:
+            vector_key = hashlib.blake2b(
+                np.asarray(vector, dtype=np.float32).tobytes()
+            ).digest()
+        key = (version, vector_key, url, text, filters, page, page_size)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        query = self._query_vector(vector, url, text)
+        excluded = self.index.positions.get(url) if url is not None else None
+        rows = self._attributes(version, count, attributes).candidates(filters)
+        candidates = count if rows is None else len(rows)
+        if excluded is not None and (rows is None or np.isin(excluded, rows)):
+            candidates -= 1
+        # One more result tells whether there is a next page
+        needed = (page + 1) * page_size + 1 + (excluded is not None)
+
+        if candidates <= 0:
+            ranked = []
+        elif rows is None and self.index.has_ivf:
+            matches = self.index.search(query, needed)[0]
+            ranked = [(self.index.positions[match], score) for match, score in matches]
+        else:
+            if rows is None or len(rows) > DENSE_FRACTION * count:
+                scores = vectors[:count] @ query
+                scores = scores if rows is None else scores[rows]
+            else:
+                scores = vectors[rows] @ query
+            positions, values = top_k(scores[None, :], needed)
+            ids = positions[0] if rows is None else rows[positions[0]]
+            ranked = list(zip(ids.tolist(), values[0].tolist()))
+        ranked = [(row, score) for row, score in ranked if row != excluded]
+
+        start = page * page_size
+        results = [
+            self._result(urls[row], score, attributes[row])
+            for row, score in ranked[start : start + page_size]
+        ]
+        result = SearchPage(
+            results=results,
+            page=page,
+            page_size=page_size,
+            candidates=candidates,
+            has_more=len(ranked) > start + page_size,
+        )
+
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _result(url: str, score: float, values: np.ndarray) -> SearchResult:
+        fields = {
+            name: (None if math.isnan(value) else value)
+            for name, value in zip(ATTRIBUTES, values.tolist())
+        }
+        for name in BITMAP_ATTRIBUTES:
+            if fields[name] is not None:
+                fields[name] = int(fields[name])
+        return SearchResult(url=url, score=float(score), **fields)
+
+
+_search: HybridSearch | None = None
+_search_lock = threading.Lock()
+
+
+def get_hybrid_search() -> HybridSearch:
+    """
+    Returns the process-wide hybrid search over the process-wide vector index.
+    """
+    global _search
+    with _search_lock:
+        if _search is None:
+            _search = HybridSearch(get_vector_index())
+        return _search
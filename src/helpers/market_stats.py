@@ -0,0 +1,218 @@
+import math
+import re
+from collections import defaultdict
+from itertools import groupby
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from config.logger import get_logger
+from helpers.utils import normalize_text
+from models.pydantic_models import MarketStat
+from models.sqlalchemy_models import Apartment_DB, MarketHistogram_DB
+
+logger = get_logger("market_stats")
+
+# Relative width of a histogram bucket: quantiles read from the histogram are
+# within half of it of the exact values. Changing it requires a rebuild.
+BUCKET_WIDTH = 0.01
+UNKNOWN_BEDROOMS = -1
+# Larger bedroom counts are aggregated together ("5 or more").
+MAX_BEDROOMS = 5
+# Listing columns the aggregates depend on.
+MARKET_COLUMNS = ("address", "bedrooms", "m2", "price")
+
+_PARENTHESES = re.compile(r"\(([^()]*)\)")
+_ZIP_CODE = re.compile(r"\b\d{5}\b")
+
+
+def listing_area(address: str | None) -> str | None:
+    """
+    Area of a listing address: the part in parentheses (the district in
+    "Centro (Distrito Centro. Málaga Capital)"), else its zip code, else
+    its last comma-separated segment. None for empty addresses.
+    """
+    address = normalize_text(address or "")
+    match = _PARENTHESES.search(address)
+    area = normalize_text(match.group(1)) if match else ""
+    if area:
+        return area
+    match = _ZIP_CODE.search(address)
+    if match:
+        return match.group(0)
+    return address.rsplit(",", 1)[-1].strip() or None
+
+
+def price_m2_bucket(value: float) -> int:
+    return math.floor(math.log(value) / math.log1p(BUCKET_WIDTH))
+
+
+def bucket_value(bucket: int) -> float:
+    """
+    Geometric midpoint of a histogram bucket.
+    """
+    return math.exp((bucket + 0.5) * math.log1p(BUCKET_WIDTH))
+
+
+def market_entry(row: dict) -> tuple[tuple[str, int, int], float] | None:
+    """
+    Returns the histogram key (area, bedrooms, bucket) and the price per m²
+    of a listing with MARKET_COLUMNS, or None when it has no area, price or size.
+    """
+    price, m2 = row["price"], row["m2"]
+    if not price or not m2 or price <= 0 or m2 <= 0:
+        return None
+    area = listing_area(row["address"])
+    if area is None:
+        return None
+    bedrooms = (
+        UNKNOWN_BEDROOMS
+        if row["bedrooms"] is None
+        else min(row["bedrooms"], MAX_BEDROOMS)
+    )
+    value = price / m2
+    return (area, bedrooms, price_m2_bucket(value)), value
+
+
+def market_row(apartment) -> dict:
+    return {column: getattr(apartment, column) for column in MARKET_COLUMNS}
+
+
+def market_deltas(
+    old_rows: dict[str, dict], new_rows: dict[str, dict]
+) -> dict[tuple, list]:
+    """
+    Histogram changes when the stored listings `old_rows` are replaced by
+    `new_rows`, both keyed by URL: a URL only in `old_rows` is a removed
+    listing and one only in `new_rows` a new listing. Listings whose
+    entry does not change contribute nothing.
+    Returns:
+        dict[tuple, list]: [listings, total price per m²] to add per (area, bedrooms, bucket).
+    """
+    deltas: dict[tuple, list] = defaultdict(lambda: [0, 0.0])
+    for url in old_rows.keys() | new_rows.keys():
+        old = market_entry(old_rows[url]) if url in old_rows else None
+        new = market_entry(new_rows[url]) if url in new_rows else None
+        if old == new:
+            continue
+        for entry, sign in ((old, -1), (new, 1)):
+            if entry is not None:
+                key, value = entry
+                deltas[key][0] += sign
+                deltas[key][1] += sign * value
+    return dict(deltas)
+
+
+def stored_market_rows(conn, urls: list[str]) -> dict[str, dict]:
+    """
+    Returns the MARKET_COLUMNS of the stored listings among `urls`. The rows
+    stay locked until the transaction ends, so concurrent loads of the same
+    listings compute and apply their deltas one after the other.
+    """
+    if not urls:
+        return {}
+    query = (
+        select(
+            Apartment_DB.url,
+            *(getattr(Apartment_DB, column) for column in MARKET_COLUMNS),
+        )
+        .where(Apartment_DB.url.in_(urls))
+        .order_by(Apartment_DB.url)
+        .with_for_update()
+    )
+    return {row.url: row._asdict() for row in conn.execute(query)}
+
+
+def apply_market_deltas(conn, deltas: dict[tuple, list]) -> None:
+    """
+    Adds histogram changes from market_deltas in one statement, then drops
+    the buckets left without listings.
+    Args:
+        conn (sqlalchemy.engine.Connection): Connection inside the transaction writing the listings.
+        deltas (dict[tuple, list]): Changes per (area, bedrooms, bucket).
+    """
+    if not deltas:
+        return
+    table = MarketHistogram_DB.__table__
+    # Sorted, so concurrent loads lock the histogram rows in the same order
+    keys = sorted(deltas)
+    stmt = insert(table).values(
+        [
+            {
+                "area": area,
+                "bedrooms": bedrooms,
+                "bucket": bucket,
+                "listings": deltas[area, bedrooms, bucket][0],
+                "total_price_m2": deltas[area, bedrooms, bucket][1],
+            }
+            for area, bedrooms, bucket in keys
+        ]
+    )
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.area, table.c.bedrooms, table.c.bucket],
+            set_={
+                "listings": table.c.listings + stmt.excluded.listings,
+                "total_price_m2": table.c.total_price_m2 + stmt.excluded.total_price_m2,
+            },
+        )
+    )
+    conn.execute(
+        delete(table).where(
+            table.c.listings <= 0,
+            tuple_(table.c.area, table.c.bedrooms, table.c.bucket).in_(keys),
+        )
+    )
+
+
+def histogram_quantile(buckets: list[int], counts: list[int], q: float) -> float:
+    """
+    Returns the midpoint of the bucket holding the `q` quantile of a
+    histogram with ascending buckets.
+    """
+    rank = max(1, math.ceil(q * sum(counts)))
+    seen = 0
+    for bucket, count in zip(buckets, counts):
+        seen += count
+        if seen >= rank:
+            return bucket_value(bucket)
+    return bucket_value(buckets[-1])
+
+
+def market_summary(conn, area: str | None = None) -> list[MarketStat]:
+    """
+    Price per m² statistics per area and bedroom count, read from the
+    histogram: the cost follows the number of areas and occupied buckets,
+    not the number of listings. Quantiles are within BUCKET_WIDTH / 2 of
+    the exact values; the mean is exact.
+    Args:
+        conn (sqlalchemy.engine.Connection): An open connection.
+        area (str | None): Only return this area.
+    Returns:
+        list[MarketStat]: One entry per (area, bedrooms), sorted.
+    """
+    table = MarketHistogram_DB.__table__
+    query = select(table).order_by(table.c.area, table.c.bedrooms, table.c.bucket)
+    if area is not None:
+        query = query.where(table.c.area == area)
+
+    stats = []
+    for (name, bedrooms), rows in groupby(
+        conn.execute(query), key=lambda r: (r.area, r.bedrooms)
+    ):
+        rows = list(rows)
+        buckets = [row.bucket for row in rows]
+        counts = [row.listings for row in rows]
+        listings = sum(counts)
+        stats.append(
+            MarketStat(
+                area=name,
+                bedrooms=None if bedrooms == UNKNOWN_BEDROOMS else bedrooms,
+                listings=listings,
+                mean_price_m2=sum(row.total_price_m2 for row in rows) / listings,
+                median_price_m2=histogram_quantile(buckets, counts, 0.5),
+                p25_price_m2=histogram_quantile(buckets, counts, 0.25),
+                p75_price_m2=histogram_quantile(buckets, counts, 0.75),
+            )
+        )
+    return stats
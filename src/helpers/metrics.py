@@ -0,0 +1,254 @@
+import bisect
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import UTC, datetime
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from models.pydantic_models import LatencyHistogram, Report, StageReport, TimeTask
+
+# Upper bounds, in seconds, of the page latency histogram buckets.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGES = ("scrape", "embed", "dedup", "load")
+
+
+def peak_rss_mb() -> float | None:
+    """
+    Returns the peak resident set size of the current process, in MiB.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class StageMetrics:
+    """
+    Counters of one pipeline stage. Stages can run concurrently (mapped
+    tasks, streaming), so every update goes through the owning RunMetrics lock.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.first_start: float | None = None
+        self.last_end: float | None = None
+        self.started_at: datetime | None = None
+        self.ended_at: datetime | None = None
+        self.busy_time = 0.0
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.bytes_fetched = 0
+        self.peak_rss_mb: float | None = None
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+
+    @property
+    def duration(self) -> float:
+        if self.first_start is None or self.last_end is None:
+            return 0.0
+        return self.last_end - self.first_start
+
+    def histogram(self) -> LatencyHistogram | None:
+        count = sum(self.latency_counts)
+        if not count:
+            return None
+        buckets: dict[str, int] = {}
+        cumulative = 0
+        for bound, bucket_count in zip((*LATENCY_BUCKETS, "+Inf"), self.latency_counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return LatencyHistogram(buckets=buckets, count=count, sum=self.latency_sum)
+
+    def to_report(self) -> StageReport:
+        duration = self.duration
+        return StageReport(
+            stage=self.name,
+            duration=duration,
+            busy_time=self.busy_time,
+            items_in=self.items_in,
+            items_out=self.items_out,
+            items_per_second=self.items_out / duration if duration > 0 else 0.0,
+            errors=self.errors,
+            bytes_fetched=self.bytes_fetched,
+            peak_rss_mb=self.peak_rss_mb,
+            page_latency=self.histogram(),
+        )
+
+
+class RunMetrics:
+    """
+    In-process metrics of one pipeline run, collected per stage.
+    Tasks wrap their work in `stage(name)` and report counts with `add` and
+    per-page latencies with `observe_latency`; `build_report` turns the
+    result into a Report.
+    """
+
+    def __init__(self):
+        self.stages: dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, name: str) -> StageMetrics:
+        if name not in self.stages:
+            self.stages[name] = StageMetrics(name)
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Times a unit of work of a stage. Concurrent units of the same stage
+        extend its wall-clock span and add up in its busy time.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            stage = self._stage(name)
+            if stage.first_start is None:
+                stage.first_start = start
+                stage.started_at = datetime.now(UTC)
+        try:
+            yield stage
+        finally:
+            end = time.perf_counter()
+            rss = peak_rss_mb()
+            with self._lock:
+                stage.busy_time += end - start
+                if stage.last_end is None or end > stage.last_end:
+                    stage.last_end = end
+                    stage.ended_at = datetime.now(UTC)
+                if rss is not None:
+                    stage.peak_rss_mb = max(stage.peak_rss_mb or 0.0, rss)
+
+    def add(
+        self,
+        name: str,
+        items_in: int = 0,
+        items_out: int = 0,
+        errors: int = 0,
+        bytes_fetched: int = 0,
+    ) -> None:
+        with self._lock:
+            stage = self._stage(name)
+            stage.items_in += items_in
+            stage.items_out += items_out
+            stage.errors += errors
+            stage.bytes_fetched += bytes_fetched
+
+    def observe_latency(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stage = self._stage(name)
+            stage.latency_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            stage.latency_sum += seconds
+
+    def build_report(self) -> Report:
+        with self._lock:
+            stages = {name: stage.to_report() for name, stage in self.stages.items()}
+            times = [
+                TimeTask(
+                    task_name=name,
+                    duration=stage.duration,
+                    start_time=stage.started_at,
+                    end_time=stage.ended_at,
+                )
+                for name, stage in self.stages.items()
+            ]
+
+        def errors(name: str) -> int:
+            return stages[name].errors if name in stages else 0
+
+        return Report(
+            apartments_processed=stages["load"].items_in if "load" in stages else 0,
+            errors_found_scraping=errors("scrape"),
+            errors_found_embedding=errors("embed"),
+            errors_found_inserting_postgress=errors("load"),
+            time=times,
+            stages=list(stages.values()),
+            peak_rss_mb=peak_rss_mb(),
+        )
+
+
+def to_prometheus(report: Report, prefix: str = "real_estate_pipeline") -> str:
+    """
+    Renders a Report in the Prometheus text exposition format.
+    """
+    metrics = {
+        "stage_duration_seconds": (
+            "gauge",
+            "Wall-clock duration of the stage",
+            "duration",
+        ),
+        "stage_busy_seconds": (
+            "gauge",
+            "Summed duration of every call of the stage",
+            "busy_time",
+        ),
+        "stage_items_in": ("gauge", "Items received by the stage", "items_in"),
+        "stage_items_out": ("gauge", "Items produced by the stage", "items_out"),
+        "stage_items_per_second": ("gauge", "Stage throughput", "items_per_second"),
+        "stage_errors": ("gauge", "Errors counted by the stage", "errors"),
+        "stage_bytes_fetched": (
+            "gauge",
+            "Bytes downloaded by the stage",
+            "bytes_fetched",
+        ),
+    }
+    lines = []
+    for metric, (kind, help_text, field) in metrics.items():
+        lines.append(f"# HELP {prefix}_{metric} {help_text}")
+        lines.append(f"# TYPE {prefix}_{metric} {kind}")
+        for stage in report.stages:
+            lines.append(
+                f'{prefix}_{metric}{{stage="{stage.stage}"}} {getattr(stage, field)}'
+            )
+
+    histogram = f"{prefix}_page_latency_seconds"
+    lines.append(f"# HELP {histogram} Time to fetch and parse one results page")
+    lines.append(f"# TYPE {histogram} histogram")
+    for stage in report.stages:
+        if stage.page_latency is None:
+            continue
+        for bound, count in stage.page_latency.buckets.items():
+            lines.append(
+                f'{histogram}_bucket{{stage="{stage.stage}",le="{bound}"}} {count}'
+            )
+        lines.append(
+            f'{histogram}_sum{{stage="{stage.stage}"}} {stage.page_latency.sum}'
+        )
+        lines.append(
+            f'{histogram}_count{{stage="{stage.stage}"}} {stage.page_latency.count}'
+        )
+
+    if report.peak_rss_mb is not None:
+        lines.append(
+            f"# HELP {prefix}_peak_rss_bytes Peak resident set size of the process"
+        )
+        lines.append(f"# TYPE {prefix}_peak_rss_bytes gauge")
+        lines.append(f"{prefix}_peak_rss_bytes {int(report.peak_rss_mb * 1024 * 1024)}")
+    return "\n".join(lines) + "\n"
+
+
+_metrics = RunMetrics()
+_metrics_lock = threading.Lock()
+
+
+def get_run_metrics() -> RunMetrics:
+    """
+    Returns the metrics of the current run.
+    """
+    return _metrics
+
+
+def start_run_metrics() -> RunMetrics:
+    """
+    Starts collecting the metrics of a new run.
+    """
+    global _metrics
+    with _metrics_lock:
+        _metrics = RunMetrics()
+    return _metrics
@@ -0,0 +1,179 @@
+import cProfile
+import functools
+import marshal
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+
+from config.logger import get_logger
+
+logger = get_logger("profiling")
+
+PROFILERS = ("sampling", "cprofile")
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+TOP_FUNCTIONS = 50
+
+_profiler: str | None = None
+_artifacts: list[tuple[str, bytes, str]] = []
+_counters: Counter = Counter()
+_lock = threading.Lock()
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class StackSampler:
+    """
+    Samples the Python stack of one thread at a fixed interval, from a
+    background thread, and counts identical stacks. The counts are written
+    in the collapsed-stack format read by flamegraph.pl, speedscope and
+    similar tools.
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def summary(self) -> str:
+        """
+        Top functions by inclusive and self sample counts, as plain text.
+        """
+        total = sum(self.stacks.values())
+        if not total:
+            return "No samples recorded\n"
+        inclusive: Counter = Counter()
+        exclusive: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            exclusive[frames[-1]] += count
+            for label in set(frames):
+                inclusive[label] += count
+
+        lines = [f"{total} samples every {self.interval * 1000:.1f} ms", ""]
+        for title, counter in (("Inclusive", inclusive), ("Self", exclusive)):
+            lines.append(f"{title}:")
+            for label, count in counter.most_common(TOP_FUNCTIONS):
+                lines.append(f"  {count / total:6.1%}  {count:8d}  {label}")
+            lines.append("")
+        return "\n".join(lines)
+
+
+def set_profiler(profiler: str | None) -> None:
+    """
+    Enables profiling of the tasks decorated with `profiled` for the current
+    run ("sampling" or "cprofile"), or disables it with None.
+    """
+    global _profiler
+    if profiler is not None and profiler not in PROFILERS:
+        raise ValueError(
+            f"Unknown profiler '{profiler}'. Expected one of: {', '.join(PROFILERS)}"
+        )
+    with _lock:
+        _profiler = profiler
+        _artifacts.clear()
+        _counters.clear()
+
+
+def collect_profiles() -> list[tuple[str, bytes, str]]:
+    """
+    Returns and forgets the profiles recorded so far, as
+    (file name, content, content type) tuples.
+    """
+    with _lock:
+        artifacts = list(_artifacts)
+        _artifacts.clear()
+    return artifacts
+
+
+def _store(name: str, content: bytes, content_type: str) -> None:
+    with _lock:
+        _artifacts.append((name, content, content_type))
+
+
+def profiled(func):
+    """
+    Profiles every call of a task function while profiling is enabled.
+    Each call stores a collapsed-stack file (`<task>-<n>.collapsed`) from a
+    stack sampler, plus either the cProfile statistics (`.pstats`) or a
+    text summary of the samples (`.txt`). Only the calling thread is
+    profiled: work handed to thread or process pools shows up as waits.
+    Put it under the `@task` decorator.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _profiler
+        if profiler is None:
+            return func(*args, **kwargs)
+
+        with _lock:
+            _counters[func.__name__] += 1
+            name = f"{func.__name__}-{_counters[func.__name__]:03d}"
+
+        sampler = StackSampler(threading.get_ident())
+        profile = cProfile.Profile() if profiler == "cprofile" else None
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError as e:
+                # Python 3.12+ allows a single active cProfile per process
+                logger.warning(f"cProfile unavailable for {name}, sampling only: {e}")
+                profile = None
+        sampler.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sampler.stop()
+            if profile is not None:
+                profile.disable()
+            try:
+                _store(
+                    f"{name}.collapsed",
+                    sampler.collapsed().encode("utf-8"),
+                    "text/plain",
+                )
+                if profile is not None:
+                    # Same content as Stats.dump_stats, without a temporary file
+                    stats = marshal.dumps(pstats.Stats(profile).stats)
+                    _store(f"{name}.pstats", stats, "application/octet-stream")
+                else:
+                    _store(
+                        f"{name}.txt", sampler.summary().encode("utf-8"), "text/plain"
+                    )
+            except Exception as e:
+                logger.error(f"Could not record the profile of {name}: {e}")
+
+    return wrapper
@@ -0,0 +1,317 @@
+import hashlib
+import math
+import os
+import struct
+import threading
+import time
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from sqlalchemy import select
+
+from config.logger import get_logger
+from config.postgres import connection_scope
+from models.sqlalchemy_models import Apartment_DB
+
+load_dotenv()
+
+logger = get_logger("seen_index")
+
+DEFAULT_INDEX_PATH = os.getenv("SEEN_INDEX_PATH", ".cache/seen_urls.bloom")
+DEFAULT_CAPACITY = int(os.getenv("SEEN_INDEX_CAPACITY", "1000000"))
+DEFAULT_ERROR_RATE = 0.01
+DEFAULT_STOP_AFTER = 30
+DEFAULT_FULL_CRAWL_EVERY = 7
+
+# Fields compared against the stored row to decide whether a listing changed.
+LISTING_FIELDS = ("name", "address", "m2", "bedrooms", "bathrooms", "price")
+
+# Keeps SQL parameter lists well below the driver limits.
+QUERY_CHUNK_SIZE = 500
+
+# magic, version, bit count, hash count, items added, runs since the last full crawl, last full crawl
+_HEADER = struct.Struct("<4sBQIQId")
+_MAGIC = b"SEEN"
+_VERSION = 1
+
+
+def listing_key(url: str) -> str:
+    """
+    Normalizes a listing URL the same way the load stage does.
+    """
+    return url.strip().lower()
+
+
+def listing_fields(listing) -> dict:
+    """
+    Returns the fields of a scraped listing, given as an Apartment or a dict.
+    """
+    return listing.model_dump() if isinstance(listing, BaseModel) else listing
+
+
+def listing_hash(fields: dict) -> str:
+    """
+    Content hash of the LISTING_FIELDS of a listing, stored as
+    `apartment.content_hash` to detect changes without comparing columns.
+    Integral floats hash like ints, so values read back from the database
+    match the scraped ones.
+    """
+    values = []
+    for name in LISTING_FIELDS:
+        value = fields.get(name)
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        values.append(value)
+    return hashlib.blake2b(repr(values).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+    Membership tests never give false negatives; false positives happen at
+    about `error_rate` once `capacity` items have been added.
+    """
+
+    def __init__(
+        self, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE
+    ):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> bool:
+        """
+        Adds an item. Returns True if it was (probably) not present before.
+        """
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position // 8] & (1 << (position % 8))
+            for position in self._positions(item)
+        )
+
+
+class SeenIndex:
+    """
+    Index of the listing URLs seen by earlier runs, persisted between runs.
+    A Bloom filter answers "never seen" without touching the database; URLs
+    it reports as seen are confirmed against the `apartment` table, which
+    also tells whether the listing changed since it was stored.
+    The index also remembers how many incremental runs happened since the
+    last full crawl, so full crawls can be scheduled periodically.
+    """
+
+    def __init__(
+        self, path: str = DEFAULT_INDEX_PATH, capacity: int = DEFAULT_CAPACITY
+    ):
+        self.path = path
+        self.bloom = BloomFilter(capacity)
+        self.runs_since_full = 0
+        self.last_full_crawl = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(
+        cls, path: str = DEFAULT_INDEX_PATH, capacity: int = DEFAULT_CAPACITY
+    ) -> "SeenIndex":
+        """
+        Loads the index stored at `path`, or returns an empty one if there is
+        none or it cannot be read.
+        """
+        index = cls(path, capacity)
+        if not os.path.exists(path):
+            return index
+        try:
+            with open(path, "rb") as f:
+                header = f.read(_HEADER.size)
+                magic, version, num_bits, num_hashes, count, runs, last_full = (
+                    _HEADER.unpack(header)
+                )
+                if magic != _MAGIC or version != _VERSION:
+                    raise ValueError("unknown file format")
+                bits = bytearray(f.read())
+            if len(bits) != (num_bits + 7) // 8:
+                raise ValueError("truncated file")
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(
+                f"Seen-listing index {path} could not be read, starting empty: {e}"
+            )
+            return index
+
+        index.bloom.num_bits, index.bloom.num_hashes = num_bits, num_hashes
+        index.bloom.count, index.bloom.bits = count, bits
+        index.runs_since_full, index.last_full_crawl = runs, last_full
+        return index
+
+    def save(self) -> None:
+        """
+        Writes the index atomically to its path.
+        """
+        with self._lock:
+            header = _HEADER.pack(
+                _MAGIC,
+                _VERSION,
+                self.bloom.num_bits,
+                self.bloom.num_hashes,
+                self.bloom.count,
+                self.runs_since_full,
+                self.last_full_crawl,
+            )
+            data = header + bytes(self.bloom.bits)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def add_many(self, urls) -> int:
+        """
+        Marks URLs as seen. Returns the number of URLs that were new to the index.
+        """
+        with self._lock:
+            added = sum(self.bloom.add(listing_key(url)) for url in urls)
+            if self.bloom.count > self.bloom.capacity:
+                logger.warning(
+                    f"Seen-listing index holds {self.bloom.count} URLs, above its capacity of "
+                    f"{self.bloom.capacity}; false positives will increase"
+                )
+        return added
+
+    def might_contain(self, url: str) -> bool:
+        with self._lock:
+            return listing_key(url) in self.bloom
+
+    def known_unchanged(self, listings: list) -> list[bool]:
+        """
+        Tells, for each scraped listing, whether it is already stored with the
+        same values, comparing content hashes (or the columns of rows stored
+        before hashes existed). Listings the Bloom filter has never seen are
+        new without a database lookup. If the database cannot be queried,
+        every listing is treated as unknown so the crawl carries on.
+        Args:
+            listings (list): Scraped listings, as Apartment objects or dicts.
+        Returns:
+            list[bool]: One flag per listing.
+        """
+        fields = [listing_fields(listing) for listing in listings]
+        candidates = [f["url"] for f in fields if self.might_contain(f["url"])]
+        if not candidates:
+            return [False] * len(fields)
+
+        columns = [Apartment_DB.url, Apartment_DB.content_hash] + [
+            getattr(Apartment_DB, name) for name in LISTING_FIELDS
+        ]
+        stored: dict[str, tuple] = {}
+        try:
+            with connection_scope() as conn:
+                for start in range(0, len(candidates), QUERY_CHUNK_SIZE):
+                    chunk = candidates[start : start + QUERY_CHUNK_SIZE]
+                    for row in conn.execute(
+                        select(*columns).where(Apartment_DB.url.in_(chunk))
+                    ):
+                        stored[listing_key(row[0])] = (row[1], tuple(row[2:]))
+        except Exception as e:
+            logger.error(f"Could not check seen listings in Postgres: {e}")
+            return [False] * len(fields)
+
+        def unchanged(f: dict) -> bool:
+            stored_hash, stored_values = stored.get(listing_key(f["url"]), (None, None))
+            if stored_hash is not None:
+                return stored_hash == listing_hash(f)
+            return stored_values == tuple(f.get(name) for name in LISTING_FIELDS)
+
+        return [unchanged(f) for f in fields]
+
+    def full_crawl_due(self, every: int = DEFAULT_FULL_CRAWL_EVERY) -> bool:
+        """
+        Tells whether the next run should be a full crawl: every `every` runs,
+        and always while the index is empty. `every` <= 0 disables periodic full crawls.
+        """
+        if self.bloom.count == 0:
+            return True
+        return every > 0 and self.runs_since_full + 1 >= every
+
+    def record_run(self, full: bool) -> None:
+        """
+        Updates the run counters after a crawl.
+        """
+        with self._lock:
+            if full:
+                self.runs_since_full = 0
+                self.last_full_crawl = time.time()
+            else:
+                self.runs_since_full += 1
+
+
+class IncrementalCrawl:
+    """
+    Decides when to stop paginating a search whose results are sorted
+    newest-first: once `stop_after` consecutive listings are already stored
+    and unchanged, the following pages only hold older, known listings.
+    Pages must be checked in page order.
+    """
+
+    def __init__(self, index: SeenIndex, stop_after: int = DEFAULT_STOP_AFTER):
+        self.index = index
+        self.stop_after = stop_after
+        self.consecutive_known = 0
+        self.pages_checked = 0
+
+    def should_stop(self, listings: list) -> bool:
+        """
+        Checks the listings of the next page and tells whether pagination can stop.
+        """
+        self.pages_checked += 1
+        for known in self.index.known_unchanged(listings):
+            self.consecutive_known = self.consecutive_known + 1 if known else 0
+            if self.consecutive_known >= self.stop_after:
+                logger.info(
+                    f"Stopping pagination after page {self.pages_checked}: "
+                    f"{self.consecutive_known} consecutive known listings"
+                )
+                return True
+        return False
+
+
+_index: SeenIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_seen_index() -> SeenIndex:
+    """
+    Returns the process-wide seen-listing index, loading it on first use.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SeenIndex.load()
+        return _index
+
+
+def get_incremental_crawl(stop_after: int) -> IncrementalCrawl | None:
+    """
+    Returns a fresh stop condition for one search, or None when
+    `stop_after` <= 0 (full crawl).
+    """
+    if stop_after <= 0:
+        return None
+    return IncrementalCrawl(get_seen_index(), stop_after)
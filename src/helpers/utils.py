@@ -1,9 +1,25 @@
 from datetime import datetime
+import importlib.util
 import re
 from typing import Optional
 
 from models.pydantic_models import TimeTask
 
+# lxml is several times faster than the stdlib parser; use it when installed.
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+
+def normalize_text(text: str) -> str:
+    """
+    Collapses runs of whitespace into single spaces and strips the ends,
+    matching the text Selenium reports for an element.
+    Args:
+        text (str): The raw text.
+    Returns:
+        str: The normalized text.
+    """
+    return " ".join(text.split())
+
 
 def extract_int(text: str) -> int | None:
     """
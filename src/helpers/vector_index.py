@@ -0,0 +1,492 @@
+import math
+import os
+import struct
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import select
+
+from config.logger import get_logger
+from config.postgres import connection_scope
+from models.sqlalchemy_models import Apartment_DB
+from models.vector_types import embedding_as_array
+
+load_dotenv()
+
+logger = get_logger("vector_index")
+
+DEFAULT_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", ".cache/vector_index.bin")
+DEFAULT_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "16"))
+DEFAULT_K = 10
+
+# Rows read per query when the index is built from the database.
+LOAD_CHUNK_SIZE = 5000
+# Upper bound of the query x row score matrix computed at once (64 MiB of float32).
+SCORE_BUFFER_SIZE = 1 << 24
+# Training sample per IVF list, and k-means iterations.
+IVF_SAMPLE_PER_LIST = 32
+IVF_ITERATIONS = 10
+
+# Listing columns stored next to each vector for filtered search (NaN when unknown).
+ATTRIBUTES = ("price", "m2", "bedrooms", "bathrooms")
+
+# magic, version, row count, dimension, IVF list count, url blob size
+_HEADER = struct.Struct("<4sBIIIQ")
+_MAGIC = b"VIDX"
+_VERSION = 2
+_ALIGNMENT = 64
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scales every row to unit length, so dot products are cosine similarities.
+    Zero rows are left as they are.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0).astype(np.float32)
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the positions and values of the `k` largest scores of every row,
+    best first, without sorting whole rows.
+    """
+    k = min(k, scores.shape[1])
+    if k == scores.shape[1]:
+        positions = np.argsort(-scores, axis=1)
+    else:
+        positions = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, positions, axis=1), axis=1)
+        positions = np.take_along_axis(positions, order, axis=1)
+    return positions, np.take_along_axis(scores, positions, axis=1)
+
+
+def _padding(offset: int) -> int:
+    return -offset % _ALIGNMENT
+
+
+class VectorIndex:
+    """
+    In-process cosine similarity index over the apartment embeddings.
+    Vectors are kept L2-normalized in one contiguous float32 matrix, one row
+    per listing URL, so a batch of queries is a single matrix product.
+    Rows can be added or replaced as new runs are loaded; the matrix grows
+    geometrically so appends are amortized.
+    An optional IVF (inverted file) index clusters the rows around `nlist`
+    k-means centroids; queries then only score the rows of the `nprobe`
+    closest clusters, which keeps latency in the milliseconds at millions of
+    rows in exchange for approximate results.
+    The ATTRIBUTES of every listing are kept in a parallel float32 matrix
+    for filtered search, and `version` changes on every upsert so derived
+    structures know when to rebuild.
+    Snapshots are a single file that is memory-mapped copy-on-write when
+    loaded, so opening a large index is instant and its pages are shared
+    between processes.
+    """
+
+    def __init__(self, dim: int | None = None):
+        self.dim = dim
+        self.count = 0
+        self.urls: list[str] = []
+        self.positions: dict[str, int] = {}
+        self.vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self.attributes = np.empty((0, len(ATTRIBUTES)), dtype=np.float32)
+        self.version = 0
+        self.centroids: np.ndarray | None = None
+        self.assignments: np.ndarray | None = None
+        self._list_order: np.ndarray | None = None
+        self._list_offsets: np.ndarray | None = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def has_ivf(self) -> bool:
+        return self.centroids is not None
+
+    def _reserve(self, rows: int) -> None:
+        if rows <= self.vectors.shape[0]:
+            return
+        capacity = max(rows, 2 * self.vectors.shape[0], 1024)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[: self.count] = self.vectors[: self.count]
+        self.vectors = vectors
+        attributes = np.full((capacity, len(ATTRIBUTES)), np.nan, dtype=np.float32)
+        attributes[: self.count] = self.attributes[: self.count]
+        self.attributes = attributes
+        if self.assignments is not None:
+            assignments = np.empty(capacity, dtype=np.int32)
+            assignments[: self.count] = self.assignments[: self.count]
+            self.assignments = assignments
+
+    def upsert(self, urls: list[str], vectors, attributes=None) -> int:
+        """
+        Adds new listings and replaces the vectors of known ones.
+        When an IVF index is trained, the rows are assigned to their closest
+        centroid right away; the centroids themselves are not retrained.
+        Args:
+            urls (list[str]): Listing URLs, as stored in `apartment.url`.
+            vectors (array-like): One embedding per URL.
+            attributes (array-like | None): One row of ATTRIBUTES values per
+                URL, NaN for unknown values. Defaults to all unknown.
+        Returns:
+            int: The number of rows that were new to the index.
+        Raises:
+            ValueError: If the vectors do not match the index dimension.
+        """
+        vectors = normalize_rows(np.atleast_2d(vectors))
+        if len(urls) != len(vectors):
+            raise ValueError(f"Got {len(urls)} urls for {len(vectors)} vectors")
+        if not len(urls):
+            return 0
+
+        with self._lock:
+            if self.dim is None or (
+                self.count == 0 and self.vectors.shape[1] != vectors.shape[1]
+            ):
+                self.dim = vectors.shape[1]
+                self.vectors = np.empty((0, self.dim), dtype=np.float32)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}"
+                )
+
+            rows = np.empty(len(urls), dtype=np.int64)
+            added = 0
+            for i, url in enumerate(urls):
+                row = self.positions.get(url)
+                if row is None:
+                    row = self.count + added
+                    self.positions[url] = row
+                    self.urls.append(url)
+                    added += 1
+                rows[i] = row
+            self._reserve(self.count + added)
+            # Later duplicates win, as with repeated assignments
+            self.vectors[rows] = vectors
+            self.attributes[rows] = np.nan if attributes is None else attributes
+            self.count += added
+            self.version += 1
+            if self.centroids is not None:
+                self.assignments[rows] = self._assign(vectors)
+                self._list_order = self._list_offsets = None
+        return added
+
+    def upsert_apartments(self, apartments: list) -> int:
+        """
+        Adds or replaces the embeddings of Apartment_DB rows; rows without an
+        embedding are skipped.
+        """
+        urls, vectors, attributes = [], [], []
+        for apartment in apartments:
+            vector = embedding_as_array(apartment)
+            if vector is not None:
+                urls.append(apartment.url)
+                vectors.append(vector)
+                attributes.append([getattr(apartment, name) for name in ATTRIBUTES])
+        if not vectors:
+            return 0
+        return self.upsert(
+            urls, np.stack(vectors), np.array(attributes, dtype=np.float32)
+        )
+
+    def snapshot(self) -> tuple[int, int, np.ndarray, np.ndarray, list[str]]:
+        """
+        Returns a consistent (version, count, vectors, attributes, urls) view;
+        only the first `count` rows of the arrays are valid.
+        """
+        with self._lock:
+            return self.version, self.count, self.vectors, self.attributes, self.urls
+
+    def vector(self, url: str) -> np.ndarray | None:
+        """
+        Returns the stored (normalized) vector of a listing, or None if it is not indexed.
+        """
+        with self._lock:
+            row = self.positions.get(url)
+            return None if row is None else np.array(self.vectors[row])
+
+    def _assign(
+        self, vectors: np.ndarray, centroids: np.ndarray | None = None
+    ) -> np.ndarray:
+        centroids = self.centroids if centroids is None else centroids
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        step = max(1, SCORE_BUFFER_SIZE // len(centroids))
+        for start in range(0, len(vectors), step):
+            block = vectors[start : start + step] @ centroids.T
+            assignments[start : start + step] = block.argmax(axis=1)
+        return assignments
+
+    def train_ivf(
+        self, nlist: int | None = None, iterations: int = IVF_ITERATIONS, seed: int = 0
+    ):
+        """
+        Clusters the indexed vectors with spherical k-means and builds the
+        inverted lists used by approximate search.
+        Args:
+            nlist (int | None): Number of clusters. Defaults to 2 * sqrt(rows).
+            iterations (int): k-means iterations, run on a sample of
+                IVF_SAMPLE_PER_LIST rows per cluster.
+            seed (int): Random seed of the sampling.
+        """
+        with self._lock:
+            vectors = self.vectors[: self.count]
+            if not self.count:
+                raise ValueError("Cannot train an IVF index on an empty index")
+            nlist = max(1, min(nlist or int(2 * math.sqrt(self.count)), self.count))
+            rng = np.random.default_rng(seed)
+            sample_size = min(self.count, nlist * IVF_SAMPLE_PER_LIST)
+            sample = vectors[
+                np.sort(rng.choice(self.count, sample_size, replace=False))
+            ]
+
+            centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+            for _ in range(iterations):
+                labels = self._assign(sample, centroids)
+                counts = np.bincount(labels, minlength=nlist)
+                # Per-cluster sums of the rows grouped by label (np.add.at is much slower)
+                sums = np.zeros_like(centroids)
+                grouped = sample[np.argsort(labels, kind="stable")]
+                starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+                filled = counts > 0
+                sums[filled] = np.add.reduceat(grouped, starts[filled], axis=0)
+                # Empty clusters restart from a random sample row
+                empty = counts == 0
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+                centroids = normalize_rows(sums)
+
+            assignments = np.empty(self.vectors.shape[0], dtype=np.int32)
+            assignments[: self.count] = self._assign(vectors, centroids)
+            self.centroids, self.assignments = centroids, assignments
+            self._list_order = self._list_offsets = None
+        logger.info(
+            f"Trained an IVF index with {nlist} lists over {self.count} vectors"
+        )
+
+    def _inverted_lists(self) -> tuple[np.ndarray, np.ndarray]:
+        # Rebuilt lazily after upserts: row ids sorted by list, plus list boundaries
+        with self._lock:
+            if self._list_order is None:
+                assignments = self.assignments[: self.count]
+                self._list_order = np.argsort(assignments, kind="stable")
+                counts = np.bincount(assignments, minlength=len(self.centroids))
+                self._list_offsets = np.concatenate(([0], np.cumsum(counts)))
+            return self._list_order, self._list_offsets
+
+    def search(
+        self,
+        queries,
+        k: int = DEFAULT_K,
+        exact: bool = False,
+        nprobe: int = DEFAULT_NPROBE,
+    ) -> list[list[tuple[str, float]]]:
+        """
+        Finds the `k` most similar listings of each query vector.
+        Args:
+            queries (array-like): One vector, or a (queries x dim) batch.
+            k (int): Number of results per query.
+            exact (bool): Score every row even when an IVF index is trained.
+            nprobe (int): IVF clusters scanned per query; more is slower and more accurate.
+        Returns:
+            list[list[tuple[str, float]]]: Per query, (url, cosine similarity) pairs, best first.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        with self._lock:
+            count, vectors, urls = self.count, self.vectors, self.urls
+            ivf = self.has_ivf and not exact
+            if ivf:
+                centroids = self.centroids
+                order, offsets = self._inverted_lists()
+        if count == 0:
+            return [[] for _ in queries]
+
+        results = []
+        if not ivf:
+            step = max(1, SCORE_BUFFER_SIZE // count)
+            for start in range(0, len(queries), step):
+                scores = queries[start : start + step] @ vectors[:count].T
+                positions, values = top_k(scores, k)
+                results.extend(
+                    [(urls[p], float(v)) for p, v in zip(row_positions, row_values)]
+                    for row_positions, row_values in zip(positions, values)
+                )
+            return results
+
+        probes, _ = top_k(queries @ centroids.T, nprobe)
+        for query, lists in zip(queries, probes):
+            rows = np.concatenate([order[offsets[i] : offsets[i + 1]] for i in lists])
+            if not len(rows):
+                results.append([])
+                continue
+            positions, values = top_k((vectors[rows] @ query)[None, :], k)
+            results.append(
+                [(urls[rows[p]], float(v)) for p, v in zip(positions[0], values[0])]
+            )
+        return results
+
+    def similar_to(
+        self, url: str, k: int = DEFAULT_K, **kwargs
+    ) -> list[tuple[str, float]]:
+        """
+        Finds the listings most similar to an indexed one, excluding itself.
+        Raises:
+            KeyError: If the URL is not indexed.
+        """
+        vector = self.vector(url)
+        if vector is None:
+            raise KeyError(url)
+        matches = self.search(vector, k + 1, **kwargs)[0]
+        return [match for match in matches if match[0] != url][:k]
+
+    @classmethod
+    def from_database(
+        cls, engine=None, chunk_size: int = LOAD_CHUNK_SIZE
+    ) -> "VectorIndex":
+        """
+        Builds the index from every stored embedding, reading packed
+        embeddings first and legacy arrays otherwise. Rows are read in url
+        order with keyset pagination so memory stays bounded by the matrix.
+        """
+        index = cls()
+        columns = (
+            Apartment_DB.url,
+            Apartment_DB.embedding_packed,
+            Apartment_DB.embedding,
+            *(getattr(Apartment_DB, name) for name in ATTRIBUTES),
+        )
+        last_url = ""
+        while True:
+            with connection_scope(engine) as conn:
+                rows = conn.execute(
+                    select(*columns)
+                    .where(Apartment_DB.url > last_url)
+                    .where(
+                        Apartment_DB.embedding_packed.is_not(None)
+                        | Apartment_DB.embedding.is_not(None)
+                    )
+                    .order_by(Apartment_DB.url)
+                    .limit(chunk_size)
+                ).all()
+            if not rows:
+                break
+            index.upsert_apartments(rows)
+            last_url = rows[-1].url
+        logger.info(f"Built a vector index of {index.count} embeddings from Postgres")
+        return index
+
+    def save(self, path: str = DEFAULT_INDEX_PATH) -> None:
+        """
+        Writes a snapshot atomically: header, URLs, the vector and attribute
+        matrices and the IVF centroids and assignments, each aligned for
+        memory mapping.
+        """
+        with self._lock:
+            url_blob = "\n".join(self.urls).encode("utf-8")
+            nlist = len(self.centroids) if self.centroids is not None else 0
+            header = _HEADER.pack(
+                _MAGIC, _VERSION, self.count, self.dim or 0, nlist, len(url_blob)
+            )
+            offset = len(header) + len(url_blob)
+            parts = [header, url_blob, b"\0" * _padding(offset)]
+            parts.append(
+                np.ascontiguousarray(self.vectors[: self.count], dtype="<f4").tobytes()
+            )
+            parts.append(
+                np.ascontiguousarray(
+                    self.attributes[: self.count], dtype="<f4"
+                ).tobytes()
+            )
+            if nlist:
+                parts.append(
+                    np.ascontiguousarray(self.centroids, dtype="<f4").tobytes()
+                )
+                parts.append(self.assignments[: self.count].astype("<i4").tobytes())
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.writelines(parts)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved a vector index of {self.count} embeddings to {path}")
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_INDEX_PATH, mmap: bool = True) -> "VectorIndex":
+        """
+        Opens a snapshot written by `save`. With `mmap`, the arrays are mapped
+        copy-on-write: upserts never modify the file, and the matrix is only
+        copied into memory when it has to grow.
+        Raises:
+            ValueError: If the file is not a snapshot of the current version.
+        """
+        with open(path, "rb") as f:
+            magic, version, count, dim, nlist, url_size = _HEADER.unpack(
+                f.read(_HEADER.size)
+            )
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not a vector index snapshot")
+            if version != _VERSION:
+                raise ValueError(
+                    f"{path} has the unsupported snapshot version {version}"
+                )
+            url_blob = f.read(url_size)
+
+        offset = _HEADER.size + url_size
+        offset += _padding(offset)
+
+        def array(dtype: str, shape: tuple) -> np.ndarray:
+            nonlocal offset
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            if mmap and size:
+                result = np.memmap(
+                    path, dtype=dtype, mode="c", offset=offset, shape=shape
+                )
+            else:
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    result = (
+                        np.frombuffer(f.read(size), dtype=dtype).reshape(shape).copy()
+                    )
+            offset += size
+            return result
+
+        index = cls(dim or None)
+        index.count = count
+        index.urls = url_blob.decode("utf-8").split("\n") if count else []
+        index.positions = {url: row for row, url in enumerate(index.urls)}
+        index.vectors = array("<f4", (count, dim))
+        index.attributes = array("<f4", (count, len(ATTRIBUTES)))
+        if nlist:
+            index.centroids = np.asarray(array("<f4", (nlist, dim)))
+            index.assignments = array("<i4", (count,))
+        if len(index.urls) != count:
+            raise ValueError(
+                f"{path} is corrupted: {len(index.urls)} urls for {count} vectors"
+            )
+        logger.info(f"Loaded a vector index of {count} embeddings from {path}")
+        return index
+
+
+_index: VectorIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index(path: str = DEFAULT_INDEX_PATH) -> VectorIndex:
+    """
+    Returns the process-wide vector index: the snapshot at `path` when there
+    is a readable one, otherwise an index built from the database.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = VectorIndex.load(path) if os.path.exists(path) else None
+            except Exception as e:
+                logger.warning(f"Vector index snapshot {path} could not be read: {e}")
+            if _index is None:
+                _index = VectorIndex.from_database()
+        return _index
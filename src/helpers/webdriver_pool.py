@@ -0,0 +1,122 @@
+import queue
+import threading
+from collections.abc import Callable
+from contextlib import contextmanager
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+from config.logger import get_logger
+
+logger = get_logger("webdriver_pool")
+
+
+class WebDriverPool:
+    """
+    Thread-safe pool of reusable WebDriver instances.
+    Drivers are created lazily up to `size`, handed out with `driver()` and
+    kept warm between uses. A driver that fails a health check or raises a
+    WebDriverException while in use is discarded and replaced on demand.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], WebDriver],
+        size: int,
+        destroy: Callable[[WebDriver], None] | None = None,
+    ):
+        self.factory = factory
+        self.destroy = destroy or (lambda driver: driver.quit())
+        self.size = max(1, size)
+        self._idle: queue.LifoQueue[WebDriver] = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_healthy(driver: WebDriver) -> bool:
+        """
+        Checks that the browser behind a driver still answers commands.
+        """
+        try:
+            return driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _discard(self, driver: WebDriver) -> None:
+        with self._lock:
+            self._created -= 1
+        try:
+            self.destroy(driver)
+        except Exception as e:
+            logger.warning(f"WebDriver could not be closed properly: {e}")
+
+    def _acquire(self) -> WebDriver:
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        return self.factory()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                # Re-check capacity periodically: a discarded driver frees a slot
+                try:
+                    driver = self._idle.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+
+            if self.is_healthy(driver):
+                return driver
+            logger.warning("Discarding unhealthy WebDriver")
+            self._discard(driver)
+
+    def _release(self, driver: WebDriver, healthy: bool) -> None:
+        with self._lock:
+            over_capacity = self._created > self.size
+        if healthy and not over_capacity:
+            self._idle.put(driver)
+        else:
+            self._discard(driver)
+
+    @contextmanager
+    def driver(self):
+        """
+        Borrows a driver from the pool for the duration of the `with` block.
+        Yields:
+            WebDriver: A healthy driver.
+        """
+        driver = self._acquire()
+        healthy = True
+        try:
+            yield driver
+        except WebDriverException:
+            healthy = False
+            raise
+        finally:
+            self._release(driver, healthy)
+
+    def resize(self, size: int) -> None:
+        """
+        Changes the maximum number of drivers. Extra drivers are closed as
+        they are returned.
+        """
+        with self._lock:
+            self.size = max(1, size)
+
+    def close(self) -> None:
+        """
+        Closes every idle driver.
+        """
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
@@ -1,6 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import datetime
-from typing import Optional
 
 
 class Apartment(BaseModel):
@@ -31,8 +30,35 @@ class Apartment(BaseModel):
 class TimeTask(BaseModel):
     task_name: str
     duration: float  # in seconds
-    start_time: Optional[datetime] = None
-    end_time: Optional[datetime] = None
+    start_time: datetime | None = None
+    end_time: datetime | None = None
+
+
+class LoadStats(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    errors: int = 0
+
+
+class LatencyHistogram(BaseModel):
+    # Cumulative count per upper bound in seconds ("+Inf" last)
+    buckets: dict[str, int] = {}
+    count: int = 0
+    sum: float = 0.0  # in seconds
+
+
+class StageReport(BaseModel):
+    stage: str
+    duration: float  # wall-clock seconds from the first start to the last end
+    busy_time: float  # summed seconds of every (possibly concurrent) call
+    items_in: int = 0
+    items_out: int = 0
+    items_per_second: float = 0.0
+    errors: int = 0
+    bytes_fetched: int = 0
+    peak_rss_mb: float | None = None
+    page_latency: LatencyHistogram | None = None
 
 
 class Report(BaseModel):
@@ -41,3 +67,45 @@ class Report(BaseModel):
     errors_found_embedding: int
     errors_found_inserting_postgress: int
     time: list[TimeTask]
+    stages: list[StageReport] = []
+    peak_rss_mb: float | None = None
+
+
+class SearchFilters(BaseModel):
+    model_config = ConfigDict(frozen=True)  # hashable, used as a cache key
+
+    min_price: float | None = None
+    max_price: float | None = None
+    min_m2: float | None = None
+    max_m2: float | None = None
+    min_bedrooms: int | None = None
+    max_bedrooms: int | None = None
+    min_bathrooms: int | None = None
+    max_bathrooms: int | None = None
+
+
+class SearchResult(BaseModel):
+    url: str
+    score: float  # cosine similarity
+    price: float | None = None
+    m2: float | None = None
+    bedrooms: int | None = None
+    bathrooms: int | None = None
+
+
+class SearchPage(BaseModel):
+    results: list[SearchResult]
+    page: int
+    page_size: int
+    candidates: int  # listings matching the filters
+    has_more: bool = False
+
+
+class MarketStat(BaseModel):
+    area: str
+    bedrooms: int | None = None  # None for listings without a bedroom count
+    listings: int
+    mean_price_m2: float
+    median_price_m2: float
+    p25_price_m2: float
+    p75_price_m2: float
@@ -0,0 +1,15 @@
+import re
+
+# First host label of a lowercase listing URL, without "www." ("pisos", "solvia").
+# Also evaluated by Postgres (config/schema.py), so keep it to the common regex subset.
+SOURCE_PATTERN = r"^[a-z]+://(?:www\.)?([^./:]+)"
+UNKNOWN_SOURCE = "unknown"
+
+
+def listing_source(url: str) -> str:
+    """
+    Returns the portal a listing URL belongs to, e.g. "pisos" for
+    https://www.pisos.com/..., or UNKNOWN_SOURCE when it has no host.
+    """
+    match = re.match(SOURCE_PATTERN, (url or "").strip().lower())
+    return match.group(1) if match else UNKNOWN_SOURCE
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, String, Float, Integer, ARRAY
+from sqlalchemy import Column, String, Float, Integer, ARRAY, DateTime, func
 from sqlalchemy.ext.declarative import declarative_base
 
+from models.vector_types import EMBEDDING_STORAGE, PackedVector, packed_dtype
+
 Base = declarative_base()
 
 
@@ -15,3 +17,51 @@ class Apartment_DB(Base):
     bathrooms = Column(Integer)
     price = Column(Float)
     embedding = Column(ARRAY(Float))
+    embedding_packed = Column(PackedVector(packed_dtype(EMBEDDING_STORAGE)))
+    cluster_id = Column(String(16), index=True)  # near-duplicate cluster, NULL if none
+    content_hash = Column(String(32))  # hash of the listing fields, see listing_hash
+    first_seen = Column(DateTime(timezone=True), server_default=func.now())
+    last_seen = Column(DateTime(timezone=True), server_default=func.now())
+    source = Column(String(32))  # portal of the listing, see listing_source
+    # When the stored values were scraped: unlike last_seen it only moves when they change.
+    scraped_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ApartmentPriceHistory_DB(Base):
+    """
+    Append-only price events: one row when a listing is first stored and
+    one per price change. Range-partitioned by month on `seen_at`; the
+    partitions are created on demand by `ensure_history_partition`.
+    """
+
+    __tablename__ = "apartment_price_history"
+    __table_args__ = ({"postgresql_partition_by": "RANGE (seen_at)"},)
+
+    url = Column(String, primary_key=True)
+    seen_at = Column(DateTime(timezone=True), primary_key=True)
+    price = Column(Float)
+
+
+class MarketHistogram_DB(Base):
+    """
+    Price per m² of the stored listings per (area, bedrooms), as a histogram
+    of logarithmic buckets with a listing count and a value sum each.
+    Maintained incrementally by the load stage, see helpers/market_stats.py.
+    """
+
+    __tablename__ = "market_price_m2_histogram"
+
+    area = Column(String, primary_key=True)
+    bedrooms = Column(Integer, primary_key=True)  # UNKNOWN_BEDROOMS when unknown
+    bucket = Column(Integer, primary_key=True)
+    listings = Column(Integer, nullable=False)
+    total_price_m2 = Column(Float, nullable=False)
+
+
+class EmbeddingCache_DB(Base):
+    __tablename__ = "embedding_cache"
+
+    key = Column(String(64), primary_key=True)
+    embedding = Column(PackedVector("float32"), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    last_access = Column(DateTime, nullable=False, index=True)
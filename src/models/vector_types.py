@@ -0,0 +1,115 @@
+import os
+import struct
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+load_dotenv()
+
+# How new embeddings are stored on Apartment_DB:
+# - "array": legacy ARRAY(Float) column `embedding` (8 bytes per dimension).
+# - "float32": packed float32 bytes in `embedding_packed` (4 bytes per dimension).
+# - "int8": int8-quantized bytes plus a float32 scale in `embedding_packed` (1 byte per dimension).
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "array")
+STORAGE_MODES = ("array", "float32", "int8")
+if EMBEDDING_STORAGE not in STORAGE_MODES:
+    raise ValueError(
+        f"Unknown EMBEDDING_STORAGE '{EMBEDDING_STORAGE}'. "
+        f"Expected one of: {', '.join(STORAGE_MODES)}"
+    )
+
+FLOAT32_TAG = 0
+INT8_TAG = 1
+_SCALE = struct.Struct("<f")
+
+
+def pack_vector(vector, dtype: str = "float32") -> bytes:
+    """
+    Serializes a vector into a compact, self-describing byte string.
+    The first byte tags the encoding. float32 vectors follow as little-endian
+    floats; int8 vectors store a float32 scale followed by one signed byte per
+    dimension, where value = byte * scale.
+    Args:
+        vector (array-like): The embedding to pack.
+        dtype (str): "float32" or "int8".
+    Returns:
+        bytes: The packed vector.
+    Raises:
+        ValueError: If the dtype is not supported.
+    """
+    array = np.asarray(vector, dtype=np.float32).ravel()
+    if dtype == "float32":
+        return bytes([FLOAT32_TAG]) + array.astype("<f4").tobytes()
+    if dtype == "int8":
+        peak = float(np.abs(array).max()) if array.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        quantized = np.clip(np.rint(array / scale), -127, 127).astype(np.int8)
+        return bytes([INT8_TAG]) + _SCALE.pack(scale) + quantized.tobytes()
+    raise ValueError(f"Unsupported packed vector dtype '{dtype}'")
+
+
+def unpack_vector(data: bytes) -> np.ndarray:
+    """
+    Restores a vector produced by `pack_vector` as a float32 NumPy array.
+    Args:
+        data (bytes): The packed vector.
+    Returns:
+        np.ndarray: The decoded float32 vector.
+    Raises:
+        ValueError: If the encoding tag is unknown.
+    """
+    data = bytes(data)
+    tag = data[0]
+    if tag == FLOAT32_TAG:
+        return np.frombuffer(data, dtype="<f4", offset=1).astype(np.float32)
+    if tag == INT8_TAG:
+        (scale,) = _SCALE.unpack_from(data, 1)
+        quantized = np.frombuffer(data, dtype=np.int8, offset=1 + _SCALE.size)
+        return quantized.astype(np.float32) * np.float32(scale)
+    raise ValueError(f"Unknown packed vector tag {tag}")
+
+
+class PackedVector(TypeDecorator):
+    """
+    BYTEA column that stores NumPy vectors packed with `pack_vector`.
+    Values are written with the column's dtype and always read back as
+    float32 arrays, whatever dtype they were written with.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dtype: str = "float32", *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dtype = dtype
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return pack_vector(value, self.dtype)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return unpack_vector(value)
+
+
+def packed_dtype(storage: str = EMBEDDING_STORAGE) -> str:
+    """
+    Returns the packed dtype used for a storage mode ("float32" for "array").
+    """
+    return storage if storage in ("float32", "int8") else "float32"
+
+
+def embedding_as_array(apartment) -> np.ndarray | None:
+    """
+    Returns the embedding of an Apartment_DB row as a float32 array, reading
+    the packed column first and falling back to the legacy array column.
+    """
+    if getattr(apartment, "embedding_packed", None) is not None:
+        return np.asarray(apartment.embedding_packed, dtype=np.float32)
+    if getattr(apartment, "embedding", None) is not None:
+        return np.asarray(apartment.embedding, dtype=np.float32)
+    return None
@@ -0,0 +1,11 @@
+from config.logger import get_logger
+from config.postgres import get_engine, get_pool_stats
+from config.schema import MIGRATIONS, bootstrap_schema
+
+logger = get_logger("bootstrap_db")
+
+if __name__ == "__main__":
+    engine = get_engine()
+    bootstrap_schema(engine)
+    logger.info(f"Schema is up to date ({len(MIGRATIONS)} migrations known)")
+    logger.info(f"Pool stats: {get_pool_stats(engine)}")
@@ -0,0 +1,59 @@
+import argparse
+
+from config.logger import get_logger
+from helpers.vector_index import (
+    DEFAULT_INDEX_PATH,
+    DEFAULT_K,
+    DEFAULT_NPROBE,
+    VectorIndex,
+)
+
+logger = get_logger("build_vector_index")
+
+
+def build_vector_index(
+    path: str = DEFAULT_INDEX_PATH, ivf: bool = False, nlist: int | None = None
+) -> VectorIndex:
+    """
+    Builds the similarity index from every stored embedding, optionally
+    trains its IVF lists, and writes the snapshot loaded by later runs.
+    Args:
+        path (str): Snapshot file.
+        ivf (bool): Train an IVF index for approximate search.
+        nlist (int | None): Number of IVF lists. Defaults to 2 * sqrt(rows).
+    Returns:
+        VectorIndex: The new index.
+    """
+    index = VectorIndex.from_database()
+    if ivf and len(index):
+        index.train_ivf(nlist)
+    index.save(path)
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the in-process similarity index over the stored embeddings, "
+        "or query an existing snapshot."
+    )
+    parser.add_argument("--path", default=DEFAULT_INDEX_PATH)
+    parser.add_argument("--ivf", action="store_true", help="Train an IVF index.")
+    parser.add_argument("--nlist", type=int, help="Number of IVF lists.")
+    parser.add_argument(
+        "--similar-to",
+        metavar="URL",
+        help="Query the snapshot instead of rebuilding it.",
+    )
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE)
+    parser.add_argument("--exact", action="store_true", help="Ignore the IVF index.")
+    args = parser.parse_args()
+
+    if args.similar_to:
+        index = VectorIndex.load(args.path)
+        for url, score in index.similar_to(
+            args.similar_to, args.k, exact=args.exact, nprobe=args.nprobe
+        ):
+            print(f"{score:.4f}  {url}")
+    else:
+        build_vector_index(args.path, ivf=args.ivf, nlist=args.nlist)
@@ -0,0 +1,109 @@
+import argparse
+
+import numpy as np
+from sqlalchemy import select, text
+
+from config.logger import get_logger
+from config.postgres import connection_scope, get_engine
+from config.schema import bootstrap_schema
+from helpers.dedup import SIMILARITY_THRESHOLD, cluster_ids, cluster_listings
+from models.sqlalchemy_models import Apartment_DB
+from models.vector_types import embedding_as_array
+
+logger = get_logger("deduplicate_listings")
+
+
+def deduplicate_listings(
+    engine,
+    threshold: float = SIMILARITY_THRESHOLD,
+    chunk_size: int = 5000,
+    dry_run: bool = False,
+) -> int:
+    """
+    Reclusters every stored listing with an embedding and writes the
+    cluster ids that changed; listings without duplicates get NULL.
+    Unlike the per-run stage, this also finds duplicates across runs and
+    removes listings from clusters they no longer belong to.
+    Args:
+        engine (sqlalchemy.engine.base.Engine): The database engine.
+        threshold (float): Minimum cosine similarity of duplicates.
+        chunk_size (int): Rows read, and rows updated, per statement.
+        dry_run (bool): Only report the number of changes.
+    Returns:
+        int: The number of listings whose cluster id changed.
+    """
+    bootstrap_schema(engine)
+    urls, addresses, prices, m2s, current, vectors = [], [], [], [], [], []
+    columns = (
+        Apartment_DB.url,
+        Apartment_DB.address,
+        Apartment_DB.price,
+        Apartment_DB.m2,
+        Apartment_DB.cluster_id,
+        Apartment_DB.embedding_packed,
+        Apartment_DB.embedding,
+    )
+    last_url = ""
+    while True:
+        with connection_scope(engine) as conn:
+            rows = conn.execute(
+                select(*columns)
+                .where(Apartment_DB.url > last_url)
+                .order_by(Apartment_DB.url)
+                .limit(chunk_size)
+            ).all()
+        if not rows:
+            break
+        for row in rows:
+            vector = embedding_as_array(row)
+            if vector is None:
+                continue
+            urls.append(row.url)
+            addresses.append(row.address)
+            prices.append(row.price)
+            m2s.append(row.m2)
+            current.append(row.cluster_id)
+            vectors.append(vector)
+        last_url = rows[-1].url
+    logger.info(f"Clustering {len(urls)} listings")
+    if not urls:
+        return 0
+
+    labels = cluster_listings(addresses, prices, m2s, np.stack(vectors), threshold)
+    ids = cluster_ids(urls, labels)
+    changes = [
+        {"url": url, "cluster_id": cluster_id}
+        for url, cluster_id, stored in zip(urls, ids, current)
+        if cluster_id != stored
+    ]
+    logger.info(
+        f"{len(set(filter(None, ids)))} duplicate clusters, "
+        f"{len(changes)} listings change cluster" + (" (dry run)" if dry_run else "")
+    )
+    if dry_run:
+        return len(changes)
+
+    for start in range(0, len(changes), chunk_size):
+        with connection_scope(engine) as conn:
+            conn.execute(
+                text("UPDATE apartment SET cluster_id = :cluster_id WHERE url = :url"),
+                changes[start : start + chunk_size],
+            )
+    return len(changes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recluster every stored listing into near-duplicate groups."
+    )
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    deduplicate_listings(
+        get_engine(),
+        threshold=args.threshold,
+        chunk_size=args.chunk_size,
+        dry_run=args.dry_run,
+    )
@@ -0,0 +1,74 @@
+import argparse
+import json
+
+from helpers.embedding_engine import (
+    BACKENDS,
+    MODEL_NAME,
+    REFERENCE_BACKEND,
+    check_backend_agreement,
+    export_local_model,
+)
+
+SAMPLE_TEXTS = [
+    (
+        "Nombre: Piso en venta en Calle Mayor | Dirección: Centro (Torremolinos) | "
+        "Superficie: 85.0 m² | Dormitorios: 2 | Baños: 1 | Precio: 245000.0 €"
+    ),
+    (
+        "Nombre: Ático con terraza | Dirección: Playamar (Torremolinos) | "
+        "Superficie: 120.0 m² | Dormitorios: 3 | Baños: 2 | Precio: 495000.0 €"
+    ),
+    (
+        "Nombre: Estudio reformado | Dirección: 29006 Málaga | "
+        "Superficie: 38.0 m² | Dormitorios: 1 | Baños: 1 | Precio: 129000.0 €"
+    ),
+    (
+        "Nombre: Chalet adosado | Dirección: El Pinillo (Torremolinos) | "
+        "Superficie: desconocida | Dormitorios: 4 | Baños: 3 | Precio: desconocido"
+    ),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Prepare and validate the local embedding backends."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export = subparsers.add_parser(
+        "export", help="Download the model and write torch/onnx/int8 variants locally."
+    )
+    export.add_argument("--model", default=MODEL_NAME)
+    export.add_argument("--model-dir", default=None)
+
+    check = subparsers.add_parser(
+        "check", help="Report cosine agreement of a backend with the reference."
+    )
+    check.add_argument("backend", choices=BACKENDS)
+    check.add_argument("--model", default=MODEL_NAME)
+    check.add_argument("--reference", choices=BACKENDS, default=REFERENCE_BACKEND)
+    check.add_argument(
+        "--texts",
+        default=None,
+        help="File with one description per line. Defaults to a built-in sample.",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_local_model(args.model, args.model_dir)
+        return
+
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    agreement = check_backend_agreement(
+        texts, args.backend, model_name=args.model, reference=args.reference
+    )
+    print(json.dumps(agreement, indent=2))
+
+
+if __name__ == "__main__":
+    main()
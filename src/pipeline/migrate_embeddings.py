@@ -0,0 +1,85 @@
+import argparse
+
+from sqlalchemy import text
+
+from config.logger import get_logger
+from config.postgres import get_engine
+from config.schema import bootstrap_schema
+from models.vector_types import pack_vector
+
+logger = get_logger("migrate_embeddings")
+
+
+def migrate_embeddings(
+    engine, dtype: str = "float32", chunk_size: int = 5000, drop_array: bool = False
+) -> int:
+    """
+    Backfills `embedding_packed` from the legacy ARRAY(Float) `embedding` column.
+    Rows are processed in url order, one chunk per transaction, so the
+    migration can be interrupted and resumed without redoing work.
+    Args:
+        engine (sqlalchemy.engine.base.Engine): The database engine.
+        dtype (str): Packed encoding, "float32" or "int8".
+        chunk_size (int): Number of rows converted per transaction.
+        drop_array (bool): Clear the legacy array value of migrated rows to
+            reclaim space (run VACUUM FULL apartment afterwards).
+    Returns:
+        int: The number of rows migrated.
+    """
+    bootstrap_schema(engine)
+    migrated = 0
+    last_url = ""
+
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT url, embedding FROM apartment "
+                    "WHERE url > :last_url AND embedding IS NOT NULL "
+                    "AND embedding_packed IS NULL "
+                    "ORDER BY url LIMIT :limit"
+                ),
+                {"last_url": last_url, "limit": chunk_size},
+            ).all()
+            if not rows:
+                break
+
+            conn.execute(
+                text(
+                    "UPDATE apartment SET embedding_packed = :packed"
+                    + (", embedding = NULL" if drop_array else "")
+                    + " WHERE url = :url"
+                ),
+                [
+                    {"url": url, "packed": pack_vector(embedding, dtype)}
+                    for url, embedding in rows
+                ],
+            )
+
+        migrated += len(rows)
+        last_url = rows[-1][0]
+        logger.info(f"Migrated {migrated} embeddings (last url: {last_url})")
+
+    logger.info(f"Embedding migration finished: {migrated} rows packed as {dtype}")
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert ARRAY(Float) embeddings to the packed BYTEA representation."
+    )
+    parser.add_argument("--dtype", choices=("float32", "int8"), default="float32")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument(
+        "--drop-array",
+        action="store_true",
+        help="Clear the legacy array column of migrated rows.",
+    )
+    args = parser.parse_args()
+
+    migrate_embeddings(
+        get_engine(),
+        dtype=args.dtype,
+        chunk_size=args.chunk_size,
+        drop_array=args.drop_array,
+    )
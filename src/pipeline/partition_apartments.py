@@ -0,0 +1,114 @@
+import argparse
+import re
+
+from sqlalchemy import text
+
+from config.logger import get_logger
+from config.postgres import get_engine
+from config.schema import (
+    SCHEMA_LOCK_ID,
+    SOURCE_SQL,
+    apartment_index_statements,
+    apartment_key_columns,
+    bootstrap_schema,
+    forget_apartment_key_columns,
+)
+from models.sqlalchemy_models import Apartment_DB
+
+logger = get_logger("partition_apartments")
+
+
+def partition_name(source: str) -> str:
+    return "apartment_src_" + re.sub(r"[^a-z0-9_]", "_", source.lower())
+
+
+def partition_apartments(engine, sources: list[str] | None = None) -> list[str]:
+    """
+    Rebuilds the apartment table as a table LIST-partitioned by source, with
+    one partition per stored (and per given) source plus a default partition
+    for new portals. Queries filtering on one source then only read its
+    partition, and each portal's rows can be vacuumed or archived on their own.
+    The rows are copied in one transaction holding an exclusive lock on the
+    table, so readers and loads wait until it commits. The primary key becomes
+    (url, source) and the upserts switch to it (see apartment_key_columns).
+    Args:
+        engine (sqlalchemy.engine.base.Engine): The database engine.
+        sources (list[str] | None): Sources to create partitions for even without rows yet.
+    Returns:
+        list[str]: The partitions created, empty if the table was already partitioned.
+    """
+    bootstrap_schema(engine)
+    if apartment_key_columns(engine) != ("url",):
+        logger.info("The apartment table is already partitioned")
+        return []
+
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+        conn.execute(text("LOCK TABLE apartment IN ACCESS EXCLUSIVE MODE"))
+        conn.execute(
+            text(f"UPDATE apartment SET source = {SOURCE_SQL} WHERE source IS NULL")
+        )
+        stored = (
+            conn.execute(text("SELECT DISTINCT source FROM apartment")).scalars().all()
+        )
+
+        conn.execute(
+            text(
+                "CREATE TABLE apartment_by_source (LIKE apartment INCLUDING DEFAULTS) "
+                "PARTITION BY LIST (source)"
+            )
+        )
+        conn.execute(
+            text("ALTER TABLE apartment_by_source ALTER COLUMN source SET NOT NULL")
+        )
+        partitions = []
+        for source in sorted(set(stored) | set(sources or [])):
+            name = partition_name(source)
+            literal = source.replace("'", "''")
+            conn.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF apartment_by_source "
+                    f"FOR VALUES IN ('{literal}')"
+                )
+            )
+            partitions.append(name)
+        conn.execute(
+            text(
+                "CREATE TABLE apartment_other PARTITION OF apartment_by_source DEFAULT"
+            )
+        )
+        partitions.append("apartment_other")
+
+        copied = conn.execute(
+            text("INSERT INTO apartment_by_source SELECT * FROM apartment")
+        ).rowcount
+        conn.execute(text("DROP TABLE apartment"))
+        conn.execute(text("ALTER TABLE apartment_by_source RENAME TO apartment"))
+        conn.execute(
+            text(
+                "ALTER TABLE apartment ADD CONSTRAINT apartment_pkey PRIMARY KEY (url, source)"
+            )
+        )
+        for index in Apartment_DB.__table__.indexes:
+            index.create(conn)
+        for statement in apartment_index_statements():
+            conn.execute(text(statement))
+
+    forget_apartment_key_columns(engine)
+    logger.info(f"Copied {copied} apartments into {len(partitions)} partitions")
+    return partitions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild the apartment table partitioned by listing source."
+    )
+    parser.add_argument(
+        "--source",
+        action="append",
+        default=[],
+        help="Also create a partition for this source (repeatable).",
+    )
+    args = parser.parse_args()
+
+    partition_apartments(get_engine(), args.source)
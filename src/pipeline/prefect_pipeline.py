@@ -1,34 +1,144 @@
 import asyncio
-from prefect import flow
+from prefect import flow, unmapped
 
+from tasks.deduplicate import deduplicate_apartments
 from tasks.generate_embedding import generate_embeddings
 from tasks.scrape_pisos import scrape_pisos
 from tasks.scrape_solvia import scrape_solvia
-from tasks.upload_report import save_task_metadata_to_minio
+from tasks.upload_report import (
+    run_prefix,
+    save_profiles_to_minio,
+    save_report_to_minio,
+    save_task_metadata_to_minio,
+)
 from tasks.load_to_postgres import load_info_to_postgres
+from pipeline.streaming import DEFAULT_QUEUE_SIZE, run_streaming_pipeline
+from helpers.html_archive import close_html_archive
+from helpers.metrics import start_run_metrics
+from helpers.profiling import set_profiler
+from helpers.seen_index import (
+    DEFAULT_FULL_CRAWL_EVERY,
+    DEFAULT_STOP_AFTER,
+    get_seen_index,
+)
+from helpers.vector_index import VectorIndex, get_vector_index
+
+
+def finish_crawl(full_crawl: bool, vector_index: VectorIndex | None = None) -> None:
+    """
+    Records the run in the seen-listing index and persists it for the next
+    run, writes the HTML archive manifest of the run and saves the vector
+    index snapshot when one is maintained.
+    """
+    seen_index = get_seen_index()
+    seen_index.record_run(full_crawl)
+    seen_index.save()
+    close_html_archive()
+    if vector_index is not None:
+        vector_index.save()
 
 
 @flow(name="Real Estate Scraper", retries=1, retry_delay_seconds=5)
-async def run_prefect_pipeline(pisos_urls: list[str], solvia_urls: list[str]) -> None:
+async def run_prefect_pipeline(
+    pisos_urls: list[str],
+    solvia_urls: list[str],
+    pisos_engines: dict[str, str] | None = None,
+    default_pisos_engine: str = "selenium",
+    selenium_pool_size: int = 4,
+    low_latency_browser: bool = False,
+    embedding_workers: int = 1,
+    embedding_backend: str = "torch",
+    load_mode: str = "merge",
+    load_chunk_size: int = 1000,
+    streaming: bool = False,
+    stream_queue_size: int = DEFAULT_QUEUE_SIZE,
+    incremental: bool = False,
+    incremental_stop_after: int = DEFAULT_STOP_AFTER,
+    full_crawl_every: int = DEFAULT_FULL_CRAWL_EVERY,
+    prometheus_metrics: bool = False,
+    profiler: str | None = None,
+    update_vector_index: bool = False,
+    deduplicate: bool = False,
+) -> None:
+    metrics = start_run_metrics()
+    set_profiler(profiler)
+    prefix = run_prefix()
+    pisos_engines = pisos_engines or {}
+    engines = [pisos_engines.get(url, default_pisos_engine) for url in pisos_urls]
+
+    # Incremental crawl, with a periodic full crawl for reconciliation
+    seen_index = get_seen_index()
+    full_crawl = not incremental or seen_index.full_crawl_due(full_crawl_every)
+    stop_after = 0 if full_crawl else incremental_stop_after
+
+    # Similarity index kept in sync with the loaded listings
+    vector_index = get_vector_index() if update_vector_index else None
+
+    # Streaming mode: scrape, embed and load page by page, with overlapping stages
+    if streaming:
+        await run_streaming_pipeline(
+            pisos_urls,
+            solvia_urls,
+            engines,
+            selenium_pool_size=selenium_pool_size,
+            low_latency_browser=low_latency_browser,
+            embedding_workers=embedding_workers,
+            embedding_backend=embedding_backend,
+            load_mode=load_mode,
+            load_chunk_size=load_chunk_size,
+            queue_size=stream_queue_size,
+            stop_after=stop_after,
+            vector_index=vector_index,
+            deduplicate=deduplicate,
+        )
+        finish_crawl(full_crawl, vector_index)
+        save_report_to_minio(
+            metrics.build_report(), prefix, prometheus=prometheus_metrics
+        )
+        if profiler:
+            save_profiles_to_minio(prefix)
+        await save_task_metadata_to_minio(prefix)
+        return
+
     # Scrape pisos and solvia
-    pisos_futures = scrape_pisos.map(pisos_urls)
-    pisos_results = list(zip(*[f.result() for f in pisos_futures]))
+    pisos_futures = scrape_pisos.map(
+        pisos_urls,
+        engine=engines,
+        pool_size=unmapped(selenium_pool_size),
+        low_latency=unmapped(low_latency_browser),
+        stop_after=unmapped(stop_after),
+    )
+    pisos_results = [f.result() for f in pisos_futures]
 
-    solvia_futures = scrape_solvia.map(solvia_urls)
-    solvia_results = list(zip(*[f.result() for f in solvia_futures]))
+    solvia_futures = scrape_solvia.map(solvia_urls, stop_after=unmapped(stop_after))
+    solvia_results = [f.result() for f in solvia_futures]
 
-    # Combine results by converting zips to lists first
-    all_results = [
-        ad for group in list(pisos_results) + list(solvia_results) for ad in group
-    ]
+    # Combine the listings of every search URL
+    all_results = [ad for group in pisos_results + solvia_results for ad in group]
 
     # Generate embeddings
 
-    embedded_all_results = generate_embeddings(all_results)
+    embedded_all_results = generate_embeddings(
+        all_results, workers=embedding_workers, backend=embedding_backend
+    )
+
+    # Cluster near-duplicate listings across sources and searches
+
+    if deduplicate:
+        embedded_all_results = deduplicate_apartments(embedded_all_results)
 
     # Load into Postgres
 
-    load_info_to_postgres(embedded_all_results)
+    load_info_to_postgres(
+        embedded_all_results, mode=load_mode, chunk_size=load_chunk_size
+    )
+    if vector_index is not None:
+        vector_index.upsert_apartments(embedded_all_results)
+
+    finish_crawl(full_crawl, vector_index)
 
     # Error count and report
-    await save_task_metadata_to_minio()
+    save_report_to_minio(metrics.build_report(), prefix, prometheus=prometheus_metrics)
+    if profiler:
+        save_profiles_to_minio(prefix)
+    await save_task_metadata_to_minio(prefix)
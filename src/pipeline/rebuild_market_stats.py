@@ -0,0 +1,94 @@
+import argparse
+
+from sqlalchemy import delete, select, text
+
+from config.logger import get_logger
+from config.postgres import get_engine
+from config.schema import bootstrap_schema
+from helpers.market_stats import (
+    MARKET_COLUMNS,
+    apply_market_deltas,
+    market_deltas,
+    market_summary,
+)
+from models.sqlalchemy_models import Apartment_DB, MarketHistogram_DB
+
+logger = get_logger("rebuild_market_stats")
+
+
+def rebuild_market_stats(engine, chunk_size: int = 5000) -> int:
+    """
+    Recomputes the market histogram from every stored listing, to reconcile
+    it after manual edits, deletes outside the load stage or a change of
+    BUCKET_WIDTH. The histogram is locked for the whole rebuild and the
+    listings are read from a single snapshot, so loads running meanwhile
+    apply their changes once it is committed and nothing is counted twice.
+    Args:
+        engine (sqlalchemy.engine.base.Engine): The database engine.
+        chunk_size (int): Listings read, and buckets written, per statement.
+    Returns:
+        int: The number of histogram buckets written.
+    """
+    bootstrap_schema(engine)
+    columns = [Apartment_DB.url] + [
+        getattr(Apartment_DB, column) for column in MARKET_COLUMNS
+    ]
+    deltas: dict[tuple, list] = {}
+    listings = 0
+    with (
+        engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn,
+        conn.begin(),
+    ):
+        conn.execute(text("LOCK TABLE market_price_m2_histogram IN EXCLUSIVE MODE"))
+        last_url = ""
+        while True:
+            rows = conn.execute(
+                select(*columns)
+                .where(Apartment_DB.url > last_url)
+                .order_by(Apartment_DB.url)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            for key, (count, total) in market_deltas(
+                {}, {row.url: row._asdict() for row in rows}
+            ).items():
+                entry = deltas.setdefault(key, [0, 0.0])
+                entry[0] += count
+                entry[1] += total
+            listings += len(rows)
+            last_url = rows[-1].url
+
+        conn.execute(delete(MarketHistogram_DB))
+        keys = sorted(deltas)
+        for start in range(0, len(keys), chunk_size):
+            apply_market_deltas(
+                conn, {key: deltas[key] for key in keys[start : start + chunk_size]}
+            )
+    logger.info(f"Rebuilt {len(deltas)} market buckets from {listings} listings")
+    return len(deltas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild the price per m² aggregates from the stored listings."
+    )
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument(
+        "--show", action="store_true", help="Only print the current aggregates."
+    )
+    parser.add_argument("--area", help="With --show, only print this area.")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if not args.show:
+        rebuild_market_stats(engine, args.chunk_size)
+    else:
+        with engine.connect() as conn:
+            for stat in market_summary(conn, args.area):
+                bedrooms = "?" if stat.bedrooms is None else stat.bedrooms
+                print(
+                    f"{stat.area[:40]:<40} {bedrooms:>2} hab. {stat.listings:>7} "
+                    f"median {stat.median_price_m2:>8,.0f} €/m² "
+                    f"(p25 {stat.p25_price_m2:,.0f}, p75 {stat.p75_price_m2:,.0f})"
+                )
@@ -0,0 +1,178 @@
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+from config.logger import get_logger
+from helpers.embedding_engine import REFERENCE_BACKEND
+from helpers.html_archive import HtmlArchive, resolve_parser
+from models.pydantic_models import LoadStats
+from tasks.generate_embedding import generate_embeddings
+from tasks.load_to_postgres import DEFAULT_CHUNK_SIZE, LOAD_MODES, load_info_to_postgres
+
+logger = get_logger("replay_archive")
+
+DOWNLOAD_WORKERS = 16
+# Pages downloaded or parsed at once per parser process; bounds the page bodies held in memory.
+PAGES_IN_FLIGHT_PER_WORKER = 4
+# Listings embedded and loaded together; bounds the memory used by a replay.
+REPLAY_BATCH_SIZE = 2000
+
+
+def parse_archived_page(parser: str, body: bytes, args: list) -> list:
+    """
+    Re-parses an archived page with the parser recorded in the manifest.
+    Every scraper parser returns the page listings as the first element.
+    """
+    return resolve_parser(parser)(body, *args)[0]
+
+
+def select_entries(archive: HtmlArchive, run_ids: list[str]) -> list[dict]:
+    """
+    Reads the manifests of the given runs and keeps the latest entry per URL.
+    """
+    latest: dict[str, dict] = {}
+    for run_id in run_ids:
+        for entry in archive.read_manifest(run_id):
+            current = latest.get(entry["url"])
+            if current is None or entry["fetched_at"] >= current["fetched_at"]:
+                latest[entry["url"]] = entry
+    return list(latest.values())
+
+
+def replay_archive(
+    run_ids: list[str] | None = None,
+    workers: int = os.cpu_count() or 1,
+    embedding_workers: int = 1,
+    embedding_backend: str = REFERENCE_BACKEND,
+    load_mode: str = "upsert",
+    load_chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> LoadStats:
+    """
+    Re-runs parsing, embedding and loading from archived pages, without
+    touching the scraped sites.
+    Pages are downloaded from MinIO by a thread pool and parsed in a process
+    pool as they arrive, with at most PAGES_IN_FLIGHT_PER_WORKER pages per
+    parser between the two; listings are taken in the order pages finish
+    parsing, then embedded and loaded in batches of REPLAY_BATCH_SIZE.
+    Args:
+        run_ids (list[str] | None): Archived runs to replay. Defaults to the latest run.
+        workers (int): Number of parser processes.
+        embedding_workers (int): Number of worker processes used for encoding.
+        embedding_backend (str): Inference backend: "torch", "onnx" or "int8".
+        load_mode (str): The write path, "merge", "upsert" or "changes".
+        load_chunk_size (int): Rows per statement in "upsert" mode.
+    Returns:
+        LoadStats: The totals of every batch written.
+    """
+    archive = HtmlArchive()
+    if not run_ids:
+        runs = archive.list_runs()
+        if not runs:
+            logger.warning("The HTML archive has no runs to replay")
+            return LoadStats()
+        run_ids = runs[-1:]
+
+    entries = select_entries(archive, run_ids)
+    logger.info(f"Replaying {len(entries)} pages from runs {', '.join(run_ids)}")
+
+    stats = LoadStats()
+    seen: set[str] = set()
+    batch: list = []
+
+    def flush() -> None:
+        if not batch:
+            return
+        embedded = generate_embeddings.fn(
+            batch, workers=embedding_workers, backend=embedding_backend
+        )
+        load_stats = load_info_to_postgres.fn(
+            embedded, mode=load_mode, chunk_size=load_chunk_size
+        )
+        for field in LoadStats.model_fields:
+            setattr(stats, field, getattr(stats, field) + getattr(load_stats, field))
+        batch.clear()
+
+    context = multiprocessing.get_context("spawn")
+    with (
+        ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as downloads,
+        ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context) as parsers,
+    ):
+        window = max(1, workers) * PAGES_IN_FLIGHT_PER_WORKER
+        queued = iter(entries)
+        pending: dict = {}  # download or parse future -> (stage, entry)
+
+        while True:
+            while len(pending) < window:
+                entry = next(queued, None)
+                if entry is None:
+                    break
+                pending[downloads.submit(archive.read_page, entry["sha256"])] = (
+                    "download",
+                    entry,
+                )
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, entry = pending.pop(future)
+                try:
+                    if stage == "download":
+                        parse = parsers.submit(
+                            parse_archived_page,
+                            entry["parser"],
+                            future.result(),
+                            entry["args"],
+                        )
+                        pending[parse] = ("parse", entry)
+                        continue
+                    listings = future.result()
+                except Exception as e:
+                    action = "downloading" if stage == "download" else "re-parsing"
+                    logger.error(f"Error {action} {entry['url']}: {e}")
+                    continue
+                for listing in listings:
+                    url = listing.url if hasattr(listing, "url") else listing["url"]
+                    if url not in seen:
+                        seen.add(url)
+                        batch.append(listing)
+                if len(batch) >= REPLAY_BATCH_SIZE:
+                    flush()
+    flush()
+
+    logger.info(
+        f"Replay finished: {len(seen)} listings, {stats.inserted} inserted, "
+        f"{stats.updated} updated, {stats.unchanged} unchanged, {stats.errors} errors"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Re-parse, embed and load listings from the archived HTML of earlier runs."
+    )
+    parser.add_argument(
+        "runs", nargs="*", help="Run ids to replay (default: the latest archived run)."
+    )
+    parser.add_argument("--all", action="store_true", help="Replay every archived run.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--embedding-workers", type=int, default=1)
+    parser.add_argument("--backend", default=REFERENCE_BACKEND)
+    parser.add_argument("--load-mode", choices=LOAD_MODES, default="upsert")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    replay_archive(
+        HtmlArchive().list_runs() if args.all else args.runs,
+        workers=args.workers,
+        embedding_workers=args.embedding_workers,
+        embedding_backend=args.backend,
+        load_mode=args.load_mode,
+        load_chunk_size=args.chunk_size,
+    )
@@ -0,0 +1,40 @@
+import argparse
+
+from helpers.hybrid_search import DEFAULT_PAGE_SIZE, HybridSearch
+from helpers.vector_index import DEFAULT_INDEX_PATH, VectorIndex
+from models.pydantic_models import SearchFilters
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Search listings by similarity, filtered by price, size, bedrooms and bathrooms."
+    )
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument("--url", help="Find listings similar to this stored one.")
+    query.add_argument("--text", help="Find listings matching a free-text description.")
+    parser.add_argument(
+        "--path", default=DEFAULT_INDEX_PATH, help="Vector index snapshot."
+    )
+    for name in SearchFilters.model_fields:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float)
+    parser.add_argument("--page", type=int, default=0)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    args = parser.parse_args()
+
+    filters = SearchFilters(
+        **{name: getattr(args, name) for name in SearchFilters.model_fields}
+    )
+    search = HybridSearch(VectorIndex.load(args.path))
+    page = search.search(
+        url=args.url,
+        text=args.text,
+        filters=filters,
+        page=args.page,
+        page_size=args.page_size,
+    )
+
+    print(f"{page.candidates} matching listings, page {page.page}")
+    for result in page.results:
+        print(
+            f"{result.score:.4f}  {result.price or '-':>10} €  {result.m2 or '-':>6} m²  "
+            f"{result.bedrooms if result.bedrooms is not None else '-'} hab.  {result.url}"
+        )
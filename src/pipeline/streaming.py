@@ -0,0 +1,348 @@
+import asyncio
+import concurrent.futures
+import threading
+from contextlib import closing
+
+from config.logger import get_logger
+from helpers.embedding_engine import DEFAULT_BATCH_SIZE, REFERENCE_BACKEND
+from helpers.http_fetcher import scraping_fetcher
+from helpers.metrics import get_run_metrics
+from helpers.seen_index import get_incremental_crawl, get_seen_index
+from helpers.vector_index import VectorIndex
+from models.pydantic_models import Apartment, LoadStats
+from tasks.deduplicate import deduplicate_apartments
+from tasks.generate_embedding import generate_embeddings
+from tasks.load_to_postgres import DEFAULT_CHUNK_SIZE, load_info_to_postgres
+from tasks.scrape_pisos import (
+    ENGINES,
+    POOL_SIZE,
+    StaticDataUnavailable,
+    iter_pisos_http_pages,
+    iter_pisos_selenium_pages,
+)
+from tasks.scrape_solvia import iter_solvia_pages
+
+logger = get_logger("streaming")
+
+DEFAULT_QUEUE_SIZE = 8
+# How often a producer thread blocked on a full queue checks whether the run stopped.
+STOP_POLL_SECONDS = 0.5
+
+
+class StreamStats:
+    """
+    Counters of a streaming run, updated by the producers and workers.
+    """
+
+    def __init__(self):
+        self.pages = 0
+        self.scraped = 0
+        self.embedded = 0
+        self.load = LoadStats()
+
+    def add_load(self, stats: LoadStats) -> None:
+        self.load.inserted += stats.inserted
+        self.load.updated += stats.updated
+        self.load.unchanged += stats.unchanged
+        self.load.errors += stats.errors
+
+
+async def put_page(queue: asyncio.Queue, listings: list, stats: StreamStats) -> None:
+    """
+    Puts the listings of one page on the scraped queue, waiting while it is full.
+    """
+    if not listings:
+        return
+    get_seen_index().add_many(
+        listing.url if isinstance(listing, Apartment) else listing["url"]
+        for listing in listings
+    )
+    stats.pages += 1
+    stats.scraped += len(listings)
+    get_run_metrics().add("scrape", items_out=len(listings))
+    await queue.put(listings)
+
+
+async def produce_pisos_selenium(
+    url: str,
+    queue: asyncio.Queue,
+    stats: StreamStats,
+    pool_size: int,
+    low_latency: bool,
+    stop_after: int,
+) -> None:
+    """
+    Runs the Selenium page iterator in a worker thread. Every page is handed
+    to the event loop and the thread blocks until the queue accepts it, so a
+    slow consumer also slows the browsers down. When the producer is
+    cancelled, the thread drops the pending page and closes the iterator,
+    which returns its drivers to the pool.
+    """
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+
+    def run() -> None:
+        crawl = get_incremental_crawl(stop_after)
+        pages = iter_pisos_selenium_pages(url, pool_size, low_latency, crawl=crawl)
+        with closing(pages):
+            for listings in pages:
+                if stop.is_set():
+                    return
+                future = asyncio.run_coroutine_threadsafe(
+                    put_page(queue, listings, stats), loop
+                )
+                while True:
+                    try:
+                        future.result(timeout=STOP_POLL_SECONDS)
+                        break
+                    except concurrent.futures.TimeoutError:
+                        if stop.is_set():
+                            future.cancel()
+                            return
+
+    try:
+        await asyncio.to_thread(run)
+    finally:
+        stop.set()
+
+
+async def produce_pisos(
+    url: str,
+    queue: asyncio.Queue,
+    stats: StreamStats,
+    engine: str,
+    pool_size: int,
+    low_latency: bool,
+    stop_after: int = 0,
+) -> None:
+    """
+    Streams the pages of a pisos.com search with the given engine. The HTTP
+    engine falls back to Selenium when the static HTML lacks the listing grid.
+    """
+    if engine not in ENGINES:
+        raise ValueError(
+            f"Unknown pisos engine '{engine}'. Expected one of: {', '.join(ENGINES)}"
+        )
+
+    get_run_metrics().add("scrape", items_in=1)
+    try:
+        if engine == "http":
+            emitted = False
+            try:
+                async with scraping_fetcher() as fetcher:
+                    async for _, listings in iter_pisos_http_pages(
+                        url, fetcher, get_incremental_crawl(stop_after)
+                    ):
+                        emitted = True
+                        await put_page(queue, listings, stats)
+                return
+            except StaticDataUnavailable as e:
+                logger.warning(str(e))
+            except Exception as e:
+                if emitted:
+                    raise
+                logger.error(f"HTTP scraping of {url} failed: {e}")
+            logger.info(f"Falling back to Selenium for {url}")
+
+        await produce_pisos_selenium(
+            url, queue, stats, pool_size, low_latency, stop_after
+        )
+    except Exception as e:
+        logger.critical(f"Fatal error while streaming {url}: {e}")
+
+
+async def produce_solvia(
+    url: str, queue: asyncio.Queue, stats: StreamStats, stop_after: int = 0
+) -> None:
+    """
+    Streams the result pages of a Solvia search.
+    """
+    get_run_metrics().add("scrape", items_in=1)
+    try:
+        async with scraping_fetcher() as fetcher:
+            async for _, listings in iter_solvia_pages(
+                url, fetcher, crawl=get_incremental_crawl(stop_after)
+            ):
+                await put_page(queue, listings, stats)
+    except Exception as e:
+        logger.critical(f"Fatal error while streaming {url}: {e}")
+
+
+async def embed_worker(
+    scraped: asyncio.Queue,
+    embedded: asyncio.Queue,
+    stats: StreamStats,
+    batch_size: int,
+    workers: int,
+    backend: str,
+) -> None:
+    """
+    Consumes scraped pages, coalescing the pages already waiting in the queue
+    into micro-batches of about `batch_size` listings, and encodes each
+    micro-batch in a worker thread. Stops at the None sentinel and forwards it.
+    """
+    done = False
+    while not done:
+        batch = await scraped.get()
+        if batch is None:
+            break
+        batch = list(batch)
+        while len(batch) < batch_size and not scraped.empty():
+            page = scraped.get_nowait()
+            if page is None:
+                done = True
+                break
+            batch.extend(page)
+
+        apartments = await asyncio.to_thread(
+            generate_embeddings.fn,
+            batch,
+            batch_size=batch_size,
+            workers=workers,
+            backend=backend,
+        )
+        stats.embedded += len(apartments)
+        if apartments:
+            await embedded.put(apartments)
+
+    await embedded.put(None)
+
+
+async def load_worker(
+    embedded: asyncio.Queue,
+    stats: StreamStats,
+    mode: str,
+    chunk_size: int,
+    vector_index: VectorIndex | None = None,
+    deduplicate: bool = False,
+) -> None:
+    """
+    Writes embedded micro-batches to Postgres as they arrive, until the None
+    sentinel, and adds them to the vector index when one is given.
+    With `deduplicate`, near-duplicates are clustered within each micro-batch first.
+    """
+    while True:
+        apartments = await embedded.get()
+        if apartments is None:
+            break
+        if deduplicate:
+            apartments = await asyncio.to_thread(deduplicate_apartments.fn, apartments)
+        load_stats = await asyncio.to_thread(
+            load_info_to_postgres.fn, apartments, mode=mode, chunk_size=chunk_size
+        )
+        stats.add_load(load_stats)
+        if vector_index is not None:
+            await asyncio.to_thread(vector_index.upsert_apartments, apartments)
+
+
+async def run_streaming_pipeline(
+    pisos_urls: list[str],
+    solvia_urls: list[str],
+    pisos_engines: list[str],
+    selenium_pool_size: int = POOL_SIZE,
+    low_latency_browser: bool = False,
+    embedding_workers: int = 1,
+    embedding_backend: str = REFERENCE_BACKEND,
+    embedding_batch_size: int = DEFAULT_BATCH_SIZE,
+    load_mode: str = "merge",
+    load_chunk_size: int = DEFAULT_CHUNK_SIZE,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    stop_after: int = 0,
+    vector_index: VectorIndex | None = None,
+    deduplicate: bool = False,
+) -> LoadStats:
+    """
+    Runs scraping, embedding and loading as overlapping stages.
+    Every search URL, pisos.com and Solvia alike, is scraped concurrently and
+    emits one micro-batch per results page into a bounded queue. An embedding
+    worker encodes those micro-batches while scraping continues, and a load
+    worker writes each embedded micro-batch to Postgres while the next one is
+    encoded. Both queues hold at most `queue_size` batches, so a slow stage
+    holds back the ones before it and memory stays bounded regardless of the
+    number of listings.
+    Args:
+        pisos_urls (list[str]): pisos.com search URLs.
+        solvia_urls (list[str]): Solvia search URLs.
+        pisos_engines (list[str]): Scraping engine for each pisos.com URL.
+        selenium_pool_size (int): Number of Chrome drivers used in parallel.
+        low_latency_browser (bool): Use low-latency drivers.
+        embedding_workers (int): Number of worker processes used for encoding.
+        embedding_backend (str): Inference backend: "torch", "onnx" or "int8".
+        embedding_batch_size (int): Target number of listings per micro-batch.
+        load_mode (str): The write path, "merge", "upsert" or "changes".
+        load_chunk_size (int): Rows per statement in "upsert" mode.
+        queue_size (int): Maximum number of batches waiting between two stages.
+        stop_after (int): Incremental crawl: stop paginating a search after this
+            many consecutive listings already stored unchanged. 0 crawls every page.
+        vector_index (VectorIndex | None): Similarity index kept up to date with
+            the loaded listings.
+        deduplicate (bool): Cluster near-duplicate listings of each micro-batch
+            before loading. Only listings of the same micro-batch (results page)
+            are compared: duplicates across pages, searches or earlier runs are
+            left to pipeline/deduplicate_listings.py.
+    Returns:
+        LoadStats: The totals of every micro-batch written.
+    """
+    scraped: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    embedded: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    stats = StreamStats()
+
+    consumers = [
+        asyncio.create_task(
+            embed_worker(
+                scraped,
+                embedded,
+                stats,
+                embedding_batch_size,
+                embedding_workers,
+                embedding_backend,
+            )
+        ),
+        asyncio.create_task(
+            load_worker(
+                embedded, stats, load_mode, load_chunk_size, vector_index, deduplicate
+            )
+        ),
+    ]
+
+    producers = [
+        produce_pisos(
+            url,
+            scraped,
+            stats,
+            engine,
+            selenium_pool_size,
+            low_latency_browser,
+            stop_after,
+        )
+        for url, engine in zip(pisos_urls, pisos_engines)
+    ] + [produce_solvia(url, scraped, stats, stop_after) for url in solvia_urls]
+
+    async def scrape_all() -> None:
+        with get_run_metrics().stage("scrape"):
+            await asyncio.gather(*producers)
+
+    producing = asyncio.ensure_future(scrape_all())
+    try:
+        # A consumer only returns early when it fails: stop scraping in that case
+        await asyncio.wait([producing, *consumers], return_when=asyncio.FIRST_COMPLETED)
+        for consumer in consumers:
+            if consumer.done():
+                consumer.result()
+        await producing
+        await scraped.put(None)
+        await asyncio.gather(*consumers)
+    finally:
+        producing.cancel()
+        for consumer in consumers:
+            consumer.cancel()
+        # Let the cancelled tasks unwind, so producer threads are told to stop
+        await asyncio.gather(producing, *consumers, return_exceptions=True)
+
+    logger.info(
+        f"Streaming finished: {stats.pages} pages, {stats.scraped} listings scraped, "
+        f"{stats.embedded} embedded, {stats.load.inserted} inserted, "
+        f"{stats.load.updated} updated, {stats.load.unchanged} unchanged, "
+        f"{stats.load.errors} errors"
+    )
+    return stats.load
@@ -0,0 +1,94 @@
+from collections import defaultdict
+
+import numpy as np
+from prefect import task
+from sqlalchemy import select
+
+from config.logger import get_logger
+from config.postgres import connection_scope
+from helpers.dedup import SIMILARITY_THRESHOLD, cluster_ids, cluster_listings
+from helpers.metrics import get_run_metrics
+from helpers.profiling import profiled
+from models.sqlalchemy_models import Apartment_DB
+from models.vector_types import embedding_as_array
+
+logger = get_logger("deduplicate")
+
+# Keeps SQL parameter lists well below the driver limits.
+QUERY_CHUNK_SIZE = 500
+
+
+def stored_cluster_ids(urls: list[str]) -> dict[str, str]:
+    """
+    Returns the cluster ids already stored for some listing URLs. If the
+    database cannot be queried, no id is reused and an empty dict is returned.
+    """
+    stored: dict[str, str] = {}
+    try:
+        with connection_scope() as conn:
+            for start in range(0, len(urls), QUERY_CHUNK_SIZE):
+                chunk = urls[start : start + QUERY_CHUNK_SIZE]
+                query = select(Apartment_DB.url, Apartment_DB.cluster_id).where(
+                    Apartment_DB.url.in_(chunk), Apartment_DB.cluster_id.is_not(None)
+                )
+                stored.update(
+                    {url: cluster_id for url, cluster_id in conn.execute(query)}
+                )
+    except Exception as e:
+        logger.error(f"Could not read stored cluster ids: {e}")
+    return stored
+
+
+@task
+@profiled
+def deduplicate_apartments(
+    apartments: list[Apartment_DB], threshold: float = SIMILARITY_THRESHOLD
+) -> list[Apartment_DB]:
+    """
+    Groups the embedded apartments of a run into near-duplicate clusters
+    (the same flat listed on several sites or searches) and sets their
+    `cluster_id`. A cluster with a member already stored in a cluster keeps
+    that id. Apartments without duplicates in the batch keep their
+    `cluster_id` unset, so the load stage leaves the stored value alone;
+    pipeline/deduplicate_listings.py reclusters the whole table.
+    Args:
+        apartments (list[Apartment_DB]): Apartments with embeddings, as returned by generate_embeddings.
+        threshold (float): Minimum cosine similarity of duplicates.
+    Returns:
+        list[Apartment_DB]: The same apartments.
+    """
+    metrics = get_run_metrics()
+    metrics.add("dedup", items_in=len(apartments), items_out=len(apartments))
+    with metrics.stage("dedup"):
+        embedded = [(ap, embedding_as_array(ap)) for ap in apartments]
+        embedded = [(ap, vector) for ap, vector in embedded if vector is not None]
+        if len(embedded) < 2:
+            return apartments
+
+        labels = cluster_listings(
+            [ap.address for ap, _ in embedded],
+            [ap.price for ap, _ in embedded],
+            [ap.m2 for ap, _ in embedded],
+            np.stack([vector for _, vector in embedded]),
+            threshold,
+        )
+        urls = [ap.url for ap, _ in embedded]
+        ids = cluster_ids(urls, labels)
+
+        clusters: dict[str, list[Apartment_DB]] = defaultdict(list)
+        for (apartment, _), cluster_id in zip(embedded, ids):
+            if cluster_id is not None:
+                clusters[cluster_id].append(apartment)
+        stored = stored_cluster_ids(
+            [ap.url for members in clusters.values() for ap in members]
+        )
+        for cluster_id, members in clusters.items():
+            known = sorted(stored[ap.url] for ap in members if ap.url in stored)
+            for apartment in members:
+                apartment.cluster_id = known[0] if known else cluster_id
+
+    duplicates = sum(len(members) for members in clusters.values())
+    logger.info(
+        f"Found {len(clusters)} duplicate clusters covering {duplicates} listings"
+    )
+    return apartments
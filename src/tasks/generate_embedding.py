@@ -1,53 +1,173 @@
+import os
+from datetime import UTC, datetime
+
 from models.pydantic_models import Apartment
+from models.sources import listing_source
 from models.sqlalchemy_models import Apartment_DB
+from models.vector_types import EMBEDDING_STORAGE
 from config.logger import get_logger
-from sentence_transformers import SentenceTransformer
+from helpers.embedding_cache import EmbeddingCache, get_cache_backend
+from helpers.embedding_engine import (
+    DEFAULT_BATCH_SIZE,
+    MODEL_NAME,
+    REFERENCE_BACKEND,
+    cache_model_id,
+)
+from helpers.embedding_pool import encode_texts_parallel
+from helpers.metrics import get_run_metrics
+from helpers.profiling import profiled
+from helpers.seen_index import listing_hash
 from prefect import task
 
 logger = get_logger("generate_embeddings")
 
 
+def to_apartment_db(apartment: Apartment, vector) -> Apartment_DB:
+    """
+    Builds the Apartment_DB row for an apartment and its embedding vector.
+    The vector goes to the legacy array column or the packed column depending
+    on the EMBEDDING_STORAGE setting; the other one is explicitly cleared, so
+    a merge does not leave a stale vector that readers would prefer.
+    """
+    apartment_db = Apartment_DB(
+        url=apartment.url,
+        name=apartment.name,
+        address=apartment.address,
+        m2=apartment.m2,
+        bedrooms=apartment.bedrooms,
+        bathrooms=apartment.bathrooms,
+        price=apartment.price,
+        content_hash=listing_hash(apartment.model_dump()),
+        source=listing_source(apartment.url),
+        scraped_at=datetime.now(UTC),
+    )
+    if EMBEDDING_STORAGE == "array":
+        apartment_db.embedding = vector.tolist()
+        apartment_db.embedding_packed = None
+    else:
+        apartment_db.embedding = None
+        apartment_db.embedding_packed = vector
+    return apartment_db
+
+
 @task
-def generate_embeddings(apartments: list[Apartment]) -> list[Apartment_DB]:
+@profiled
+def generate_embeddings(
+    apartments: list[Apartment],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    sort_by_length: bool = True,
+    model_name: str = MODEL_NAME,
+    cache_backend: str | None = None,
+    workers: int = 1,
+    backend: str = REFERENCE_BACKEND,
+) -> list[Apartment_DB]:
     """
     Generate embeddings for a list of apartments using a pre-trained SentenceTransformer model.
     Returns a list of Apartment_DB objects enriched with the generated embeddings.
+    The model is loaded once per process and texts are encoded in batches.
+    When a cache backend is configured, only descriptions missing from the
+    cache are encoded; the others are served from the cache.
     Args:
         apartments (list[Apartment]): A list of Apartment objects to generate embeddings for.
+        batch_size (int): Number of apartments encoded per model call.
+        sort_by_length (bool): Bucket descriptions by length to reduce padding.
+        model_name (str): The SentenceTransformer model to use.
+        cache_backend (str | None): "disk" or "postgres" to enable the embedding
+            cache. Defaults to the EMBEDDING_CACHE_BACKEND environment variable;
+            caching is disabled when neither is set.
+        workers (int): Number of worker processes used for encoding. Values above
+            1 enable the process pool for inputs large enough to benefit from it.
+        backend (str): Inference backend: "torch" (default), "onnx" or "int8".
     Returns:
         list[Apartment_DB]: A list of Apartment_DB objects with embeddings.
 
     """
+    metrics = get_run_metrics()
+    with metrics.stage("embed"):
+        results = _generate_embeddings(
+            apartments,
+            batch_size,
+            sort_by_length,
+            model_name,
+            cache_backend,
+            workers,
+            backend,
+        )
+    metrics.add(
+        "embed",
+        items_in=len(apartments),
+        items_out=len(results),
+        errors=len(apartments) - len(results),
+    )
+    return results
+
+
+def _generate_embeddings(
+    apartments: list[Apartment],
+    batch_size: int,
+    sort_by_length: bool,
+    model_name: str,
+    cache_backend: str | None,
+    workers: int,
+    backend: str,
+) -> list[Apartment_DB]:
     apartments = [Apartment(**ad) if isinstance(ad, dict) else ad for ad in apartments]
 
-    try:
-        model = SentenceTransformer("all-MiniLM-L6-v2")
-        # model = SentenceTransformer("paraphrase-MiniLM-L3-v2")
+    descriptions = [str(apartment) for apartment in apartments]
+
+    cache = None
+    cache_backend = cache_backend or os.getenv("EMBEDDING_CACHE_BACKEND")
+    if cache_backend:
+        try:
+            cache = EmbeddingCache(
+                get_cache_backend(cache_backend), cache_model_id(model_name, backend)
+            )
+        except Exception as e:
+            logger.error(f"Embedding cache unavailable, encoding everything: {e}")
+
+    vectors = [None] * len(descriptions)
+    if cache:
+        try:
+            vectors = cache.lookup(descriptions)
+        except Exception as e:
+            logger.error(f"Error reading embedding cache, encoding everything: {e}")
+            cache = None
 
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    missing_texts = [descriptions[i] for i in missing]
+    try:
+        # With workers > 1 the model is loaded in the pool; a broken pool falls
+        # back to this process, where a model that cannot load raises
+        encoded = encode_texts_parallel(
+            missing_texts,
+            workers=workers,
+            model_name=model_name,
+            batch_size=batch_size,
+            sort_by_length=sort_by_length,
+            backend=backend,
+        )
     except Exception as e:
         logger.critical(f"Error loading SentenceTransformer model: {e}")
         return []
+    for i, vector in zip(missing, encoded):
+        vectors[i] = vector
 
-    results = []
-    for i, apartment in enumerate(apartments):
+    if cache:
         try:
-            description = str(apartment)
-            vector = model.encode([description])[0].tolist()
-
-            apartment_db = Apartment_DB(
-                url=apartment.url,
-                name=apartment.name,
-                address=apartment.address,
-                m2=apartment.m2,
-                bedrooms=apartment.bedrooms,
-                bathrooms=apartment.bathrooms,
-                price=apartment.price,
-                embedding=vector,
-            )
-            results.append(apartment_db)
-
+            cache.store(missing_texts, encoded)
         except Exception as e:
-            logger.warning(f"Error generating embedding for apartment [{i + 1}]: {e}")
+            logger.error(f"Error storing embeddings in cache: {e}")
+        logger.info(
+            f"Embedding cache: {cache.stats.hits} hits, {cache.stats.misses} misses "
+            f"({cache.stats.hit_rate:.1%} hit rate)"
+        )
+
+    results = []
+    for i, (apartment, vector) in enumerate(zip(apartments, vectors)):
+        if vector is None:
+            logger.warning(f"Error generating embedding for apartment [{i + 1}]")
+            continue
+        results.append(to_apartment_db(apartment, vector))
 
     logger.info(f"Generated {len(results)} embeddings")
     return results
@@ -1,12 +1,50 @@
+from datetime import UTC, datetime
+
 from prefect import task
+from sqlalchemy import bindparam, case, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
 
-from config.postgres import get_engine, get_session
-from models.sqlalchemy_models import Apartment_DB, Base
+from config.postgres import connection_scope, get_engine, get_pool_stats, session_scope
+from config.schema import (
+    apartment_key_columns,
+    bootstrap_schema,
+    ensure_history_partition,
+)
+from helpers.market_stats import (
+    apply_market_deltas,
+    market_deltas,
+    market_row,
+    stored_market_rows,
+)
+from helpers.metrics import get_run_metrics
+from helpers.profiling import profiled
+from models.pydantic_models import LoadStats
+from models.sources import listing_source
+from models.sqlalchemy_models import Apartment_DB, ApartmentPriceHistory_DB
 from config.logger import get_logger
 from tqdm import tqdm
 
 logger = get_logger("load_to_postgres")
 
+LOAD_MODES = ("merge", "upsert", "changes")
+DEFAULT_CHUNK_SIZE = 1000
+
+# Set by the database on insert and by the "changes" mode, never copied from the objects.
+TRACKING_COLUMNS = ("first_seen", "last_seen")
+APARTMENT_COLUMNS = [
+    column.name
+    for column in Apartment_DB.__table__.columns
+    if column.name not in TRACKING_COLUMNS
+]
+# Columns set by optional stages: a missing value keeps the stored one.
+PRESERVED_COLUMNS = ("cluster_id",)
+# Rows fill one of them depending on EMBEDDING_STORAGE, see kept_values.
+EMBEDDING_COLUMNS = ("embedding", "embedding_packed")
+# Written along with a changed row, but not a change by themselves.
+UNCOMPARED_COLUMNS = ("scraped_at",)
+# Not part of the content hash: written to unchanged rows along with `last_seen`.
+REFRESHED_COLUMNS = ("source", *PRESERVED_COLUMNS, *EMBEDDING_COLUMNS)
+
 
 def normalize_url(url: str) -> str:
     """
@@ -16,65 +54,393 @@ def normalize_url(url: str) -> str:
     return url.strip().lower()
 
 
-@task
-def load_info_to_postgres(new_apartments: list[Apartment_DB]):
+def apartment_to_row(apartment: Apartment_DB) -> dict:
     """
-    Loads a list of Apartment_DB objects into a PostgreSQL database.
+    Converts an Apartment_DB object into a column -> value dictionary, with
+    its source and scrape time. The content hash is the one set by
+    to_apartment_db: rows without one are always written by load_changes.
+    """
+    row = {column: getattr(apartment, column) for column in APARTMENT_COLUMNS}
+    row["source"] = row["source"] or listing_source(row["url"])
+    row["scraped_at"] = row["scraped_at"] or datetime.now(UTC)
+    return row
+
+
+def iter_chunks(items: list, chunk_size: int):
+    """
+    Yields consecutive slices of `items` of at most `chunk_size` elements.
+    """
+    for start in range(0, len(items), chunk_size):
+        yield items[start : start + chunk_size]
 
-    This task ensures the table exists, updates records that already exist
-    (based on primary key `url`), and inserts new records using a batch operation.
-    It normalizes URLs to avoid mismatches and prevents duplicate key errors by
-    removing already-existing records from the insertion batch.
 
+def kept_values(new, table) -> dict:
+    """
+    SET expressions of the columns a row may leave unset, given its new
+    values `new` (e.g. `excluded`):
+    - PRESERVED_COLUMNS keep their stored value when the new one is NULL
+    - a new embedding, in either column, replaces the stored one in both, so
+      a vector left from another model or storage mode cannot shadow it;
+      rows without an embedding keep the stored columns
+    """
+    values = {
+        column: func.coalesce(new[column], table.c[column])
+        for column in PRESERVED_COLUMNS
+    }
+    has_embedding = or_(*(new[column].is_not(None) for column in EMBEDDING_COLUMNS))
+    for column in EMBEDDING_COLUMNS:
+        values[column] = case((has_embedding, new[column]), else_=table.c[column])
+    return values
+
+
+def build_upsert_statement(rows: list[dict], key_columns: tuple[str, ...] = ("url",)):
+    """
+    Builds a single INSERT ... ON CONFLICT (url) DO UPDATE statement for a chunk.
+    Existing rows are only rewritten when at least one column other than
+    UNCOMPARED_COLUMNS differs, and the statement returns the url of every
+    inserted or updated record (callers tell inserts apart with the urls they
+    read beforehand: `xmax` cannot be returned from a partitioned table).
+    PRESERVED_COLUMNS and the embedding columns follow kept_values, and
+    `first_seen` is only written on insert.
     Args:
-        new_apartments (list[Apartment_DB]): A list of apartment records to insert or update.
+        rows (list[dict]): Rows to upsert, with unique urls.
+        key_columns (tuple[str, ...]): Conflict target, see apartment_key_columns.
+    Returns:
+        sqlalchemy.sql.dml.Insert: The upsert statement.
+    """
+    table = Apartment_DB.__table__
+    stmt = insert(table).values(rows)
+    update_columns = {
+        column: stmt.excluded[column]
+        for column in rows[0]
+        if column not in key_columns and column != "first_seen"
+    }
+    update_columns.update(kept_values(stmt.excluded, table))
+    changed = or_(
+        *(
+            table.c[column].is_distinct_from(value)
+            for column, value in update_columns.items()
+            if column not in UNCOMPARED_COLUMNS
+        )
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c[column] for column in key_columns],
+        set_=update_columns,
+        where=changed,
+    ).returning(table.c.url)
 
+
+def build_refresh_statement():
+    """
+    Builds the UPDATE of the REFRESHED_COLUMNS of unchanged rows, which the
+    content hash does not cover, run once per row carrying one of them
+    (executemany). Values follow kept_values, and a row is only rewritten
+    when one of them is distinct from the stored one. Parameters are the row
+    values prefixed with "new_".
     Returns:
-        int: The number of errors encountered during the operation.
+        sqlalchemy.sql.dml.Update: The update statement.
+    """
+    table = Apartment_DB.__table__
+    new = {
+        column: bindparam(f"new_{column}", type_=table.c[column].type)
+        for column in ("url", *REFRESHED_COLUMNS)
+    }
+    values = {"source": new["source"], **kept_values(new, table)}
+    changed = or_(
+        *(table.c[column].is_distinct_from(value) for column, value in values.items())
+    )
+    return update(table).where(table.c.url == new["url"], changed).values(values)
 
+
+def carries_refresh(row: dict, stored_source: str) -> bool:
     """
-    try:
-        engine = get_engine()
-        Base.metadata.create_all(engine)
-        session = get_session(engine)
-    except Exception as e:
-        raise RuntimeError(f"Error conecting in database: {e}")
+    Whether an unchanged row has REFRESHED_COLUMNS values to write: a source
+    other than the stored one, a cluster or an embedding.
+    """
+    if row["source"] != stored_source:
+        return True
+    return any(
+        row[column] is not None for column in (*PRESERVED_COLUMNS, *EMBEDDING_COLUMNS)
+    )
+
+
+def upsert_apartments(
+    engine, apartments: list[Apartment_DB], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> LoadStats:
+    """
+    Writes apartments with one INSERT ... ON CONFLICT statement per chunk,
+    and applies the resulting market histogram changes in the same
+    transaction. Each chunk is committed on its own, so memory and
+    transaction size stay bounded by `chunk_size` whatever the number of
+    apartments. A failing chunk is rolled back and counted as errors without
+    stopping the others.
+    Args:
+        engine (sqlalchemy.engine.base.Engine): The database engine.
+        apartments (list[Apartment_DB]): Apartments to insert or update.
+        chunk_size (int): Number of rows per statement.
+    Returns:
+        LoadStats: Inserted, updated, unchanged and failed row counts.
+    """
+    stats = LoadStats()
+    key_columns = apartment_key_columns(engine)
+    for chunk in tqdm(
+        list(iter_chunks(apartments, chunk_size)),
+        desc="Upserting apartments",
+        unit="chunk",
+    ):
+        # ON CONFLICT cannot touch the same row twice in one statement: keep the last one
+        rows = list(
+            {normalize_url(ap.url): apartment_to_row(ap) for ap in chunk}.values()
+        )
+        try:
+            with connection_scope(engine) as conn:
+                stored = stored_market_rows(conn, [row["url"] for row in rows])
+                result = conn.execute(build_upsert_statement(rows, key_columns)).all()
+                apply_market_deltas(
+                    conn, market_deltas(stored, {row["url"]: row for row in rows})
+                )
+        except Exception as e:
+            logger.error(f"Error upserting chunk of {len(rows)} apartments: {e}")
+            stats.errors += len(rows)
+            continue
+
+        inserted = sum(1 for row in result if row.url not in stored)
+        stats.inserted += inserted
+        stats.updated += len(result) - inserted
+        stats.unchanged += len(rows) - len(result)
+
+    return stats
 
-    try:
-        # Normalize and map apartments by URL
-        apartment_map = {normalize_url(ap.url): ap for ap in new_apartments}
-        urls = list(apartment_map.keys())
 
-        # Fetch existing apartment URLs from the database
-        existing = (
-            session.query(Apartment_DB.url).filter(Apartment_DB.url.in_(urls)).all()
+def load_changes(
+    engine, apartments: list[Apartment_DB], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> LoadStats:
+    """
+    Writes only what changed. Each chunk is compared with the stored content
+    hashes in one query, then in the same transaction:
+    - new and changed rows are upserted with `last_seen` (and, for new
+      rows, `first_seen`) set to the load time
+    - a price event is appended to apartment_price_history for every new
+      row, every price change and every row stored before content hashes
+    - rows without a content hash are never considered unchanged
+    - unchanged rows get `last_seen` bumped in one statement, and their
+      REFRESHED_COLUMNS (cluster, embedding, source) written only where they
+      differ from the stored ones, see build_refresh_statement
+    - the market histogram is updated for the new and changed rows
+    Args:
+        engine (sqlalchemy.engine.base.Engine): The database engine.
+        apartments (list[Apartment_DB]): Apartments to insert or update.
+        chunk_size (int): Number of rows per statement.
+    Returns:
+        LoadStats: Inserted, updated, unchanged and failed row counts.
+    """
+    stats = LoadStats()
+    seen_at = datetime.now(UTC)
+    ensure_history_partition(engine, seen_at)
+    key_columns = apartment_key_columns(engine)
+    table = Apartment_DB.__table__
+    history = ApartmentPriceHistory_DB.__table__
+
+    for chunk in tqdm(
+        list(iter_chunks(apartments, chunk_size)),
+        desc="Loading changed apartments",
+        unit="chunk",
+    ):
+        rows = list(
+            {normalize_url(ap.url): apartment_to_row(ap) for ap in chunk}.values()
         )
-        existing_urls = {normalize_url(url[0]) for url in existing}
+        try:
+            with connection_scope(engine) as conn:
+                stored = {
+                    url: (content_hash, price, source)
+                    for url, content_hash, price, source in conn.execute(
+                        select(
+                            table.c.url,
+                            table.c.content_hash,
+                            table.c.price,
+                            table.c.source,
+                        ).where(table.c.url.in_([row["url"] for row in rows]))
+                    )
+                }
+                writes, events, unchanged = [], [], []
+                for row in rows:
+                    previous = stored.get(row["url"])
+                    # Rows without a hash cannot be compared: always write them
+                    hashed = row["content_hash"] is not None
+                    if (
+                        hashed
+                        and previous is not None
+                        and previous[0] == row["content_hash"]
+                    ):
+                        unchanged.append(row)
+                        continue
+                    writes.append({**row, "first_seen": seen_at, "last_seen": seen_at})
+                    if (
+                        previous is None
+                        or previous[0] is None
+                        or previous[1] != row["price"]
+                    ):
+                        events.append(
+                            {
+                                "url": row["url"],
+                                "seen_at": seen_at,
+                                "price": row["price"],
+                            }
+                        )
 
-        updated_count = 0
-        inserted_count = 0
+                result = []
+                if writes:
+                    previous = stored_market_rows(conn, [row["url"] for row in writes])
+                    result = conn.execute(
+                        build_upsert_statement(writes, key_columns)
+                    ).all()
+                    apply_market_deltas(
+                        conn,
+                        market_deltas(previous, {row["url"]: row for row in writes}),
+                    )
+                if events:
+                    conn.execute(
+                        insert(history).values(events).on_conflict_do_nothing()
+                    )
+                if unchanged:
+                    conn.execute(
+                        update(table)
+                        .where(table.c.url.in_([row["url"] for row in unchanged]))
+                        .values(last_seen=seen_at)
+                    )
+                    refreshed = [
+                        {f"new_{c}": row[c] for c in ("url", *REFRESHED_COLUMNS)}
+                        for row in unchanged
+                        if carries_refresh(row, stored[row["url"]][2])
+                    ]
+                    if refreshed:
+                        conn.execute(build_refresh_statement(), refreshed)
+        except Exception as e:
+            logger.error(f"Error loading chunk of {len(rows)} apartments: {e}")
+            stats.errors += len(rows)
+            continue
 
-        # Merge existing apartments
-        for url in tqdm(existing_urls, desc="Merging existing apartments"):
-            session.merge(apartment_map.pop(url))
-            updated_count += 1
+        inserted = sum(1 for row in result if row.url not in stored)
+        stats.inserted += inserted
+        stats.updated += len(result) - inserted
+        stats.unchanged += len(unchanged)
 
-        # Insert only the remaining (new) apartments
-        new_entries = list(apartment_map.values())
-        if new_entries:
-            session.bulk_save_objects(new_entries)
-            inserted_count = len(new_entries)
+    return stats
 
-        session.commit()
 
-        # Log successful operations
-        if updated_count > 0:
-            logger.info(f"{updated_count} existing apartments were updated.")
-        if inserted_count > 0:
-            logger.info(f"{inserted_count} new apartments were inserted.")
+def merge_apartments(engine, new_apartments: list[Apartment_DB]) -> LoadStats:
+    """
+    Writes apartments through the ORM: existing rows are merged one by one
+    and new rows are inserted with a bulk save, all in one transaction along
+    with the market histogram changes.
+    Args:
+        engine (sqlalchemy.engine.base.Engine): The database engine.
+        new_apartments (list[Apartment_DB]): Apartments to insert or update.
+    Returns:
+        LoadStats: Inserted and updated row counts, or the failed row count.
+    """
+    stats = LoadStats()
+
+    try:
+        with session_scope(engine) as session:
+            # Normalize and map apartments by URL
+            apartment_map = {normalize_url(ap.url): ap for ap in new_apartments}
+            urls = list(apartment_map.keys())
+            connection = session.connection()
+            stored = stored_market_rows(
+                connection, [ap.url for ap in apartment_map.values()]
+            )
+            written = {ap.url: market_row(ap) for ap in apartment_map.values()}
+
+            # Fetch existing apartment URLs from the database
+            existing = (
+                session.query(Apartment_DB.url).filter(Apartment_DB.url.in_(urls)).all()
+            )
+            existing_urls = {normalize_url(url[0]) for url in existing}
+
+            # Merge existing apartments
+            for url in tqdm(existing_urls, desc="Merging existing apartments"):
+                session.merge(apartment_map.pop(url))
+                stats.updated += 1
+
+            # Insert only the remaining (new) apartments
+            new_entries = list(apartment_map.values())
+            if new_entries:
+                session.bulk_save_objects(new_entries)
+                stats.inserted = len(new_entries)
+
+            apply_market_deltas(connection, market_deltas(stored, written))
 
     except Exception as e:
-        session.rollback()
         logger.error(f"An error occurred while writing to PostgreSQL: {e}")
-    finally:
-        session.close()
+        stats = LoadStats(errors=len(new_apartments))
+
+    return stats
+
+
+@task
+@profiled
+def load_info_to_postgres(
+    new_apartments: list[Apartment_DB],
+    mode: str = "merge",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> LoadStats:
+    """
+    Loads a list of Apartment_DB objects into a PostgreSQL database.
+
+    This task ensures the schema is bootstrapped, updates records that already exist
+    (based on primary key `url`), and inserts new records. Three write paths
+    are available:
+    - "merge": ORM merge per existing row plus a bulk insert of new rows.
+    - "upsert": chunked set-based INSERT ... ON CONFLICT (url) DO UPDATE that
+      skips rows whose values did not change.
+    - "changes": content-hash change detection that writes only new and
+      changed rows, appends price history and bumps `last_seen` of the rest.
+
+    Args:
+        new_apartments (list[Apartment_DB]): A list of apartment records to insert or update.
+        mode (str): The write path, "merge", "upsert" or "changes".
+        chunk_size (int): Rows per statement in "upsert" and "changes" modes.
+
+    Returns:
+        LoadStats: The number of inserted, updated, unchanged and failed rows.
+
+    """
+    if mode not in LOAD_MODES:
+        raise ValueError(
+            f"Unknown load mode '{mode}'. Expected one of: {', '.join(LOAD_MODES)}"
+        )
+
+    try:
+        engine = get_engine()
+        bootstrap_schema(engine)
+    except Exception as e:
+        raise RuntimeError(f"Error conecting in database: {e}")
+
+    metrics = get_run_metrics()
+    with metrics.stage("load"):
+        if mode == "upsert":
+            stats = upsert_apartments(engine, new_apartments, chunk_size)
+        elif mode == "changes":
+            stats = load_changes(engine, new_apartments, chunk_size)
+        else:
+            stats = merge_apartments(engine, new_apartments)
+    metrics.add(
+        "load",
+        items_in=len(new_apartments),
+        items_out=stats.inserted + stats.updated + stats.unchanged,
+        errors=stats.errors,
+    )
+
+    # Log successful operations
+    if stats.updated > 0:
+        logger.info(f"{stats.updated} existing apartments were updated.")
+    if stats.inserted > 0:
+        logger.info(f"{stats.inserted} new apartments were inserted.")
+    if stats.unchanged > 0:
+        logger.info(f"{stats.unchanged} apartments were unchanged.")
+    if stats.errors > 0:
+        logger.error(f"{stats.errors} apartments could not be written.")
+    logger.debug(f"Connection pool stats: {get_pool_stats(engine)}")
+
+    return stats
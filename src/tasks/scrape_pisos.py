@@ -1,7 +1,16 @@
 from prefect import task
 
+import asyncio
 from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+from bs4 import BeautifulSoup
 from config.logger import get_logger
+from helpers.html_archive import get_html_archive
+from helpers.http_fetcher import AsyncFetcher, scraping_fetcher
+from helpers.metrics import get_run_metrics
+from helpers.profiling import profiled
+from helpers.seen_index import IncrementalCrawl, get_incremental_crawl, get_seen_index
+from helpers.webdriver_pool import WebDriverPool
 import math
 import re
 from tqdm import tqdm
@@ -18,29 +27,104 @@ from selenium.common.exceptions import (
     StaleElementReferenceException,
 )
 
+import atexit
+import functools
+from collections import deque
+import os
+import time
+import shutil
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from models.pydantic_models import Apartment
 from helpers.utils import (
+    HTML_PARSER,
     extract_int,
     extract_price,
     extract_square_meters,
+    normalize_text,
 )
 
 logger = get_logger("scrape_pisos")
 
+PISOS_BASE_URL = "https://www.pisos.com"
+RESULTS_PER_PAGE = 30
+ENGINES = ("selenium", "http")
+POOL_SIZE = int(os.getenv("SELENIUM_POOL_SIZE", "4"))
+
+# Resources never downloaded by low-latency drivers
+BLOCKED_RESOURCES = [
+    "*.css",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+]
+
+_driver_pools: dict[bool, WebDriverPool] = {}
+_driver_pool_lock = threading.Lock()
+
+
+class WaitStats:
+    """
+    Thread-safe collector of the time spent waiting for pages to be ready.
+    """
 
-def init_selenium(options: Optional[Options] = None) -> WebDriver:
+    def __init__(self):
+        self.samples: list[float] = []
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+
+    def summary(self) -> dict[str, float]:
+        with self._lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return {
+                "pages": 0,
+                "total": 0.0,
+                "mean": 0.0,
+                "p50": 0.0,
+                "p95": 0.0,
+                "max": 0.0,
+            }
+        return {
+            "pages": len(samples),
+            "total": sum(samples),
+            "mean": sum(samples) / len(samples),
+            "p50": samples[len(samples) // 2],
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max": samples[-1],
+        }
+
+
+def init_selenium(
+    options: Optional[Options] = None, low_latency: bool = False
+) -> WebDriver:
     """
     Initializes the Selenium WebDriver with the provided options.
+    In low-latency mode the driver returns control as soon as the DOM is
+    ready ("eager" page-load strategy) and images, fonts and stylesheets are
+    never downloaded.
     Args:
         options (Optional[Options]): Custom options for the WebDriver. If None, uses default headless options.
+        low_latency (bool): Enable the eager page-load strategy and resource blocking.
     Returns:
         WebDriver: An instance of the Selenium WebDriver.
     Raises:
         WebDriverException: If there is an error initializing the WebDriver.
     """
 
+    tmp_profile = None
     if not options:
         options = Options()
         options.add_argument("--headless")
@@ -49,8 +133,20 @@ def init_selenium(options: Optional[Options] = None) -> WebDriver:
         tmp_profile = tempfile.mkdtemp()
         options.add_argument(f"--user-data-dir={tmp_profile}")
 
+    if low_latency:
+        options.page_load_strategy = "eager"
+        options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2}
+        )
+
     try:
         driver = webdriver.Chrome(options=options)
+        driver.profile_dir = tmp_profile
+        if low_latency:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd(
+                "Network.setBlockedURLs", {"urls": BLOCKED_RESOURCES}
+            )
         logger.info("Selenium WebDriver initialized.")
         return driver
     except WebDriverException as e:
@@ -58,6 +154,43 @@ def init_selenium(options: Optional[Options] = None) -> WebDriver:
         raise
 
 
+def quit_selenium(driver: WebDriver) -> None:
+    """
+    Quits a WebDriver and removes the temporary profile created for it.
+    """
+    try:
+        driver.quit()
+    finally:
+        profile_dir = getattr(driver, "profile_dir", None)
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+
+def get_driver_pool(size: int = POOL_SIZE, low_latency: bool = False) -> WebDriverPool:
+    """
+    Returns the process-wide pool of warm Chrome drivers, so drivers are
+    reused across search URLs and `.map` invocations in the same worker.
+    Args:
+        size (int): Maximum number of drivers in the pool.
+        low_latency (bool): Whether the pool holds low-latency drivers.
+    Returns:
+        WebDriverPool: The shared pool.
+    """
+    with _driver_pool_lock:
+        pool = _driver_pools.get(low_latency)
+        if pool is None:
+            pool = WebDriverPool(
+                functools.partial(init_selenium, low_latency=low_latency),
+                size,
+                destroy=quit_selenium,
+            )
+            _driver_pools[low_latency] = pool
+            atexit.register(pool.close)
+        elif pool.size != size:
+            pool.resize(size)
+    return pool
+
+
 def wait_page_to_be_loaded(driver: WebDriver, timeout: int = 10):
     """
     Waits for the page to be fully loaded by checking for the presence of the price element.
@@ -75,24 +208,27 @@ def wait_page_to_be_loaded(driver: WebDriver, timeout: int = 10):
         logger.error("Timeout waiting for page to load.")
 
 
-def accept_cookies(driver: WebDriver):
+def accept_cookies(driver: WebDriver, timeout: float = 10) -> bool:
     """
     Accepts cookies on the page if the cookie banner is present.
     Args:
         driver (WebDriver): The Selenium WebDriver instance.
-    Raises:
-        TimeoutException: If the cookie banner does not appear within the specified timeout.
+        timeout (float): Maximum time to wait for the banner (in seconds).
+    Returns:
+        bool: Whether the banner was found and clicked.
     """
     try:
-        accept_button = WebDriverWait(driver, 10).until(
+        accept_button = WebDriverWait(driver, timeout).until(
             EC.element_to_be_clickable((By.ID, "didomi-notice-agree-button"))
         )
         accept_button.click()
         logger.info("Cookies accepted successfully.")
+        return True
     except TimeoutException:
         logger.warning("No cookie banner appeared (timeout).")
     except Exception as e:
         logger.error(f"Error while accepting cookies: {e}")
+    return False
 
 
 def get_total_pages(driver) -> int:
@@ -108,18 +244,124 @@ def get_total_pages(driver) -> int:
             By.XPATH,
             '//*[@class="pagination__counter" and contains(text(), "resultados")]',
         ).text
-        match = re.search(r"de\s+(\d+)\s+resultados", counter)
-        if match:
-            total_results = int(match.group(1))
-            return math.ceil(total_results / 30)
-        else:
-            logger.warning("No se pudo encontrar el total de resultados.")
-            return 0
+        return total_pages_from_counter(counter)
     except Exception as e:
         logger.error(f"Error obteniendo el número total de páginas: {e}")
         return 0
 
 
+def total_pages_from_counter(counter: str) -> int:
+    """
+    Computes the number of result pages from the pagination counter text
+    (e.g. "1-30 de 812 resultados").
+    Args:
+        counter (str): The text of the pagination counter.
+    Returns:
+        int: The total number of pages, or 0 if the total cannot be read.
+    """
+    match = re.search(r"de\s+([\d.]+)\s+resultados", counter)
+    if match:
+        total_results = int(match.group(1).replace(".", ""))
+        return math.ceil(total_results / RESULTS_PER_PAGE)
+    else:
+        logger.warning("No se pudo encontrar el total de resultados.")
+        return 0
+
+
+def build_page_url(url: str, page: int) -> str:
+    """
+    Builds the URL of a given results page of a pisos.com search.
+    pisos.com paginates by appending the page number as the last path
+    segment, e.g. /venta/pisos-torremolinos/2/.
+    Args:
+        url (str): The search URL (first results page).
+        page (int): The 1-based page number.
+    Returns:
+        str: The URL of the requested page.
+    """
+    if page <= 1:
+        return url
+    parts = urlsplit(url)
+    path = f"{parts.path.rstrip('/')}/{page}/"
+    return urlunsplit((parts.scheme, parts.netloc, path, parts.query, parts.fragment))
+
+
+def parse_listing_cards(soup: BeautifulSoup) -> list[Apartment]:
+    """
+    Parses the listing cards of a pisos.com results page from its HTML.
+    Produces the same Apartment objects as reading the cards through Selenium.
+    Args:
+        soup (BeautifulSoup): The parsed results page.
+    Returns:
+        list[Apartment]: A list of Apartment objects containing the scraped data.
+    """
+    apartments: list[Apartment] = []
+    divs = soup.select("div.grid__wrapper div[data-lnk-href]")
+
+    for i, div in enumerate(divs):
+        try:
+            url_apartment = div.get("data-lnk-href")
+            full_url = f"{PISOS_BASE_URL}{url_apartment}"
+
+            title = div.select_one(".ad-preview__title")
+            subtitle = div.select_one(".ad-preview__subtitle")
+            price_element = div.select_one(".ad-preview__price")
+            if title is None or subtitle is None or price_element is None:
+                logger.warning(f"Missing expected element in listing [{i + 1}]")
+                continue
+
+            name = normalize_text(title.get_text())
+            address = normalize_text(subtitle.get_text())
+            price = extract_price(normalize_text(price_element.get_text()))
+
+            chars = [
+                normalize_text(c.get_text()) for c in div.select(".ad-preview__char")
+            ]
+            bedrooms = extract_int(chars[0]) if len(chars) > 0 else None
+            bathrooms = extract_int(chars[1]) if len(chars) > 1 else None
+            square_meters = extract_square_meters(chars[2]) if len(chars) > 2 else None
+
+            apartments.append(
+                Apartment(
+                    name=name,
+                    address=address,
+                    m2=square_meters,
+                    bedrooms=bedrooms,
+                    bathrooms=bathrooms,
+                    price=price,
+                    url=full_url,
+                )
+            )
+
+        except Exception as e:
+            logger.error(f"Unexpected error parsing listing [{i + 1}]: {e}")
+
+    return apartments
+
+
+def parse_pisos_html(html: str | bytes) -> tuple[list[Apartment], int, bool]:
+    """
+    Parses a pisos.com results page.
+    Args:
+        html (str | bytes): The page HTML.
+    Returns:
+        tuple[list[Apartment], int, bool]: The listings, the total number of
+        result pages (0 if unknown) and whether the listing grid was present.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+    has_grid = soup.select_one("div.grid__wrapper div[data-lnk-href]") is not None
+    counter = next(
+        (
+            element.get_text()
+            for element in soup.select(".pagination__counter")
+            if "resultados" in element.get_text()
+        ),
+        "",
+    )
+    total_pages = total_pages_from_counter(counter) if counter else 0
+    return parse_listing_cards(soup), total_pages, has_grid
+
+
 def close_poping_modal(driver: WebDriver, timeout: int = 3):
     """
     Closes any pop-up modal that appears on the page.
@@ -151,104 +393,400 @@ def close_poping_modal(driver: WebDriver, timeout: int = 3):
         logger.error(f"Unexpected error while closing modal: {e}")
 
 
-def scrape_page(driver: WebDriver) -> list[Apartment]:
+def wait_for_page_ready(driver: WebDriver, timeout: int = 10) -> float:
+    """
+    Waits until the listing grid or the pop-up modal appears, whichever comes
+    first, closing the modal if it showed up. Replaces the fixed modal wait
+    followed by the grid wait.
+    Args:
+        driver (WebDriver): The Selenium WebDriver instance.
+        timeout (int): Maximum time to wait for the page (in seconds).
+    Returns:
+        float: The time spent waiting, in seconds.
+    """
+    start = time.perf_counter()
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.any_of(
+                EC.presence_of_element_located((By.CLASS_NAME, "ad-preview__price")),
+                EC.presence_of_element_located((By.CLASS_NAME, "modal__content")),
+            )
+        )
+    except TimeoutException:
+        logger.error("Timeout waiting for page to load.")
+        return time.perf_counter() - start
+
+    if driver.find_elements(By.CLASS_NAME, "modal__content"):
+        close_poping_modal(driver, timeout=1)
+        remaining = max(0.0, timeout - (time.perf_counter() - start))
+        wait_page_to_be_loaded(driver, timeout=remaining)
+
+    return time.perf_counter() - start
+
+
+def scrape_page(
+    driver: WebDriver, wait_stats: WaitStats | None = None, waited: float | None = None
+) -> list[Apartment]:
     """
     Scrapes a single page of apartment listings from the current URL in the WebDriver.
+    The rendered HTML is read once and all cards are parsed in-process.
     Args:
         driver (WebDriver): The Selenium WebDriver instance.
+        wait_stats (WaitStats | None): Collector for the time spent waiting for the page.
+        waited (float | None): Time already spent in wait_for_page_ready for this
+            page, if the caller waited; it is recorded instead of waiting again.
     Returns:
         list[Apartment]: A list of Apartment objects containing the scraped data.
     """
-    close_poping_modal(driver)
-    wait_page_to_be_loaded(driver)
-    apartments: list[Apartment] = []
+    if waited is None:
+        waited = wait_for_page_ready(driver)
+    if wait_stats is not None:
+        wait_stats.record(waited)
 
+    # One round-trip for the whole DOM instead of ~7 WebDriver calls per card
     try:
-        divs = driver.find_elements(
-            By.XPATH, '//div[contains(@class, "grid__wrapper")]//div[@data-lnk-href]'
-        )
+        html = driver.page_source
     except Exception as e:
-        logger.error(f"Error locating apartment divs: {e}")
+        logger.error(f"Error reading page source: {e}")
+        get_run_metrics().add("scrape", errors=1)
         return []
+    # Rendered HTML size: the closest measure of what the browser fetched for the page
+    get_run_metrics().add("scrape", bytes_fetched=len(html))
 
-    for i, div in enumerate(divs):
+    archive = get_html_archive()
+    if archive is not None:
+        archive.add(driver.current_url, html, parse_pisos_html)
+
+    return parse_listing_cards(BeautifulSoup(html, HTML_PARSER))
+
+
+class StaticDataUnavailable(Exception):
+    """Raised when the server-rendered page of a search has no listing grid."""
+
+
+async def iter_pisos_http_pages(
+    url: str, fetcher: AsyncFetcher, crawl: IncrementalCrawl | None = None
+):
+    """
+    Fetches every results page of a pisos.com search over plain HTTP,
+    yielding the listings of each page as soon as it has been parsed.
+    The first page gives the total number of pages; the remaining pages are
+    then fetched concurrently and parsed in worker threads as they arrive.
+    In incremental mode pages are fetched in small windows and yielded in
+    page order, so pagination can stop as soon as `crawl` says so.
+    Args:
+        url (str): The search URL (first results page).
+        fetcher (AsyncFetcher): Open fetcher used for all requests.
+        crawl (IncrementalCrawl | None): Stop condition of an incremental crawl.
+    Yields:
+        tuple[int, list[Apartment]]: The page number and its listings.
+    Raises:
+        StaticDataUnavailable: If the first page does not contain the listing grid
+            or the pagination counter (raised before anything is yielded).
+    """
+    first_page, total_pages, has_grid = await fetcher.fetch_parsed(
+        url, parse_pisos_html
+    )
+    if not has_grid:
+        raise StaticDataUnavailable(f"Static HTML of {url} has no listing grid")
+    if total_pages == 0:
+        # Without the counter the other pages are unknown: Selenium clicks through them
+        raise StaticDataUnavailable(f"Static HTML of {url} has no pagination counter")
+    yield 1, first_page
+
+    async def fetch_page(page: int) -> tuple[int, list[Apartment]]:
+        page_url = build_page_url(url, page)
         try:
-            url_apartment = div.get_attribute("data-lnk-href")
-            full_url = f"https://www.pisos.com{url_apartment}"
-
-            name = div.find_element(By.CLASS_NAME, "ad-preview__title").text.strip()
-            address = div.find_element(
-                By.CLASS_NAME, "ad-preview__subtitle"
-            ).text.strip()
-            price_text = div.find_element(By.CLASS_NAME, "ad-preview__price").text
-            price = extract_price(price_text)
-
-            chars = div.find_elements(By.CLASS_NAME, "ad-preview__char")
-            bedrooms = extract_int(chars[0].text) if len(chars) > 0 else None
-            bathrooms = extract_int(chars[1].text) if len(chars) > 1 else None
-            square_meters = (
-                extract_square_meters(chars[2].text) if len(chars) > 2 else None
+            listings, _, page_has_grid = await fetcher.fetch_parsed(
+                page_url, parse_pisos_html
             )
+        except Exception as e:
+            logger.error(f"Error fetching page {page_url}: {e}")
+            get_run_metrics().add("scrape", errors=1)
+            return page, []
+        if not page_has_grid:
+            logger.warning(f"Static HTML of {page_url} has no listing grid")
+        return page, listings
+
+    pages = range(2, total_pages + 1)
+    if crawl is None:
+        for next_page in asyncio.as_completed([fetch_page(page) for page in pages]):
+            yield await next_page
+        logger.info(f"Fetched {total_pages} result pages for {url} over HTTP")
+        return
+
+    if await asyncio.to_thread(crawl.should_stop, first_page):
+        return
+    window = fetcher.per_host_limit
+    for start in range(0, len(pages), window):
+        results = await asyncio.gather(
+            *(fetch_page(page) for page in pages[start : start + window])
+        )
+        for page, listings in results:
+            yield page, listings
+            if await asyncio.to_thread(crawl.should_stop, listings):
+                return
 
-            apartment = Apartment(
-                name=name,
-                address=address,
-                m2=square_meters,
-                bedrooms=bedrooms,
-                bathrooms=bathrooms,
-                price=price,
-                url=full_url,
-            )
 
-            apartments.append(apartment)
+async def crawl_pisos_http(
+    url: str, fetcher: AsyncFetcher, crawl: IncrementalCrawl | None = None
+) -> list[Apartment] | None:
+    """
+    Collects every listing of a pisos.com search over HTTP (see `iter_pisos_http_pages`).
+    Returns:
+        list[Apartment] | None: The listings of all pages in page order, or
+        None if the server-rendered first page does not contain the listing grid
+        or the pagination counter.
+    """
+    results: dict[int, list[Apartment]] = {}
+    try:
+        async for page, listings in iter_pisos_http_pages(url, fetcher, crawl):
+            results[page] = listings
+    except StaticDataUnavailable as e:
+        logger.warning(str(e))
+        return None
+    return [listing for page in sorted(results) for listing in results[page]]
+
 
-        except NoSuchElementException as e:
-            logger.warning(f"Missing expected element in listing [{i + 1}]: {e}")
-        except Exception as e:
-            logger.error(f"Unexpected error parsing listing [{i + 1}]: {e}")
+def scrape_pisos_http(
+    url: str, crawl: IncrementalCrawl | None = None
+) -> list[Apartment] | None:
+    """
+    Scrapes a pisos.com search without a browser.
+    Returns None when the static page lacks the listing data, so the caller
+    can fall back to Selenium.
+    """
 
-    return apartments
+    async def run() -> list[Apartment] | None:
+        async with scraping_fetcher() as fetcher:
+            return await crawl_pisos_http(url, fetcher, crawl)
+
+    try:
+        return asyncio.run(run())
+    except Exception as e:
+        logger.error(f"HTTP scraping of {url} failed: {e}")
+        return None
 
 
-@task
-def scrape_pisos(url: str) -> list[Apartment]:
-    listings = []
+def open_page(driver: WebDriver, page_url: str, low_latency: bool = False) -> None:
+    """
+    Loads a results page and accepts the cookie banner the first time a
+    driver visits the site (the consent is kept in the driver's profile).
+    Low-latency drivers only accept the banner if it is already present, and
+    look for it again on the next pages until it has been clicked.
+    """
+    driver.get(page_url)
+    if not getattr(driver, "cookies_accepted", False):
+        if low_latency:
+            driver.cookies_accepted = accept_cookies(driver, timeout=0)
+        else:
+            wait_page_to_be_loaded(driver)
+            accept_cookies(driver)
+            driver.cookies_accepted = True
+
 
+def scrape_page_url(
+    pool: WebDriverPool,
+    page_url: str,
+    low_latency: bool = False,
+    wait_stats: WaitStats | None = None,
+) -> list[Apartment]:
+    """
+    Scrapes one results page with a driver borrowed from the pool.
+    """
+    start = time.perf_counter()
     try:
-        driver = init_selenium()
-        driver.get(url)
-        wait_page_to_be_loaded(driver)
-        accept_cookies(driver)
+        with pool.driver() as driver:
+            open_page(driver, page_url, low_latency)
+            return scrape_page(driver, wait_stats)
+    except Exception as e:
+        logger.error(f"Error scraping page {page_url}: {e}")
+        get_run_metrics().add("scrape", errors=1)
+        return []
+    finally:
+        get_run_metrics().observe_latency("scrape", time.perf_counter() - start)
+
+
+def iter_pages_serially(
+    driver: WebDriver,
+    wait_stats: WaitStats | None = None,
+    crawl: IncrementalCrawl | None = None,
+    waited: float | None = None,
+):
+    """
+    Scrapes the current page and the following ones by clicking the
+    "next page" button until the last page, or until `crawl` says to stop.
+    Used when the page count is unknown. `waited` is the readiness wait
+    already done for the current page, see scrape_page.
+    Yields:
+        list[Apartment]: The listings of each page, in page order.
+    """
+    while True:
+        start = time.perf_counter()
+        page_data = scrape_page(driver, wait_stats, waited)
+        waited = None
+        get_run_metrics().observe_latency("scrape", time.perf_counter() - start)
+        yield page_data
+        if crawl is not None and crawl.should_stop(page_data):
+            break
+
+        try:
+            next_button = driver.find_element(
+                By.XPATH, '//div[contains(@class, "pagination__next")]//a'
+            )
+            next_button.click()
+        except NoSuchElementException:
+            logger.info("No more pages to scrape. Exiting loop.")
+            break
+        except Exception as e:
+            logger.error(f"Error clicking next page: {e}")
+            break
+
 
+def iter_pisos_selenium_pages(
+    url: str,
+    pool_size: int = POOL_SIZE,
+    low_latency: bool = False,
+    wait_stats: WaitStats | None = None,
+    crawl: IncrementalCrawl | None = None,
+):
+    """
+    Scrapes a pisos.com search with headless Chrome drivers from the shared
+    pool, yielding the listings of each page in page order.
+    The first page gives the total number of pages; the remaining page URLs
+    are then distributed across the pool and scraped in parallel. At most
+    two pages per driver are in flight, so unconsumed pages do not pile up
+    and an incremental crawl wastes at most that many pages when it stops.
+    Args:
+        url (str): The search URL.
+        pool_size (int): Number of Chrome drivers used in parallel.
+        low_latency (bool): Use low-latency drivers.
+        wait_stats (WaitStats | None): Collector for the time spent waiting for pages.
+        crawl (IncrementalCrawl | None): Stop condition of an incremental crawl.
+    Yields:
+        list[Apartment]: The listings of each page.
+    """
+    pool = get_driver_pool(pool_size, low_latency)
+
+    with pool.driver() as driver:
+        start = time.perf_counter()
+        open_page(driver, url, low_latency)
+        waited = wait_for_page_ready(driver)
         total_pages = get_total_pages(driver)
-        progress_bar = tqdm(total=total_pages, desc="Scraping pages", unit="page")
+        if total_pages == 0:
+            yield from iter_pages_serially(driver, wait_stats, crawl, waited)
+            return
+        first_page = scrape_page(driver, wait_stats, waited)
+        get_run_metrics().observe_latency("scrape", time.perf_counter() - start)
+    yield first_page
+    if crawl is not None and crawl.should_stop(first_page):
+        return
+
+    def next_result(in_flight: deque):
+        page_data = in_flight.popleft().result()
+        return page_data, crawl is not None and crawl.should_stop(page_data)
+
+    page_urls = [build_page_url(url, page) for page in range(2, total_pages + 1)]
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        in_flight: deque = deque()
+        try:
+            for page_url in tqdm(page_urls, desc="Scraping pages", unit="page"):
+                in_flight.append(
+                    executor.submit(
+                        scrape_page_url, pool, page_url, low_latency, wait_stats
+                    )
+                )
+                if len(in_flight) >= 2 * pool.size:
+                    page_data, stop = next_result(in_flight)
+                    yield page_data
+                    if stop:
+                        return
+            while in_flight:
+                page_data, stop = next_result(in_flight)
+                yield page_data
+                if stop:
+                    return
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def scrape_pisos_selenium(
+    url: str,
+    pool_size: int = POOL_SIZE,
+    low_latency: bool = False,
+    crawl: IncrementalCrawl | None = None,
+) -> list[Apartment]:
+    """
+    Scrapes a pisos.com search with headless Chrome drivers from the shared pool
+    (see `iter_pisos_selenium_pages`).
+    """
+    wait_stats = WaitStats()
+    listings: list[Apartment] = []
 
-        while True:
-            page_data = scrape_page(driver)
+    try:
+        for page_data in iter_pisos_selenium_pages(
+            url, pool_size, low_latency, wait_stats, crawl
+        ):
             listings.extend(page_data)
 
-            try:
-                next_button = driver.find_element(
-                    By.XPATH, '//div[contains(@class, "pagination__next")]//a'
-                )
-                next_button.click()
-                progress_bar.update(1)
-            except NoSuchElementException:
-                logger.info("No more pages to scrape. Exiting loop.")
-                break
-            except Exception as e:
-                logger.error(f"Error clicking next page: {e}")
-                break
-
-        logger.info(f"Scraping finished. Total listings: {len(listings)}")
+        wait = wait_stats.summary()
+        logger.info(
+            f"Scraping finished. Total listings: {len(listings)}. "
+            f"Page wait over {wait['pages']} pages: mean {wait['mean']:.2f}s, "
+            f"p95 {wait['p95']:.2f}s, max {wait['max']:.2f}s, total {wait['total']:.1f}s"
+        )
         return listings
 
     except Exception as e:
         logger.critical(f"Fatal error during scraping: {e}")
         return []
 
-    finally:
-        try:
-            driver.quit()
-        except Exception:
-            logger.warning("WebDriver could not be closed properly.")
+
+@task
+@profiled
+def scrape_pisos(
+    url: str,
+    engine: str = "selenium",
+    pool_size: int = POOL_SIZE,
+    low_latency: bool = False,
+    stop_after: int = 0,
+) -> list[Apartment]:
+    """
+    Scrapes the apartment listings of a pisos.com search.
+    Args:
+        url (str): The search URL.
+        engine (str): "selenium" drives a headless Chrome; "http" fetches and
+            parses the server-rendered pages directly and falls back to
+            Selenium only when the static HTML lacks the listing grid.
+        pool_size (int): Number of Chrome drivers used in parallel by the Selenium engine.
+        low_latency (bool): Use eager page loads, block images/fonts/CSS and skip
+            the fixed cookie-banner wait in the Selenium engine.
+        stop_after (int): Incremental crawl: stop paginating after this many
+            consecutive listings already stored unchanged. 0 crawls every page.
+    Returns:
+        list[Apartment]: A list of Apartment objects containing the scraped data.
+    """
+    if engine not in ENGINES:
+        raise ValueError(
+            f"Unknown pisos engine '{engine}'. Expected one of: {', '.join(ENGINES)}"
+        )
+
+    metrics = get_run_metrics()
+    with metrics.stage("scrape"):
+        listings = None
+        if engine == "http":
+            listings = scrape_pisos_http(url, get_incremental_crawl(stop_after))
+            if listings is not None:
+                logger.info(f"Scraping finished. Total listings: {len(listings)}")
+            else:
+                logger.info(f"Falling back to Selenium for {url}")
+
+        if listings is None:
+            listings = scrape_pisos_selenium(
+                url, pool_size, low_latency, get_incremental_crawl(stop_after)
+            )
+    metrics.add("scrape", items_in=1, items_out=len(listings))
+
+    get_seen_index().add_many(listing.url for listing in listings)
+    return listings
@@ -1,11 +1,15 @@
 from prefect import task
 
-from urllib.request import urlopen, Request
+import asyncio
+from urllib.parse import urljoin, urlsplit
 from bs4 import BeautifulSoup
 from models.pydantic_models import Apartment
 from config.logger import get_logger
+from helpers.http_fetcher import AsyncFetcher, scraping_fetcher
+from helpers.metrics import get_run_metrics
+from helpers.profiling import profiled
+from helpers.seen_index import IncrementalCrawl, get_incremental_crawl, get_seen_index
 import traceback
-from tqdm import tqdm
 
 from helpers.utils import (
     extract_price,
@@ -16,29 +20,30 @@ from helpers.utils import (
 
 logger = get_logger("scrape_solvia")
 
+MAX_PAGES = 50
 
-@task
-def scrape_solvia(url: str) -> list[Apartment]:
+PAGINATION_SELECTORS = (
+    "ul.pagination a[href]",
+    "nav.pagination a[href]",
+    "div.pagination a[href]",
+    "a[rel=next][href]",
+)
+
+
+def parse_solvia_cards(soup: BeautifulSoup) -> list[dict]:
     """
-    Scrapes property listings from Solvia.
-    Each listing includes name, address, m2, number of bedrooms, bathrooms, and URL.
+    Parses every property card of a Solvia results page.
+    Each listing includes name, address, m2, number of bedrooms, bathrooms, price and URL.
+    Args:
+        soup (BeautifulSoup): The parsed results page.
+    Returns:
+        list[dict]: One dictionary per valid card, with the fields of `Apartment`.
     """
-
     listings = []
-
-    try:
-        r = Request(url, headers={"User-Agent": "Mozilla/5.0"})
-        html = urlopen(r).read()
-    except Exception as e:
-        logger.error(f"Error fetching the URL: {url} - {e}")
-        logger.debug(traceback.format_exc())
-        return []
-
-    soup = BeautifulSoup(html, "html.parser")
     cards = soup.find_all("div", class_="house-info")
     logger.info(f"Found {len(cards)} property cards")
 
-    for i, card in tqdm(enumerate(cards), total=len(cards), desc="Scraping Solvia"):
+    for i, card in enumerate(cards):
         try:
             # url
             url_apartment = card.find("a").get("href")
@@ -88,6 +93,172 @@ def scrape_solvia(url: str) -> list[Apartment]:
             logger.error(f"[{i + 1}] Unexpected error while parsing a listing: {e}")
             logger.debug(traceback.format_exc())
 
+    return listings
+
+
+def find_pagination_urls(soup: BeautifulSoup, page_url: str) -> list[str]:
+    """
+    Returns the absolute URLs of the other result pages linked from a page.
+    Only links that stay on the same path as the current page are kept, so
+    unrelated navigation links are ignored.
+    Args:
+        soup (BeautifulSoup): The parsed results page.
+        page_url (str): The URL the page was fetched from.
+    Returns:
+        list[str]: Result page URLs, in document order and without duplicates.
+    """
+    path = urlsplit(page_url).path
+    urls: dict[str, None] = {}
+    for selector in PAGINATION_SELECTORS:
+        for link in soup.select(selector):
+            href = urljoin(page_url, link["href"]).split("#")[0]
+            if urlsplit(href).path == path and href != page_url:
+                urls[href] = None
+    return list(urls)
+
+
+def parse_solvia_page(html: bytes, page_url: str) -> tuple[list[dict], list[str]]:
+    """
+    Parses a results page into its listings and the pagination links it contains.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    return parse_solvia_cards(soup), find_pagination_urls(soup, page_url)
+
+
+async def iter_solvia_pages(
+    url: str,
+    fetcher: AsyncFetcher,
+    paginate: bool = True,
+    max_pages: int = MAX_PAGES,
+    crawl: IncrementalCrawl | None = None,
+):
+    """
+    Fetches a Solvia search and its result pages concurrently, yielding the
+    listings of each page as soon as it has been parsed.
+    Pages are discovered from the pagination links of every fetched page and
+    fetched as soon as they are found. Each page is parsed in a worker thread
+    as soon as it arrives, so parsing overlaps with the remaining downloads.
+    Listings already yielded by an earlier page are skipped.
+    In incremental mode pages are released in discovery order and pagination
+    stops, cancelling the pending downloads, as soon as `crawl` says so.
+    Args:
+        url (str): The search URL (first results page).
+        fetcher (AsyncFetcher): Open fetcher used for all requests.
+        paginate (bool): Whether to follow pagination links.
+        max_pages (int): Upper bound on the number of pages fetched.
+        crawl (IncrementalCrawl | None): Stop condition of an incremental crawl.
+    Yields:
+        tuple[int, list[dict]]: The page discovery index and its new listings,
+        in completion order (discovery order in incremental mode).
+    """
+    pages: list[str] = [url]
+    seen: set[str] = set()
+    # Incremental mode: finished pages waiting for an earlier one
+    parked: dict[int, list[dict]] = {}
+    next_index = 0
+
+    async def process(index: int, page_url: str) -> tuple[int, list[dict], list[str]]:
+        try:
+            listings, links = await fetcher.fetch_parsed(
+                page_url, parse_solvia_page, page_url
+            )
+        except Exception as e:
+            logger.error(f"Error fetching the URL: {page_url} - {e}")
+            logger.debug(traceback.format_exc())
+            get_run_metrics().add("scrape", errors=1)
+            return index, [], []
+        return index, listings, links
+
+    pending = {asyncio.create_task(process(0, url))}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for finished in done:
+                index, listings, links = finished.result()
+                if paginate:
+                    for link in links:
+                        if link in pages or len(pages) >= max_pages:
+                            continue
+                        pages.append(link)
+                        pending.add(asyncio.create_task(process(len(pages) - 1, link)))
+
+                parked[index] = listings
+                while parked:
+                    if crawl is None:
+                        index = next(iter(parked))
+                    elif next_index in parked:
+                        index, next_index = next_index, next_index + 1
+                    else:
+                        break
+                    listings = parked.pop(index)
+
+                    # The same page can be linked under several URLs (e.g. "page 1" links)
+                    new_listings = [
+                        listing for listing in listings if listing["url"] not in seen
+                    ]
+                    seen.update(listing["url"] for listing in new_listings)
+                    yield index, new_listings
+                    if crawl is not None and await asyncio.to_thread(
+                        crawl.should_stop, listings
+                    ):
+                        logger.info(
+                            f"Incremental crawl of {url} stopped after {index + 1} pages"
+                        )
+                        return
+    finally:
+        for task in pending:
+            task.cancel()
+
+    logger.info(f"Fetched {len(pages)} result pages for {url}")
+
+
+async def crawl_solvia(
+    url: str,
+    fetcher: AsyncFetcher,
+    paginate: bool = True,
+    max_pages: int = MAX_PAGES,
+    crawl: IncrementalCrawl | None = None,
+) -> list[dict]:
+    """
+    Collects every listing of a Solvia search (see `iter_solvia_pages`).
+    Returns:
+        list[dict]: The unique listings of all pages, in page discovery order.
+    """
+    results: dict[int, list[dict]] = {}
+    async for index, listings in iter_solvia_pages(
+        url, fetcher, paginate, max_pages, crawl
+    ):
+        results[index] = listings
+    return [listing for index in sorted(results) for listing in results[index]]
+
+
+@task
+@profiled
+def scrape_solvia(
+    url: str, paginate: bool = True, max_pages: int = MAX_PAGES, stop_after: int = 0
+) -> list[Apartment]:
+    """
+    Scrapes property listings from Solvia.
+    Each listing includes name, address, m2, number of bedrooms, bathrooms, and URL.
+    Result pages are fetched concurrently over a pooled keep-alive client.
+    With `stop_after` > 0 the crawl is incremental: pagination stops after that
+    many consecutive listings already stored unchanged.
+    """
+
+    async def run() -> list[dict]:
+        async with scraping_fetcher() as fetcher:
+            return await crawl_solvia(
+                url, fetcher, paginate, max_pages, get_incremental_crawl(stop_after)
+            )
+
+    metrics = get_run_metrics()
+    with metrics.stage("scrape"):
+        listings = asyncio.run(run())
+    metrics.add("scrape", items_in=1, items_out=len(listings))
+    get_seen_index().add_many(listing["url"] for listing in listings)
+
     logger.info(f"Finished scraping {len(listings)} valid listings from {url}")
 
     return listings
@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import UTC, datetime, timedelta
 from uuid import UUID
 import json
 from io import BytesIO
@@ -10,6 +10,28 @@ from prefect.server.schemas.filters import TaskRunFilter
 
 
 from config.minio import get_minio, setup_minio_buckets, BUCKET
+from helpers.metrics import to_prometheus
+from helpers.profiling import collect_profiles
+from models.pydantic_models import Report
+
+
+def run_prefix() -> str:
+    """
+    Object prefix shared by every artifact uploaded for a run.
+    """
+    return datetime.now(UTC).strftime("%Y-%m-%dT%H-%M-%SZ")
+
+
+def upload_bytes(object_name: str, data: bytes, content_type: str) -> None:
+    minio_client = get_minio()
+    setup_minio_buckets(minio_client)
+    minio_client.put_object(
+        bucket_name=BUCKET,
+        object_name=object_name,
+        data=BytesIO(data),
+        length=len(data),
+        content_type=content_type,
+    )
 
 
 def json_serial(obj):
@@ -23,7 +45,7 @@ def json_serial(obj):
 
 
 @task
-async def save_task_metadata_to_minio() -> None:
+async def save_task_metadata_to_minio(prefix: str | None = None) -> None:
     # Obtener contexto y client de Prefect
 
     context = get_run_context()
@@ -78,8 +100,7 @@ async def save_task_metadata_to_minio() -> None:
     minio_client = get_minio()
     setup_minio_buckets(minio_client)
 
-    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H-%M-%SZ")
-    object_name = f"{timestamp}/task_metadata.json"
+    object_name = f"{prefix or run_prefix()}/task_metadata.json"
 
     minio_client.put_object(
         bucket_name=BUCKET,
@@ -90,3 +111,44 @@ async def save_task_metadata_to_minio() -> None:
     )
 
     print(f"✓ Subido metadata de {len(task_runs)} tareas a s3://{BUCKET}/{object_name}")
+
+
+@task
+def save_report_to_minio(
+    report: Report, prefix: str | None = None, prometheus: bool = False
+) -> None:
+    """
+    Uploads the in-process metrics of a run next to its task metadata:
+    `report.json` and, optionally, `metrics.prom` in the Prometheus text format.
+    Args:
+        report (Report): The run report.
+        prefix (str | None): The run prefix. Defaults to the current time.
+        prometheus (bool): Also upload the Prometheus rendering of the report.
+    """
+    prefix = prefix or run_prefix()
+    upload_bytes(
+        f"{prefix}/report.json",
+        report.model_dump_json(indent=2).encode("utf-8"),
+        "application/json",
+    )
+    if prometheus:
+        upload_bytes(
+            f"{prefix}/metrics.prom",
+            to_prometheus(report).encode("utf-8"),
+            "text/plain; version=0.0.4",
+        )
+
+    print(f"✓ Subido informe de métricas a s3://{BUCKET}/{prefix}/")
+
+
+@task
+def save_profiles_to_minio(prefix: str | None = None) -> None:
+    """
+    Uploads the task profiles recorded during the run under `<prefix>/profiles/`.
+    """
+    prefix = prefix or run_prefix()
+    profiles = collect_profiles()
+    for name, content, content_type in profiles:
+        upload_bytes(f"{prefix}/profiles/{name}", content, content_type)
+
+    print(f"✓ Subidos {len(profiles)} perfiles a s3://{BUCKET}/{prefix}/profiles/")
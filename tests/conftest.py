@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+
+TEST_DB = os.getenv("POSTGRES_TEST_DB", "prefectscraper_test")
+TABLES = ("apartment", "apartment_price_history", "market_price_m2_histogram")
+
+
+@pytest.fixture(scope="session")
+def pg_engine():
+    """
+    Engine on the POSTGRES_TEST_DB database of the configured server, created
+    and bootstrapped on first use. Tests using it are skipped when the server
+    cannot be reached.
+    """
+    from config import postgres
+    from config.schema import bootstrap_schema
+
+    admin = create_engine(
+        postgres.get_connection_string(),
+        isolation_level="AUTOCOMMIT",
+        pool_pre_ping=True,
+    )
+    try:
+        with admin.connect() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM pg_database WHERE datname = :name"),
+                {"name": TEST_DB},
+            ).scalar()
+            if not exists:
+                conn.execute(text(f'CREATE DATABASE "{TEST_DB}"'))
+    except Exception as e:
+        pytest.skip(f"PostgreSQL is not reachable: {e}")
+    finally:
+        admin.dispose()
+
+    previous = os.environ.get("POSTGRES_DB")
+    os.environ["POSTGRES_DB"] = TEST_DB
+    try:
+        engine = postgres.get_engine()
+        bootstrap_schema(engine)
+        yield engine
+    finally:
+        if previous is None:
+            os.environ.pop("POSTGRES_DB", None)
+        else:
+            os.environ["POSTGRES_DB"] = previous
+
+
+@pytest.fixture
+def pg(pg_engine):
+    """
+    The test database engine with empty listing tables.
+    """
+    from config.schema import forget_apartment_key_columns
+
+    with pg_engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {', '.join(TABLES)}"))
+    forget_apartment_key_columns(pg_engine)
+    return pg_engine
+
+
+@pytest.fixture
+def make_apartment():
+    """
+    Factory of Apartment_DB listings carrying a content hash, like the rows
+    built by to_apartment_db. Keyword arguments override any column,
+    `content_hash` included.
+    """
+    from helpers.seen_index import listing_hash
+    from models.sqlalchemy_models import Apartment_DB
+
+    def make(url: str, **values):
+        fields = {
+            "name": "Piso en venta",
+            "address": "Centro (Málaga) 29015",
+            "m2": 80.0,
+            "bedrooms": 2,
+            "bathrooms": 1,
+            "price": 200000.0,
+            "embedding": None,
+            "embedding_packed": np.ones(4, dtype=np.float32),
+        } | values
+        return Apartment_DB(
+            url=url, **({"content_hash": listing_hash(fields)} | fields)
+        )
+
+    return make
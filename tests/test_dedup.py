@@ -0,0 +1,98 @@
+import numpy as np
+
+from helpers import dedup
+from helpers.dedup import (
+    DisjointSet,
+    address_tokens,
+    block_keys,
+    bucket_pairs,
+    cluster_ids,
+    cluster_key,
+    cluster_listings,
+)
+from helpers.metrics import start_run_metrics
+from models.sqlalchemy_models import Apartment_DB
+from tasks.deduplicate import deduplicate_apartments
+
+
+def unit_vectors(count: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    vectors = (
+        np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    )
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_address_tokens_drop_accents_stopwords_and_short_tokens():
+    assert address_tokens("Calle Málaga 12, Barrio del Centro") == {"malaga", "centro"}
+    assert address_tokens(None) == set()
+
+
+def test_close_listings_share_a_block_key():
+    first = block_keys("Calle Larios, Centro", 200000, 80)
+    second = block_keys("Larios 3", 200000 * 1.04, 84)
+    assert set(first) & set(second)
+    assert not set(first) & set(block_keys("Calle Larios", 300000, 80))
+    assert block_keys("Calle Larios", None, 80) == []
+
+
+def test_disjoint_set():
+    clusters = DisjointSet(4)
+    assert clusters.union(0, 1)
+    assert clusters.union(1, 2)
+    assert not clusters.union(0, 2)
+    assert clusters.find(2) == clusters.find(0) != clusters.find(3)
+
+
+def test_bucket_pairs_only_pairs_members_of_the_same_bucket():
+    firsts, seconds = bucket_pairs(np.array([0, 1, 2, 3]), np.array([7, 5, 7, 7]))
+    pairs = {tuple(sorted(pair)) for pair in zip(firsts.tolist(), seconds.tolist())}
+    assert pairs == {(0, 2), (0, 3), (2, 3)}
+
+
+def test_cluster_listings_merges_similar_listings_of_a_block():
+    vectors = unit_vectors(4)
+    vectors[1] = vectors[0] + 0.01
+    vectors[3] = vectors[0]
+    labels = cluster_listings(
+        ["Calle Larios, Centro", "Larios, Málaga", "Calle Larios", "Calle Granada"],
+        [200000, 201000, 200000, 200000],
+        [80, 81, 80, 80],
+        vectors,
+    )
+    # 0 and 1 are duplicates; 2 has another embedding, 3 another street
+    assert labels[0] == labels[1]
+    assert len({labels[0], labels[2], labels[3]}) == 3
+
+
+def test_large_blocks_use_lsh_with_the_same_result(monkeypatch):
+    count = 300
+    base = unit_vectors(count // 2, seed=1)
+    noise = (
+        np.random.default_rng(2).standard_normal(base.shape).astype(np.float32) * 0.01
+    )
+    vectors = np.concatenate([base, base + noise])
+    addresses = ["Calle Larios, Centro"] * count
+    prices = [200000.0] * count
+    m2s = [80.0] * count
+
+    exact = cluster_listings(addresses, prices, m2s, vectors)
+    monkeypatch.setattr(dedup, "LSH_MIN_BLOCK", 16)
+    approximate = cluster_listings(addresses, prices, m2s, vectors)
+
+    assert (approximate == exact).all()
+    assert len(set(exact.tolist())) == count // 2
+
+
+def test_cluster_ids_use_the_smallest_url_of_each_cluster():
+    urls = ["https://b/", "https://A/", "https://c/"]
+    ids = cluster_ids(urls, np.array([0, 0, 2]))
+    assert ids == [cluster_key("https://A/"), cluster_key("https://A/"), None]
+    assert cluster_key(" HTTPS://A/ ") == cluster_key("https://a/")
+
+
+def test_dedup_metrics_are_recorded_without_duplicates_to_search():
+    metrics = start_run_metrics()
+    apartments = [Apartment_DB(url="https://www.pisos.com/a/", embedding=None)]
+    assert deduplicate_apartments.fn(apartments) == apartments
+    report = {stage.stage: stage for stage in metrics.build_report().stages}
+    assert report["dedup"].items_in == 1 and report["dedup"].items_out == 1
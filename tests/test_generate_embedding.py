@@ -0,0 +1,34 @@
+import pytest
+
+from helpers import embedding_engine, embedding_pool
+from models.pydantic_models import Apartment
+from tasks.generate_embedding import generate_embeddings
+
+
+def broken_model(*args, **kwargs):
+    raise OSError("model files not found")
+
+
+def broken_pool(*args, **kwargs):
+    raise RuntimeError("worker failed to start")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_model_that_cannot_load_returns_no_embeddings(monkeypatch, workers):
+    monkeypatch.delenv("EMBEDDING_CACHE_BACKEND", raising=False)
+    monkeypatch.setattr(embedding_engine, "_models", {})
+    monkeypatch.setattr(embedding_engine, "load_model", broken_model)
+    monkeypatch.setattr(embedding_pool, "get_pool", broken_pool)
+    apartments = [
+        Apartment(
+            url=f"https://www.pisos.com/{i}/",
+            name="Piso",
+            address="Centro",
+            m2=80.0,
+            bedrooms=2,
+            bathrooms=1,
+            price=200000.0,
+        )
+        for i in range(workers * embedding_pool.MIN_ITEMS_PER_WORKER)
+    ]
+    assert generate_embeddings.fn(apartments, workers=workers) == []
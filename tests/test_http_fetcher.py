@@ -0,0 +1,117 @@
+import asyncio
+
+import httpx
+import pytest
+
+from helpers import http_fetcher
+from helpers.http_fetcher import AsyncFetcher
+
+URL = "https://www.solvia.es/es/comprar/viviendas"
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """
+    Records the backoff delays instead of sleeping, with the jitter at its minimum.
+    """
+    recorded = []
+
+    async def sleep(seconds):
+        recorded.append(seconds)
+
+    monkeypatch.setattr(http_fetcher.asyncio, "sleep", sleep)
+    monkeypatch.setattr(http_fetcher.random, "random", lambda: 0.0)
+    return recorded
+
+
+def fetch_all(handler, urls, **options) -> tuple[list, list]:
+    """
+    Fetches `urls` concurrently through a fetcher answering with `handler`,
+    returning the responses (or exceptions) and the requests made.
+    """
+    requests = []
+
+    async def respond(request):
+        requests.append(request)
+        return await handler(request, len(requests))
+
+    async def run():
+        async with AsyncFetcher(**options) as fetcher:
+            await fetcher._client.aclose()
+            fetcher._client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+            return await asyncio.gather(
+                *(fetcher.fetch(url) for url in urls), return_exceptions=True
+            )
+
+    return asyncio.run(run()), requests
+
+
+def test_retryable_statuses_back_off_exponentially(delays):
+    async def handler(request, attempt):
+        return httpx.Response(503 if attempt < 3 else 200, text="ok")
+
+    (response,), requests = fetch_all(handler, [URL], backoff=0.5)
+    assert response.status_code == 200
+    assert len(requests) == 3
+    assert delays == [0.5, 1.0]
+
+
+def test_retry_after_header_sets_the_delay(delays):
+    async def handler(request, attempt):
+        if attempt == 1:
+            return httpx.Response(429, headers={"Retry-After": "7"})
+        return httpx.Response(200)
+
+    (response,), _ = fetch_all(handler, [URL])
+    assert response.status_code == 200
+    assert delays == [7.0]
+
+
+def test_network_errors_are_retried(delays):
+    async def handler(request, attempt):
+        if attempt == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200)
+
+    (response,), requests = fetch_all(handler, [URL], backoff=0.1)
+    assert response.status_code == 200
+    assert len(requests) == 2 and delays == [0.1]
+
+
+def test_exhausted_retries_raise_the_last_status(delays):
+    async def handler(request, attempt):
+        return httpx.Response(500)
+
+    (error,), requests = fetch_all(handler, [URL], retries=2, backoff=1.0)
+    assert isinstance(error, httpx.HTTPStatusError)
+    assert error.response.status_code == 500
+    assert len(requests) == 3
+    assert delays == [1.0, 2.0]
+
+
+def test_client_errors_are_not_retried_and_304_is_returned(delays):
+    async def handler(request, attempt):
+        return httpx.Response(404 if request.url.path.endswith("missing") else 304)
+
+    (missing, not_modified), requests = fetch_all(handler, [f"{URL}/missing", URL])
+    assert isinstance(missing, httpx.HTTPStatusError)
+    assert not_modified.status_code == 304
+    assert len(requests) == 2 and delays == []
+
+
+def test_concurrency_is_limited_per_host():
+    active = {"www.solvia.es": 0, "www.pisos.com": 0}
+    peak = dict(active)
+
+    async def handler(request, attempt):
+        host = request.url.host
+        active[host] += 1
+        peak[host] = max(peak[host], active[host])
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+        return httpx.Response(200)
+
+    urls = [f"https://{host}/{i}/" for host in active for i in range(10)]
+    responses, _ = fetch_all(handler, urls, per_host_limit=2)
+    assert all(response.status_code == 200 for response in responses)
+    assert peak == {"www.solvia.es": 2, "www.pisos.com": 2}
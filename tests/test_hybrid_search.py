@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from helpers.hybrid_search import AttributeIndex, HybridSearch
+from helpers.vector_index import ATTRIBUTES, VectorIndex, normalize_rows
+from models.pydantic_models import SearchFilters
+
+COUNT = 3000
+FILTERS = [
+    SearchFilters(max_price=250000),
+    SearchFilters(min_m2=60, max_m2=90, min_bedrooms=2),
+    SearchFilters(min_bedrooms=3, max_bathrooms=1),
+    SearchFilters(min_price=100000, max_price=120000, min_bathrooms=2),
+    SearchFilters(min_price=10_000_000),
+]
+
+
+@pytest.fixture(scope="module")
+def listings():
+    rng = np.random.default_rng(0)
+    vectors = normalize_rows(rng.standard_normal((COUNT, 16)))
+    attributes = np.column_stack(
+        [
+            rng.uniform(50_000, 600_000, COUNT),
+            rng.uniform(30, 200, COUNT),
+            rng.integers(1, 6, COUNT),
+            rng.integers(1, 4, COUNT),
+        ]
+    ).astype(np.float32)
+    # Unknown values never match a filter on their attribute
+    attributes[rng.random(attributes.shape) < 0.05] = np.nan
+    urls = [f"https://www.pisos.com/{i}/" for i in range(COUNT)]
+    return urls, vectors, attributes
+
+
+def matching(attributes: np.ndarray, filters: SearchFilters) -> np.ndarray:
+    keep = np.ones(len(attributes), dtype=bool)
+    for column, name in enumerate(ATTRIBUTES):
+        low, high = getattr(filters, f"min_{name}"), getattr(filters, f"max_{name}")
+        values = attributes[:, column]
+        if low is not None:
+            keep &= values >= low
+        if high is not None:
+            keep &= values <= high
+    return np.flatnonzero(keep)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_candidates_match_a_full_scan(listings, filters):
+    _, _, attributes = listings
+    rows = AttributeIndex(attributes).candidates(filters)
+    assert rows.tolist() == matching(attributes, filters).tolist()
+
+
+def test_no_filters_means_every_row(listings):
+    assert AttributeIndex(listings[2]).candidates(SearchFilters()) is None
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_search_ranks_the_matching_listings(listings, filters):
+    urls, vectors, attributes = listings
+    index = VectorIndex()
+    index.upsert(urls, vectors, attributes)
+    query = vectors[7] + 0.5 * vectors[8]
+
+    rows = matching(attributes, filters)
+    scores = vectors[rows] @ normalize_rows(query)
+    expected = [urls[row] for row in rows[np.argsort(-scores)]]
+
+    search = HybridSearch(index)
+    first = search.search(query, filters=filters, page_size=10)
+    second = search.search(query, filters=filters, page=1, page_size=10)
+    assert first.candidates == len(rows)
+    assert [result.url for result in first.results + second.results] == expected[:20]
+    assert first.has_more == (len(rows) > 10)
+
+
+def test_url_query_excludes_the_listing_itself(listings):
+    urls, vectors, attributes = listings
+    index = VectorIndex()
+    index.upsert(urls, vectors, attributes)
+    page = HybridSearch(index).search(url=urls[0], page_size=5)
+    assert urls[0] not in [result.url for result in page.results]
+    assert page.candidates == COUNT - 1
+
+
+def test_cached_pages_are_dropped_when_the_index_changes(listings):
+    urls, vectors, attributes = listings
+    index = VectorIndex()
+    index.upsert(urls[:100], vectors[:100], attributes[:100])
+    search = HybridSearch(index)
+    query = vectors[500]
+    assert search.search(query, page_size=1) is search.search(query, page_size=1)
+
+    index.upsert([urls[500]], vectors[500:501], attributes[500:501])
+    assert search.search(query, page_size=1).results[0].url == urls[500]
+
+
+def test_exactly_one_query_is_required(listings):
+    index = VectorIndex()
+    index.upsert(listings[0][:10], listings[1][:10])
+    with pytest.raises(ValueError):
+        HybridSearch(index).search()
+    with pytest.raises(ValueError):
+        HybridSearch(index).search(listings[1][0], url=listings[0][0])
+    with pytest.raises(KeyError):
+        HybridSearch(index).search(url="https://www.solvia.es/unknown/")
@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import select
+
+from models.sqlalchemy_models import Apartment_DB, ApartmentPriceHistory_DB
+from tasks.load_to_postgres import load_changes, merge_apartments, upsert_apartments
+
+pytestmark = pytest.mark.postgres
+
+
+def stored(engine, column):
+    with engine.connect() as conn:
+        return dict(conn.execute(select(Apartment_DB.url, column)).all())
+
+
+@pytest.mark.parametrize("load", [merge_apartments, upsert_apartments, load_changes])
+def test_load_modes_insert_then_update(pg, make_apartment, load):
+    first = load(
+        pg,
+        [
+            make_apartment("https://www.pisos.com/a/"),
+            make_apartment("https://www.pisos.com/b/"),
+        ],
+    )
+    assert (first.inserted, first.updated, first.errors) == (2, 0, 0)
+
+    second = load(pg, [make_apartment("https://www.pisos.com/a/", price=150000.0)])
+    assert (second.inserted, second.updated, second.errors) == (0, 1, 0)
+    assert stored(pg, Apartment_DB.price) == {
+        "https://www.pisos.com/a/": 150000.0,
+        "https://www.pisos.com/b/": 200000.0,
+    }
+
+
+@pytest.mark.parametrize("load", [upsert_apartments, load_changes])
+def test_unchanged_rows_are_counted(pg, make_apartment, load):
+    load(pg, [make_apartment("https://www.pisos.com/a/")])
+    stats = load(pg, [make_apartment("https://www.pisos.com/a/")])
+    assert (stats.inserted, stats.updated, stats.unchanged) == (0, 0, 1)
+
+
+def test_changes_mode_appends_price_history(pg, make_apartment):
+    url = "https://www.pisos.com/a/"
+    load_changes(pg, [make_apartment(url)])
+    load_changes(pg, [make_apartment(url)])
+    load_changes(pg, [make_apartment(url, price=180000.0)])
+    with pg.connect() as conn:
+        prices = (
+            conn.execute(
+                select(ApartmentPriceHistory_DB.price).order_by(
+                    ApartmentPriceHistory_DB.seen_at
+                )
+            )
+            .scalars()
+            .all()
+        )
+    assert prices == [200000.0, 180000.0]
+
+
+def test_changes_mode_refreshes_unchanged_rows(pg, make_apartment):
+    url = "https://www.pisos.com/a/"
+    load_changes(pg, [make_apartment(url)])
+    first_seen = stored(pg, Apartment_DB.last_seen)[url]
+
+    stats = load_changes(
+        pg,
+        [
+            make_apartment(
+                url, cluster_id="c1", embedding_packed=None, embedding=[0.5] * 4
+            )
+        ],
+    )
+    assert stats.unchanged == 1
+    assert stored(pg, Apartment_DB.cluster_id)[url] == "c1"
+    assert stored(pg, Apartment_DB.embedding)[url] == [0.5] * 4
+    assert stored(pg, Apartment_DB.embedding_packed)[url] is None
+    assert stored(pg, Apartment_DB.last_seen)[url] > first_seen
+
+    # A row without a cluster or an embedding keeps the stored ones
+    load_changes(pg, [make_apartment(url, embedding_packed=None)])
+    assert stored(pg, Apartment_DB.cluster_id)[url] == "c1"
+    assert stored(pg, Apartment_DB.embedding)[url] == [0.5] * 4
+
+
+def test_changes_mode_writes_rows_without_hash(pg, make_apartment):
+    url = "https://www.pisos.com/a/"
+    load_changes(pg, [make_apartment(url, content_hash=None)])
+    stats = load_changes(pg, [make_apartment(url, content_hash=None, price=180000.0)])
+    assert stats.updated == 1
+    assert stored(pg, Apartment_DB.price)[url] == 180000.0
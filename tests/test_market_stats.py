@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from helpers.market_stats import (
+    BUCKET_WIDTH,
+    bucket_value,
+    histogram_quantile,
+    listing_area,
+    market_deltas,
+    market_entry,
+    market_summary,
+    price_m2_bucket,
+)
+
+
+def listing(price, m2=100.0, address="Centro (Málaga Capital)", bedrooms=2) -> dict:
+    return {"address": address, "bedrooms": bedrooms, "m2": m2, "price": price}
+
+
+def test_listing_area():
+    address = "Centro (Distrito Centro. Málaga Capital)"
+    assert listing_area(address) == "Distrito Centro. Málaga Capital"
+    assert listing_area("Calle Larios 29015 Málaga") == "29015"
+    assert listing_area("Calle Larios, Málaga") == "Málaga"
+    assert listing_area("") is None
+
+
+def test_bucket_midpoint_is_within_half_a_bucket():
+    for value in (812.0, 2500.0, 4321.5):
+        midpoint = bucket_value(price_m2_bucket(value))
+        assert abs(midpoint / value - 1) <= BUCKET_WIDTH / 2 + 1e-9
+
+
+def test_market_entry_caps_bedrooms_and_skips_incomplete_listings():
+    key, value = market_entry(listing(300000.0, bedrooms=8))
+    assert key[1] == 5 and value == 3000.0
+    assert market_entry(listing(300000.0, bedrooms=None))[0][1] == -1
+    assert market_entry(listing(None)) is None
+    assert market_entry(listing(300000.0, m2=0)) is None
+
+
+def test_market_deltas():
+    old = {"a": listing(200000.0), "b": listing(300000.0), "c": listing(400000.0)}
+    new = {"a": listing(200000.0), "b": listing(330000.0), "d": listing(500000.0)}
+    deltas = market_deltas(old, new)
+
+    def key(price):
+        return market_entry(listing(price))[0]
+
+    # "a" is unchanged, "b" moves bucket, "c" is removed and "d" is new
+    assert deltas == {
+        key(300000.0): [-1, -3000.0],
+        key(330000.0): [1, 3300.0],
+        key(400000.0): [-1, -4000.0],
+        key(500000.0): [1, 5000.0],
+    }
+    assert market_deltas(old, old) == {}
+
+
+def test_histogram_quantiles_match_the_exact_quantiles():
+    values = np.random.default_rng(0).lognormal(math.log(3000), 0.4, 5000)
+    buckets, counts = np.unique(
+        [price_m2_bucket(v) for v in values], return_counts=True
+    )
+    for q in (0.25, 0.5, 0.75):
+        exact = np.quantile(values, q, method="inverted_cdf")
+        estimate = histogram_quantile(buckets.tolist(), counts.tolist(), q)
+        assert abs(estimate / exact - 1) <= BUCKET_WIDTH / 2 + 1e-9
+
+
+@pytest.mark.postgres
+def test_loads_keep_the_histogram_in_sync(pg, make_apartment):
+    from pipeline.rebuild_market_stats import rebuild_market_stats
+    from tasks.load_to_postgres import load_changes, merge_apartments, upsert_apartments
+
+    prices = [200000.0 + i * 5000 for i in range(20)]
+    upsert_apartments(
+        pg,
+        [
+            make_apartment(f"https://www.pisos.com/{i}/", price=p)
+            for i, p in enumerate(prices)
+        ],
+    )
+    load_changes(
+        pg, [make_apartment("https://www.pisos.com/3/", price=90000.0, m2=45.0)]
+    )
+    merge_apartments(pg, [make_apartment("https://www.pisos.com/4/", bedrooms=4)])
+
+    def histogram():
+        with pg.connect() as conn:
+            return conn.execute(
+                text(
+                    "SELECT area, bedrooms, bucket, listings, round(total_price_m2::numeric, 3) "
+                    "FROM market_price_m2_histogram ORDER BY 1, 2, 3"
+                )
+            ).all()
+
+    incremental = histogram()
+    rebuild_market_stats(pg)
+    assert histogram() == incremental
+
+    with pg.connect() as conn:
+        stats = {stat.bedrooms: stat for stat in market_summary(conn, "Málaga")}
+    assert stats[2].listings == 19 and stats[4].listings == 1
+    assert stats[2].p25_price_m2 <= stats[2].median_price_m2 <= stats[2].p75_price_m2
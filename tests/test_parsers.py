@@ -0,0 +1,71 @@
+from bs4 import BeautifulSoup
+
+from benchmarks.run_benchmarks import PISOS_FIXTURE, SOLVIA_FIXTURE, SOLVIA_FIXTURE_URL
+from benchmarks.synthetic import (
+    SYNTHETIC_URL_PREFIX,
+    generate_apartments,
+    render_pisos_page,
+    render_solvia_page,
+)
+from tasks.scrape_pisos import PISOS_BASE_URL, parse_listing_cards, parse_pisos_html
+from tasks.scrape_solvia import parse_solvia_cards, parse_solvia_page
+
+FIELDS = ("name", "address", "m2", "bedrooms", "bathrooms", "price")
+
+
+# The fixtures may be replaced by recorded pages (`run_benchmarks record`),
+# so only their shape is checked; exact values are checked on rendered pages.
+def test_pisos_fixture():
+    listings, total_pages, has_grid = parse_pisos_html(PISOS_FIXTURE.read_bytes())
+    assert has_grid
+    assert listings
+    assert total_pages >= 1
+    assert len({listing.url for listing in listings}) == len(listings)
+    for listing in listings:
+        assert listing.url.startswith(PISOS_BASE_URL)
+        assert all(getattr(listing, field) is not None for field in FIELDS)
+
+
+def test_pisos_cards_round_trip():
+    apartments = list(generate_apartments(50, seed=3))
+    assert any(apartment.bedrooms == 0 for apartment in apartments)  # studios
+    soup = BeautifulSoup(render_pisos_page(apartments, total_results=50), "html.parser")
+    parsed = parse_listing_cards(soup)
+    assert [listing.model_dump() for listing in parsed] == [
+        apartment.model_dump()
+        | {"url": PISOS_BASE_URL + apartment.url.removeprefix(SYNTHETIC_URL_PREFIX)}
+        for apartment in apartments
+    ]
+
+
+def test_pisos_page_without_grid_or_with_broken_cards():
+    assert parse_pisos_html("<html><body>Captcha</body></html>") == ([], 0, False)
+    html = (
+        '<div class="grid__wrapper"><div data-lnk-href="/a/">'
+        '<a class="ad-preview__title">Piso</a></div></div>'
+    )
+    listings, _, has_grid = parse_pisos_html(html)
+    assert has_grid and listings == []
+
+
+def test_solvia_fixture():
+    listings, pages = parse_solvia_page(SOLVIA_FIXTURE.read_bytes(), SOLVIA_FIXTURE_URL)
+    assert listings
+    assert pages and all(page.startswith(SOLVIA_FIXTURE_URL) for page in pages)
+    for listing in listings:
+        assert all(listing[field] is not None for field in FIELDS)
+
+
+def test_solvia_cards_round_trip():
+    apartments = list(generate_apartments(20, seed=4))
+    soup = BeautifulSoup(render_solvia_page(apartments, page=1, pages=1), "html.parser")
+    parsed = parse_solvia_cards(soup)
+    assert parsed == [
+        apartment.model_dump() | {"address": f"{apartment.address} Málaga"}
+        for apartment in apartments
+    ]
+
+
+def test_solvia_card_without_a_name_is_skipped():
+    html = '<div class="house-info"><a href="/x/"></a></div>'
+    assert parse_solvia_cards(BeautifulSoup(html, "html.parser")) == []
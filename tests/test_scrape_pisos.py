@@ -0,0 +1,90 @@
+import asyncio
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+
+from tasks import scrape_pisos
+
+FIXTURES = Path(__file__).parent.parent / "src" / "benchmarks" / "fixtures"
+
+
+class FakeDriver:
+    current_url = "https://www.pisos.com/venta/pisos-malaga/"
+
+    def __init__(self):
+        self.page_source = (FIXTURES / "pisos_results.html").read_text("utf-8")
+
+    def find_element(self, *args):
+        raise NoSuchElementException("no next page")
+
+
+class FakePool:
+    size = 1
+
+    def __init__(self):
+        self.fake = FakeDriver()
+
+    @contextmanager
+    def driver(self):
+        yield self.fake
+
+
+@pytest.mark.parametrize("total_pages", [0, 1])
+def test_first_page_wait_is_recorded_once(monkeypatch, total_pages):
+    waits = []
+
+    def wait_for_page_ready(driver, timeout=10):
+        waits.append(driver)
+        return 1.5
+
+    monkeypatch.setattr(scrape_pisos, "get_driver_pool", lambda *args: FakePool())
+    monkeypatch.setattr(scrape_pisos, "open_page", lambda *args: None)
+    monkeypatch.setattr(scrape_pisos, "get_html_archive", lambda: None)
+    monkeypatch.setattr(scrape_pisos, "get_total_pages", lambda driver: total_pages)
+    monkeypatch.setattr(scrape_pisos, "wait_for_page_ready", wait_for_page_ready)
+
+    stats = scrape_pisos.WaitStats()
+    pages = list(
+        scrape_pisos.iter_pisos_selenium_pages(FakeDriver.current_url, wait_stats=stats)
+    )
+
+    assert len(pages) == 1 and pages[0]
+    assert len(waits) == 1
+    assert stats.samples == [1.5]
+
+
+class StaticFetcher:
+    per_host_limit = 4
+
+    def __init__(self, html: str):
+        self.html = html
+        self.urls = []
+
+    async def fetch_parsed(self, url, parse, *args):
+        self.urls.append(url)
+        return parse(self.html, *args)
+
+
+def test_http_crawl_without_counter_falls_back():
+    html = (FIXTURES / "pisos_results.html").read_text("utf-8")
+    html = html.replace("pagination__counter", "pagination__removed")
+    fetcher = StaticFetcher(html)
+
+    assert (
+        asyncio.run(scrape_pisos.crawl_pisos_http(FakeDriver.current_url, fetcher))
+        is None
+    )
+    assert fetcher.urls == [FakeDriver.current_url]
+
+
+@pytest.mark.parametrize("clicked", [False, True])
+def test_low_latency_cookie_flag_follows_the_click(monkeypatch, clicked):
+    monkeypatch.setattr(scrape_pisos, "accept_cookies", lambda driver, timeout: clicked)
+    driver = FakeDriver()
+    driver.get = lambda url: None
+
+    scrape_pisos.open_page(driver, FakeDriver.current_url, low_latency=True)
+
+    assert driver.cookies_accepted is clicked
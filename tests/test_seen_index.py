@@ -0,0 +1,80 @@
+from helpers.seen_index import BloomFilter, IncrementalCrawl, SeenIndex, listing_hash
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    added = [f"https://www.pisos.com/{i}/" for i in range(10_000)]
+    assert all(bloom.add(url) for url in added[:100])
+    for url in added[100:]:
+        bloom.add(url)
+
+    assert all(url in bloom for url in added)
+    false_positives = sum(f"https://www.solvia.es/{i}/" in bloom for i in range(10_000))
+    assert false_positives < 200
+    assert not bloom.add(added[0])
+
+
+def test_seen_index_round_trip(tmp_path):
+    path = str(tmp_path / "seen.bloom")
+    index = SeenIndex(path, capacity=1000)
+    assert (
+        index.add_many([" HTTPS://www.pisos.com/A/", "https://www.pisos.com/b/"]) == 2
+    )
+    index.record_run(full=True)
+    index.record_run(full=False)
+    index.save()
+
+    loaded = SeenIndex.load(path, capacity=1000)
+    assert loaded.might_contain("https://www.pisos.com/a/")
+    assert not loaded.might_contain("https://www.pisos.com/c/")
+    assert loaded.bloom.count == 2
+    assert loaded.runs_since_full == 1
+    assert loaded.last_full_crawl == index.last_full_crawl
+
+
+def test_unreadable_index_starts_empty(tmp_path):
+    path = tmp_path / "seen.bloom"
+    path.write_bytes(b"not an index")
+    assert SeenIndex.load(str(path)).bloom.count == 0
+
+
+def test_full_crawl_schedule():
+    index = SeenIndex("unused")
+    assert index.full_crawl_due(every=3)
+    index.add_many(["https://www.pisos.com/a/"])
+    index.record_run(full=True)
+    assert not index.full_crawl_due(every=3)
+    index.record_run(full=False)
+    assert not index.full_crawl_due(every=3)
+    index.record_run(full=False)
+    assert index.full_crawl_due(every=3)
+    assert not index.full_crawl_due(every=0)
+
+
+def test_listing_hash_ignores_integral_float_types_and_extra_fields():
+    fields = {
+        "name": "Piso",
+        "address": "Centro",
+        "m2": 80,
+        "bedrooms": 2,
+        "bathrooms": 1,
+    }
+    same = fields | {"m2": 80.0, "price": None, "url": "https://www.pisos.com/a/"}
+    assert listing_hash(fields | {"price": None}) == listing_hash(same)
+    assert listing_hash(same) != listing_hash(same | {"price": 1.0})
+
+
+class KnownListings:
+    def __init__(self, known: set[str]):
+        self.known = known
+
+    def known_unchanged(self, listings):
+        return [listing in self.known for listing in listings]
+
+
+def test_incremental_crawl_stops_after_consecutive_known_listings():
+    crawl = IncrementalCrawl(KnownListings({"a", "b", "c"}), stop_after=3)
+    assert not crawl.should_stop(["new", "a", "b"])
+    assert not crawl.should_stop(["new", "a"])
+    assert crawl.should_stop(["b", "c", "new"])
+    assert crawl.pages_checked == 3
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+import pytest
+
+from pipeline import streaming
+
+
+class SeenUrls:
+    def add_many(self, urls):
+        list(urls)
+
+
+class FailingEmbedder:
+    @staticmethod
+    def fn(batch, **kwargs):
+        raise RuntimeError("encoder crashed")
+
+
+def test_consumer_failure_stops_the_selenium_thread(monkeypatch):
+    closed = threading.Event()
+
+    def endless_pages(url, pool_size, low_latency, crawl=None):
+        try:
+            page = 0
+            while True:
+                page += 1
+                yield [{"url": f"{url}{page}/"}]
+        finally:
+            closed.set()
+
+    monkeypatch.setattr(streaming, "iter_pisos_selenium_pages", endless_pages)
+    monkeypatch.setattr(streaming, "get_seen_index", SeenUrls)
+    monkeypatch.setattr(streaming, "generate_embeddings", FailingEmbedder)
+    monkeypatch.setattr(streaming, "STOP_POLL_SECONDS", 0.05)
+
+    async def run() -> bool:
+        with pytest.raises(RuntimeError, match="encoder crashed"):
+            await streaming.run_streaming_pipeline(
+                ["https://www.pisos.com/venta/"], [], ["selenium"], queue_size=1
+            )
+        # Checked before the loop shuts down, which would cancel a stuck put
+        return await asyncio.to_thread(closed.wait, 5)
+
+    assert asyncio.run(run())
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from helpers.vector_index import VectorIndex, normalize_rows, top_k
+
+
+def clustered_vectors(count: int, dim: int = 32, centers: int = 20, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    means = rng.standard_normal((centers, dim)).astype(np.float32)
+    labels = rng.integers(0, centers, count)
+    return means[labels] + 0.3 * rng.standard_normal((count, dim)).astype(np.float32)
+
+
+def build_index(vectors) -> VectorIndex:
+    index = VectorIndex()
+    index.upsert([f"https://www.pisos.com/{i}/" for i in range(len(vectors))], vectors)
+    return index
+
+
+def urls(results) -> list[list[str]]:
+    return [[url for url, _ in result] for result in results]
+
+
+def test_top_k_returns_the_best_scores_first():
+    positions, values = top_k(np.array([[0.1, 0.9, 0.5, 0.7]]), 2)
+    assert positions.tolist() == [[1, 3]]
+    np.testing.assert_allclose(values, [[0.9, 0.7]])
+
+
+def test_exact_search_matches_brute_force():
+    vectors = clustered_vectors(2000)
+    queries = clustered_vectors(20, seed=1)
+    index = build_index(vectors)
+
+    expected = np.argsort(
+        -(normalize_rows(queries) @ normalize_rows(vectors).T), axis=1
+    )[:, :10]
+    results = index.search(queries, k=10)
+    assert urls(results) == [
+        [f"https://www.pisos.com/{i}/" for i in row] for row in expected
+    ]
+
+
+def test_ivf_recall_against_exact_search():
+    vectors = clustered_vectors(5000)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(5000, 50)] + 0.1 * rng.standard_normal((50, 32))
+    index = build_index(vectors)
+    exact = index.search(queries, k=10)
+    index.train_ivf(nlist=40)
+
+    approximate = index.search(queries, k=10, nprobe=4)
+    recall = np.mean(
+        [len(set(a) & set(e)) / 10 for a, e in zip(urls(approximate), urls(exact))]
+    )
+    assert recall >= 0.9
+    # Probing every list scores every row
+    full = index.search(queries, k=10, nprobe=40)
+    assert urls(full) == urls(exact)
+    np.testing.assert_allclose(
+        [[score for _, score in result] for result in full],
+        [[score for _, score in result] for result in exact],
+        atol=1e-5,
+    )
+    assert index.search(queries, k=10, exact=True) == exact
+
+
+def test_upsert_replaces_known_urls_and_keeps_ivf_assignments():
+    index = build_index(clustered_vectors(500))
+    index.train_ivf(nlist=10)
+    target = np.ones(32, dtype=np.float32)
+    added = index.upsert(
+        ["https://www.pisos.com/3/", "https://www.pisos.com/new/"], [target, -target]
+    )
+    assert added == 1
+    assert len(index) == 501
+
+    assert index.search(target, k=1)[0][0][0] == "https://www.pisos.com/3/"
+    assert index.search(-target, k=1)[0][0][0] == "https://www.pisos.com/new/"
+    similar = index.similar_to("https://www.pisos.com/3/")
+    assert "https://www.pisos.com/3/" not in [url for url, _ in similar]
+    with pytest.raises(ValueError):
+        index.upsert(["https://www.pisos.com/x/"], np.ones(8))
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_snapshot_round_trip(tmp_path, mmap):
+    path = str(tmp_path / "index.bin")
+    index = build_index(clustered_vectors(300))
+    index.upsert(
+        ["https://www.pisos.com/0/"], np.ones(32), [[100000.0, 80.0, 2.0, np.nan]]
+    )
+    index.train_ivf(nlist=8)
+    index.save(path)
+
+    loaded = VectorIndex.load(path, mmap=mmap)
+    queries = clustered_vectors(5, seed=2)
+    assert loaded.urls == index.urls
+    assert loaded.search(queries, k=5) == index.search(queries, k=5)
+    np.testing.assert_array_equal(loaded.attributes[0], index.attributes[0])
+
+    # Growing a mapped index copies it instead of writing to the file
+    loaded.upsert(
+        [f"https://www.solvia.es/{i}/" for i in range(2000)], clustered_vectors(2000)
+    )
+    assert len(VectorIndex.load(path)) == 300
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from models.sqlalchemy_models import Apartment_DB
+from models.vector_types import (
+    FLOAT32_TAG,
+    INT8_TAG,
+    embedding_as_array,
+    pack_vector,
+    packed_dtype,
+    unpack_vector,
+)
+
+
+def test_float32_round_trip_is_exact():
+    vector = np.random.default_rng(0).standard_normal(384).astype(np.float32)
+    data = pack_vector(vector)
+    assert data[0] == FLOAT32_TAG
+    assert len(data) == 1 + 4 * 384
+    np.testing.assert_array_equal(unpack_vector(data), vector)
+
+
+def test_int8_round_trip_is_within_half_a_step():
+    vector = np.random.default_rng(1).standard_normal(384).astype(np.float32)
+    data = pack_vector(vector, "int8")
+    assert data[0] == INT8_TAG
+    assert len(data) == 1 + 4 + 384
+    step = np.abs(vector).max() / 127
+    assert np.abs(unpack_vector(data) - vector).max() <= step / 2 + 1e-6
+
+
+def test_int8_zero_vector():
+    np.testing.assert_array_equal(
+        unpack_vector(pack_vector(np.zeros(8), "int8")), np.zeros(8)
+    )
+
+
+def test_unsupported_dtype_and_tag():
+    with pytest.raises(ValueError):
+        pack_vector([1.0], "float16")
+    with pytest.raises(ValueError):
+        unpack_vector(b"\x07abcd")
+
+
+def test_packed_dtype():
+    assert packed_dtype("array") == "float32"
+    assert packed_dtype("float32") == "float32"
+    assert packed_dtype("int8") == "int8"
+
+
+def test_embedding_as_array_prefers_the_packed_column():
+    apartment = Apartment_DB(
+        embedding=[1.0, 2.0], embedding_packed=np.array([3.0, 4.0])
+    )
+    np.testing.assert_array_equal(embedding_as_array(apartment), [3.0, 4.0])
+    apartment.embedding_packed = None
+    np.testing.assert_array_equal(embedding_as_array(apartment), [1.0, 2.0])
+    apartment.embedding = None
+    assert embedding_as_array(apartment) is None
+
+
+def test_unknown_storage_mode_fails_at_import():
+    result = subprocess.run(
+        [sys.executable, "-c", "import models.vector_types"],
+        env={**os.environ, "EMBEDDING_STORAGE": "float16"},
+        cwd=os.path.join(os.path.dirname(__file__), "..", "src"),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert result.returncode != 0
+    assert "Unknown EMBEDDING_STORAGE 'float16'" in result.stderr